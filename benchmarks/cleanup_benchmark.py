@@ -0,0 +1,161 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+"""Measures end-to-end cleanup throughput against a local fake warehouse.
+
+Every scenario runs the plan, authenticate and execute stages of `PypiCleanup` in a fresh process, so that
+the peak RSS reported is that of the cleanup alone, while the warehouse is served from this process.
+
+Run with `PYTHONPATH=src/main/python python benchmarks/cleanup_benchmark.py [--scenario NAME ...]`.
+"""
+
+import argparse
+import asyncio
+import builtins
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import warehouse
+
+
+@dataclass(frozen=True)
+class Scenario:
+    description: str
+    packages: int
+    versions: int
+    files_per_version: int
+    delete: bool = False
+
+    def projects(self):
+        return {f"bench_pkg_{i:04d}": warehouse.project(f"bench_pkg_{i:04d}", self.versions, self.files_per_version)
+                for i in range(self.packages)}
+
+
+SCENARIOS = {
+    "10k-versions": Scenario("10k versions / 50k files", packages=1, versions=10000, files_per_version=5),
+    "200-packages": Scenario("200 packages", packages=200, versions=50, files_per_version=5),
+    # 112 versions of which every tenth is a final release leave 100 dev releases to delete per package
+    "5k-deletions": Scenario("5k deletions", packages=50, versions=112, files_per_version=2, delete=True),
+}
+
+
+def run_cleanup(url, packages, delete, totp, options):
+    """Runs in a fresh process, returns the stage timings, the number of releases planned and the peak RSS."""
+    from pypi_cleanup import PypiCleanup
+
+    logging.basicConfig(level=logging.INFO if options["verbose"] else logging.CRITICAL)
+    os.environ["PYPI_CLEANUP_PASSWORD"] = warehouse.PASSWORD
+    if totp:
+        builtins.input = lambda prompt="": warehouse.TOTP_CODE
+
+    cleanup = PypiCleanup(url=url, username=warehouse.USERNAME, packages=packages, do_it=delete,
+                          jobs=options["jobs"], delete_jobs=options["delete_jobs"], rate_limit=options["rate_limit"],
+                          max_retries=options["max_retries"], backoff=0.01, stream=options["stream"],
+                          engine=options["engine"], reuse_csrf=options["reuse_csrf"])
+    timings = {}
+
+    @contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        yield
+        timings[name] = time.perf_counter() - start
+
+    failed = []
+    if options["engine"] == "async":
+        from pypi_cleanup.aio import AsyncEngine
+
+        async def stages():
+            engine = AsyncEngine(cleanup)
+            async with engine.create_client() as client:
+                with stage("plan"):
+                    plan = await engine.plan(client)
+                if delete:
+                    with stage("authenticate"):
+                        await engine.authenticate(client)
+                    with stage("execute"):
+                        failed.extend(await engine.execute(client, plan))
+                return plan
+
+        plan = asyncio.run(stages())
+    else:
+        with cleanup.create_session() as s:
+            with stage("plan"):
+                plan = cleanup.plan(s)
+            if delete:
+                with stage("authenticate"):
+                    cleanup.authenticate(s)
+                with stage("execute"):
+                    failed = cleanup.execute(s, plan)
+
+    return timings, len(plan), len(failed), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def peak_rss_mib(maxrss):
+    # Linux reports KiB, macOS bytes
+    return maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def bench(name, scenario, args, pool):
+    projects = scenario.projects()
+    files = sum(len(files) for releases in projects.values() for files in releases.values())
+    w = warehouse.Warehouse(projects, totp=args.totp, latency=args.latency / 1000, error_rate=args.error_rate)
+    with w as url:
+        start = time.perf_counter()
+        timings, planned, failed, maxrss = pool.submit(run_cleanup, url, list(projects), scenario.delete, args.totp,
+                                                       vars(args)).result()
+        wall = time.perf_counter() - start
+    stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+    print(f"{name:<14} {scenario.description} ({files} files, {planned} releases planned, {failed} failed)")
+    print(f"{'':<14} wall {wall:.2f}s ({stages}), {w.requests} requests, {w.requests / wall:.0f} req/s, "
+          f"{w.errors} errors injected, peak RSS {peak_rss_mib(maxrss):.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pypi-cleanup benchmark against a local fake warehouse",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run, all by default")
+    parser.add_argument("--engine", choices=("sync", "async"), default="sync")
+    parser.add_argument("-j", "--jobs", type=int, default=8)
+    parser.add_argument("--delete-jobs", type=int, default=8)
+    parser.add_argument("--stream", action="store_true", default=False)
+    parser.add_argument("--reuse-csrf", action="store_true", default=False)
+    parser.add_argument("--rate-limit", type=float, default=0,
+                        help="requests per second, 0 leaving them unlimited until throttled as pypi-cleanup does "
+                             "by default")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0, help="latency of every response in milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests answered with a 503")
+    parser.add_argument("--totp", action="store_true", default=False, help="require TOTP on login")
+    parser.add_argument("-v", "--verbose", action="store_true", default=False)
+    args = parser.parse_args()
+
+    # Spawned workers don't inherit the warehouse fixtures, which would otherwise inflate their RSS
+    context = multiprocessing.get_context("spawn")
+    for name in args.scenario or SCENARIOS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            bench(name, SCENARIOS[name], args, pool)
+
+
+if __name__ == "__main__":
+    main()
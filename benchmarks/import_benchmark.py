@@ -0,0 +1,92 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+"""Measures the startup time of the `pypi-cleanup` console entry point on paths that never reach the network.
+
+Every run is a fresh interpreter, the time reported is the median wall time in excess of a bare interpreter
+started the same way. Exits with 1 if a module only needed to talk to the host was imported or if
+`--budget` milliseconds were exceeded, so that the benchmark can guard against import time regressions.
+
+Run with `PYTHONPATH=src/main/python python benchmarks/import_benchmark.py`.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Only needed once a cleanup runs
+DEFERRED_MODULES = ("requests", "urllib3", "asyncio", "concurrent.futures.thread", "html.parser", "configparser",
+                    "getpass", "sqlite3", "mmap", "hashlib", "email.utils", "httpx", "cryptography")
+
+ENTRY_POINT = """
+import sys
+sys.argv = ["pypi-cleanup"] + {argv!r}
+from pypi_cleanup import main
+try:
+    main()
+except SystemExit:
+    pass
+finally:
+    sys.stderr.write(repr(sorted(m for m in {deferred!r} if m in sys.modules)))
+"""
+
+SCENARIOS = {
+    "import": [],
+    "help": ["--help"],
+    "argument-error": ["-p", "a", "--jobs", "0"],
+    "safety-refusal": ["-p", "a", "-r", "dev"],
+}
+
+
+def run(code, env):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True)
+    return time.perf_counter() - start, result.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pypi-cleanup entry point startup benchmark",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-n", "--runs", type=int, default=20)
+    parser.add_argument("--budget", type=float, help="maximum median startup overhead in milliseconds")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    baseline = statistics.median(run("pass", env)[0] for _ in range(args.runs))
+    print(f"{'interpreter':<16} {baseline * 1000:7.1f} ms")
+
+    failed = False
+    for name, argv in SCENARIOS.items():
+        code = ENTRY_POINT.format(argv=argv, deferred=DEFERRED_MODULES) if argv else \
+            f"import sys, pypi_cleanup; sys.stderr.write(repr(sorted(m for m in {DEFERRED_MODULES!r} if m in sys.modules)))"
+        timings = []
+        for _ in range(args.runs):
+            elapsed, stderr = run(code, env)
+            timings.append(elapsed)
+        overhead = (statistics.median(timings) - baseline) * 1000
+        imported = stderr.rsplit("\n", 1)[-1]
+        print(f"{name:<16} {overhead:+7.1f} ms, deferred modules imported: {imported}")
+        failed |= imported != "[]" or (args.budget is not None and overhead > args.budget)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
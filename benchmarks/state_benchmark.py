@@ -0,0 +1,91 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+
+"""Compares the selection of the releases of a 20k-version project by 20 patterns with and without `--state`.
+
+The repeat run is that of a cron job: a few versions were uploaded and as many crossed the cutoff since the last one.
+
+Run with `PYTHONPATH=src/main/python python benchmarks/state_benchmark.py`.
+"""
+
+import datetime
+import logging
+import os
+import re
+import tempfile
+import timeit
+
+from pypi_cleanup import PypiCleanup
+
+VERSIONS = 20000
+NEW_VERSIONS = 20
+PATTERNS = [re.compile(rf".*\.dev{i}\d*$") for i in range(1, 10)] + \
+           [re.compile(rf".*(a|b|rc){i}$") for i in range(10)] + [re.compile(r".*\.post\d+$")]
+NOW = datetime.datetime.now(datetime.timezone.utc)
+
+
+def fixture(versions=VERSIONS):
+    # One version an hour, every 100th a dev release left over as the others were deleted by earlier runs
+    return {f"{i // 10000}.{i // 100 % 100}.{i % 100}" + (f".dev{i}" if i % 100 == 0 else ""):
+            NOW - datetime.timedelta(hours=versions - i) for i in range(versions)}
+
+
+def cleanup(state=None):
+    return PypiCleanup(url="https://test.pypi.org", packages=["bench-package"], patterns=PATTERNS, days=1,
+                       state=state)
+
+
+def bench(name, func, baseline=None, number=5, setup="pass"):
+    best = min(timeit.repeat(func, setup, number=1, repeat=number))
+    speedup = f" ({baseline / best:.1f}x)" if baseline else ""
+    print(f"{name:<40} {best * 1000:9.1f} ms{speedup}")
+    return best
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    release_dates = fixture()
+    earlier = NOW - datetime.timedelta(hours=NEW_VERSIONS)
+    previous = {k: v for k, v in release_dates.items() if v < earlier}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "state.db")
+        stateless, stateful = cleanup(), cleanup(path)
+        try:
+            def forget():
+                stateful.state.close()
+                os.unlink(path)
+
+            def previous_run():
+                # The previous run saw neither the newest versions nor the ones that have crossed the cutoff since
+                stateful.date = earlier - datetime.timedelta(days=stateful.days)
+                stateful.select_releases("bench-package", previous)
+                stateful.update_cutoff()
+
+            def select(c):
+                return lambda: c.select_releases("bench-package", release_dates)
+
+            assert select(stateless)() == select(stateful)()
+            print(f"{VERSIONS} versions, {len(PATTERNS)} patterns, {NEW_VERSIONS} new versions on repeat runs")
+            baseline = bench("select_releases", select(stateless))
+            bench("select_releases --state, first run", select(stateful), baseline, setup=forget)
+            bench("select_releases --state, repeat run", select(stateful), baseline, setup=previous_run)
+        finally:
+            stateful.state.close()
+
+
+if __name__ == "__main__":
+    main()
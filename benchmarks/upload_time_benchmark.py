@@ -0,0 +1,80 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+"""Compares upload time parsing and release date indexing of a 50k-file project against `strptime`.
+
+Run with `PYTHONPATH=src/main/python python benchmarks/upload_time_benchmark.py`.
+"""
+
+import datetime
+import timeit
+
+from pypi_cleanup import parse_upload_time, releases_by_date
+
+FILES = 50000
+FILES_PER_VERSION = 5
+
+
+def fixture():
+    versions = [f"1.0.dev{i}" for i in range(FILES // FILES_PER_VERSION)]
+    start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    files = []
+    for i, version in enumerate(versions):
+        for j in range(FILES_PER_VERSION):
+            upload_time = start + datetime.timedelta(minutes=i, seconds=j, microseconds=i * j)
+            files.append({"filename": f"bench_package-{version}-cp3{j}-cp3{j}-manylinux1_x86_64.whl",
+                          "upload-time": upload_time.isoformat(timespec="microseconds")})
+    return {"versions": versions, "files": files}
+
+
+def strptime_upload_times(project_info):
+    return [datetime.datetime.strptime(f["upload-time"], "%Y-%m-%dT%H:%M:%S.%f%z") for f in project_info["files"]]
+
+
+def fast_upload_times(project_info):
+    return [parse_upload_time(f["upload-time"]) for f in project_info["files"]]
+
+
+def strptime_releases_by_date(package, project_info):
+    latest_by_version = {}
+    for f in project_info["files"]:
+        version = f["filename"].split("-")[1]
+        upload_time = datetime.datetime.strptime(f["upload-time"], "%Y-%m-%dT%H:%M:%S.%f%z")
+        if version not in latest_by_version or latest_by_version[version] < upload_time:
+            latest_by_version[version] = upload_time
+    return {v: latest_by_version[v] for v in project_info["versions"] if v in latest_by_version}
+
+
+def bench(name, func, baseline=None, number=5):
+    best = min(timeit.repeat(func, number=1, repeat=number))
+    speedup = f" ({baseline / best:.1f}x)" if baseline else ""
+    print(f"{name:<40} {best * 1000:9.1f} ms{speedup}")
+    return best
+
+
+def main():
+    project_info = fixture()
+    assert strptime_releases_by_date("bench-package", project_info) == releases_by_date("bench-package", project_info)
+
+    print(f"{FILES} files, {len(project_info['versions'])} versions")
+    baseline = bench("strptime upload times", lambda: strptime_upload_times(project_info))
+    bench("parse_upload_time", lambda: fast_upload_times(project_info), baseline)
+    baseline = bench("releases_by_date (strptime)", lambda: strptime_releases_by_date("bench-package", project_info))
+    bench("releases_by_date", lambda: releases_by_date("bench-package", project_info), baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+"""Local stand-in for the parts of warehouse (PyPI) that pypi-cleanup talks to.
+
+Implements the PEP 691 JSON simple API, the login form with CSRF and optional TOTP, the paginated project
+management page and the release and per-file deletion forms, with configurable latency and error injection.
+"""
+
+import datetime
+import hashlib
+import html
+import json
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+USERNAME = "bench"
+PASSWORD = "bench-password"
+TOTP_CODE = "123456"
+CSRF_TOKEN = "bench-csrf-token"
+PROJECTS_PER_PAGE = 50
+SESSION_COOKIE = "session_id"
+
+
+def project(name, versions, files_per_version, start=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)):
+    """Returns `{version: [(filename, upload_time)]}` for a project with `versions` versions, every tenth one
+    being a final release and the rest `.devN` pre-releases."""
+    releases = {}
+    for i in range(versions):
+        version = f"0.{i}" if i % 10 == 0 else f"0.{i - i % 10}.dev{i % 10}"
+        upload_time = start + datetime.timedelta(minutes=i)
+        files = [(f"{name}-{version}.tar.gz", upload_time)]
+        for j in range(1, files_per_version):
+            files.append((f"{name}-{version}-cp3{j}-cp3{j}-manylinux1_x86_64.whl", upload_time + datetime.timedelta(seconds=j)))
+        releases[version] = [(filename, t.isoformat(timespec="microseconds")) for filename, t in files]
+    return releases
+
+
+class Warehouse:
+    """Serves `projects`, a dict of `{project: {version: [(filename, upload_time)]}}`, on a local port.
+
+    Every request is delayed by `latency` seconds and answered with a 503 with the probability of `error_rate`.
+    Deleted releases and files disappear from the simple API.
+    """
+
+    def __init__(self, projects, totp=False, latency=0.0, error_rate=0.0, seed=0):
+        self.projects = projects
+        self.totp = totp
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.deleted = 0
+        self._random = random.Random(seed)
+        self._sessions = {}
+        self._documents = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.warehouse = self
+        threading.Thread(target=self._server.serve_forever, name="warehouse", daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_):
+        self.stop()
+
+    def inject_error(self):
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return True
+        return False
+
+    def simple_document(self, name):
+        with self._lock:
+            document = self._documents.get(name)
+            if document is None:
+                releases = self.projects[name]
+                document = json.dumps({
+                    "meta": {"api-version": "1.1"},
+                    "name": name,
+                    "versions": list(releases),
+                    "files": [{"filename": filename,
+                               "url": f"/packages/{filename}",
+                               "hashes": {"sha256": hashlib.sha256(filename.encode("utf-8")).hexdigest()},
+                               "requires-python": ">=3.9",
+                               "size": 1024,
+                               "upload-time": upload_time}
+                              for files in releases.values() for filename, upload_time in files]
+                }).encode("utf-8")
+                self._documents[name] = document
+            return document
+
+    def delete(self, name, version):
+        with self._lock:
+            if self.projects.get(name, {}).pop(version, None) is None:
+                return False
+            self._documents.pop(name, None)
+            self.deleted += 1
+            return True
+
+    def delete_file(self, name, version, file_id):
+        with self._lock:
+            files = self.projects.get(name, {}).get(version, [])
+            for i, (filename, _) in enumerate(files):
+                if file_id == _file_id(filename):
+                    del files[i]
+                    self._documents.pop(name, None)
+                    self.deleted += 1
+                    return True
+            return False
+
+    def login(self, pending):
+        session_id = secrets.token_hex(16)
+        with self._lock:
+            self._sessions[session_id] = pending
+        return session_id
+
+    def session(self, session_id):
+        """Returns True for an authenticated session, False for one pending TOTP and None for none."""
+        with self._lock:
+            pending = self._sessions.get(session_id)
+        return None if pending is None else not pending
+
+    def confirm_totp(self, session_id):
+        with self._lock:
+            self._sessions[session_id] = False
+
+
+def _file_id(filename):
+    return hashlib.sha256(filename.encode("utf-8")).hexdigest()[:32]
+
+
+def _file_forms(name, files):
+    # Every form names its file in the title of its confirmation dialog and posts its id
+    return "".join(f'<form method="POST"><h3>Delete {html.escape(filename)}</h3>'
+                   f'<input name="csrf_token" type="hidden" value="{CSRF_TOKEN}">'
+                   f'<input name="file_id" type="hidden" value="{_file_id(filename)}">'
+                   f'<input name="confirm_project_name" type="text" placeholder="{html.escape(name)}"></form>'
+                   for filename, _ in files)
+
+
+def _form(action, *inputs):
+    fields = "".join(f'<input name="{name}" type="text">' for name in inputs)
+    return (f'<html><body><form method="POST" action="{html.escape(action)}">'
+            f'<input name="csrf_token" type="hidden" value="{CSRF_TOKEN}">{fields}</form></body></html>')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, Nagle's algorithm would delay the body until the client ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=()):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def redirect(self, location, headers=()):
+        self.send(303, headers=(("Location", location), *headers))
+
+    def session_id(self):
+        for cookie in self.headers.get_all("Cookie", []):
+            for pair in cookie.split(";"):
+                name, _, value = pair.strip().partition("=")
+                if name == SESSION_COOKIE:
+                    return value
+        return None
+
+    def dispatch(self, method):
+        warehouse = self.server.warehouse
+        form = {}
+        if method == "POST":
+            content = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+            form = {name: values[-1] for name, values in parse_qs(content).items()}
+
+        if warehouse.latency:
+            time.sleep(warehouse.latency)
+        if warehouse.inject_error():
+            self.send(503, "Service Unavailable", "text/plain")
+            return
+
+        url = urlsplit(self.path)
+        path = url.path.strip("/").split("/")
+        if method == "POST" and form.get("csrf_token") != CSRF_TOKEN:
+            self.send(400, "Invalid CSRF token", "text/plain")
+        elif path[0] == "simple" and len(path) == 2 and method == "GET":
+            self.simple(path[1])
+        elif url.path == "/account/login/":
+            self.login(method, form)
+        elif url.path == "/account/two-factor/totp/":
+            self.two_factor(method, form)
+        elif path[0] == "manage":
+            if not warehouse.session(self.session_id()):
+                self.redirect("/account/login/")
+            elif url.path == "/manage/projects/" and method == "GET":
+                self.projects(int(parse_qs(url.query).get("page", ["1"])[-1]))
+            elif len(path) == 5 and path[1] == "project" and path[3] == "release":
+                self.release(method, form, path[2], path[4])
+            elif len(path) == 4 and path[1] == "project" and path[3] == "releases":
+                self.send(200, f"<html><body>Releases of {html.escape(path[2])}</body></html>")
+            else:
+                self.send(404, "Not Found", "text/plain")
+        else:
+            self.send(404, "Not Found", "text/plain")
+
+    def simple(self, name):
+        warehouse = self.server.warehouse
+        if name not in warehouse.projects:
+            self.send(404, "Not Found", "text/plain")
+        else:
+            self.send(200, warehouse.simple_document(name), "application/vnd.pypi.simple.v1+json")
+
+    def login(self, method, form):
+        warehouse = self.server.warehouse
+        if method == "GET" or form.get("username") != USERNAME or form.get("password") != PASSWORD:
+            self.send(200, _form("/account/login/", "username", "password"))
+            return
+
+        session_id = warehouse.login(pending=warehouse.totp)
+        cookie = (("Set-Cookie", f"{SESSION_COOKIE}={session_id}; Path=/"),)
+        self.redirect("/account/two-factor/totp/" if warehouse.totp else "/manage/projects/", cookie)
+
+    def two_factor(self, method, form):
+        warehouse = self.server.warehouse
+        session_id = self.session_id()
+        if warehouse.session(session_id) is None:
+            self.redirect("/account/login/")
+        elif method == "GET" or form.get("totp_value") != TOTP_CODE:
+            self.send(200, _form("/account/two-factor/totp/", "totp_value"))
+        else:
+            warehouse.confirm_totp(session_id)
+            self.redirect("/manage/projects/")
+
+    def projects(self, page):
+        names = sorted(self.server.warehouse.projects)
+        pages = max((len(names) + PROJECTS_PER_PAGE - 1) // PROJECTS_PER_PAGE, 1)
+        links = "".join(f'<a href="/manage/project/{name}/releases/">{name}</a>'
+                        for name in names[(page - 1) * PROJECTS_PER_PAGE:page * PROJECTS_PER_PAGE])
+        pagination = "".join(f'<a href="?page={p}">{p}</a>' for p in range(1, pages + 1))
+        self.send(200, f"<html><body>{links}<nav>{pagination}</nav></body></html>")
+
+    def release(self, method, form, name, version):
+        warehouse = self.server.warehouse
+        if version not in warehouse.projects.get(name, {}):
+            self.send(404, "Not Found", "text/plain")
+        elif method == "GET":
+            page = _form(f"/manage/project/{name}/release/{version}/", "confirm_delete_version")
+            files = _file_forms(name, warehouse.projects[name][version])
+            self.send(200, page.replace("</body>", f"{files}</body>"))
+        elif "file_id" in form:
+            if form.get("confirm_project_name") != name or not warehouse.delete_file(name, version, form["file_id"]):
+                self.send(400, "Invalid confirmation", "text/plain")
+            else:
+                self.redirect(f"/manage/project/{name}/release/{version}/")
+        elif form.get("confirm_delete_version") != version or not warehouse.delete(name, version):
+            self.send(400, "Invalid confirmation", "text/plain")
+        else:
+            self.redirect(f"/manage/project/{name}/releases/")
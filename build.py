@@ -14,7 +14,9 @@
 #   limitations under the License.
 #
 
-from pybuilder.core import use_plugin, init, Author
+import io
+
+from pybuilder.core import use_plugin, init, after, Author
 
 use_plugin("python.core")
 use_plugin("python.unittest")
@@ -43,12 +45,22 @@ urls = {"Bug Tracker": "https://github.com/arcivanov/pypi-cleanup/issues",
 
 requires_python = ">=3.9"
 
+# Optional features and the packages they require, installed with `pip install pypi-cleanup[<extra>]`
+extras_require = {
+    "policy": ["packaging>=20.0"],
+    "session-store": ["cryptography>=3.1"],
+    "async": ["httpx>=0.23"],
+}
+
 default_task = ["analyze", "publish"]
 
 
 @init
 def set_properties(project):
     project.depends_on("requests", "~=2.23")
+    for requirements in extras_require.values():
+        for requirement in requirements:
+            project.build_depends_on(requirement)
     project.set_property("verbose", True)
 
     project.set_property("coverage_break_build", False)
@@ -89,3 +101,15 @@ def set_properties(project):
         "Intended Audience :: Developers",
         "Topic :: Software Development :: Build Tools"])
     project.set_property("distutils_setup_keywords", ["PyPI", "cleanup", "build", "dev", "tool", "release", "version"])
+
+
+@after("package")
+def write_extras_require(project, logger):
+    """Declares the `extras_require` in the setup script written by the distutils plugin, which doesn't support them."""
+    setup_script = project.expand_path("$dir_dist", "setup.py")
+    logger.info("Declaring extras %s in %s", ", ".join(extras_require), setup_script)
+    with io.open(setup_script, "rt", encoding="utf-8") as setup_file:
+        script = setup_file.read()
+    script = script.replace("        obsoletes = ", f"        extras_require = {extras_require!r},\n        obsoletes = ", 1)
+    with io.open(setup_script, "wt", encoding="utf-8") as setup_file:
+        setup_file.write(script)
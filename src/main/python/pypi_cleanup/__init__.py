@@ -15,67 +15,300 @@
 #
 
 import argparse
-import configparser
 import datetime
-import getpass
+import fnmatch
+import importlib
+import importlib.util
+import json
 import logging
 import os
 import re
 import sys
 import time
-from html.parser import HTMLParser
 from textwrap import dedent
 from urllib.parse import urlparse
 
-import requests
-from requests.__version__ import __version__ as requests_version
-from requests.exceptions import RequestException
-
 from pypi_cleanup.__version__ import __version__
+from pypi_cleanup.cache import DEFAULT_CACHE_SIZE
+from pypi_cleanup.files import FileSelector
+from pypi_cleanup.journal import DeletionJournal
+from pypi_cleanup.metrics import Metrics
+from pypi_cleanup.output import DELETED, DRY_RUN, FAILED, SELECTED, WRITERS
+from pypi_cleanup.plan import DeletionPlan, PlannedRelease, PypiCleanupError, describe
+from pypi_cleanup.policy import RetentionPolicy
+from pypi_cleanup.stream import STREAM_CHUNK_SIZE, scan_project
+from pypi_cleanup.throttle import (DEFAULT_BACKOFF, DEFAULT_MAX_RETRIES, DEFAULT_MAX_RETRY_AFTER, DEFAULT_RATE_LIMIT,
+                                   RateLimiter)
 
 DEFAULT_PATTERNS = [re.compile(r".*\.dev\d+$")]
+DEFAULT_GRACE_PERIOD = 5.0
+# Warehouse rejects a stale or missing CSRF token with 400 Bad Request
+CSRF_FAILURE_STATUSES = (400, 403)
+BINARY_DIST_EXTS = (".whl", ".egg", ".src.rpm")
+SOURCE_DIST_EXTS = (".tar.gz", ".zip")
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+SIMPLE_API_JSON = "application/vnd.pypi.simple.v1+json"
+UPLOAD_TIME_RE = re.compile(r"(\d{4}-\d\d-\d\d)[T ](\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:?\d\d)?$")
 
+# Networking and HTML parsing are only needed once a cleanup runs, so that `--help`, argument errors and the
+# safety refusals don't pay for importing them. Attribute: (module, name or None for the module itself)
+_LAZY_ATTRS = {
+    "requests": ("requests", None),
+    "getpass": ("getpass", None),
+    "CsfrParser": ("pypi_cleanup.forms", "CsfrParser"),
+    "ProjectsParser": ("pypi_cleanup.forms", "ProjectsParser"),
+    "extract_csrf": ("pypi_cleanup.forms", "extract_csrf"),
+    "parse_projects": ("pypi_cleanup.forms", "parse_projects"),
+}
 
-class CsfrParser(HTMLParser):
-    def __init__(self, target, contains_input=None):
-        super().__init__()
-        self._target = target
-        self._contains_input = contains_input
-        self.csrf = None  # Result value from all forms on page
-        self._csrf = None  # Temp value from current form
-        self._in_form = False  # Currently parsing a form with an action we're interested in
-        self._input_contained = False  # Input field requested is contained in the current form
-
-    def handle_starttag(self, tag, attrs):
-        if tag == "form":
-            attrs = dict(attrs)
-            action = attrs.get("action")  # Might be None.
-            if action and (action == self._target or action.startswith(self._target)):
-                self._in_form = True
-            return
 
-        if self._in_form and tag == "input":
-            attrs = dict(attrs)
-            if attrs.get("name") == "csrf_token":
-                self._csrf = attrs["value"]
+def __getattr__(name):
+    try:
+        module_name, attr = _LAZY_ATTRS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    module = importlib.import_module(module_name)
+    return module if attr is None else getattr(module, attr)
+
 
-            if self._contains_input and attrs.get("name") == self._contains_input:
-                self._input_contained = True
+def normalize_project(name):
+    return name.lower().replace("-", "_")
+
+
+def parse_upload_time(value):
+    """Parses a file upload time emitted by warehouse into integer microseconds since the epoch.
+
+    The canonical `YYYY-MM-DDTHH:MM:SS.ffffff+00:00` form goes straight through `datetime.fromisoformat`.
+    Variants it doesn't accept on older Pythons (no fraction, `Z` suffix, fractions other than 3 or 6 digits)
+    are normalized first. Times without an offset are UTC.
+    """
+    try:
+        dt = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        m = UPLOAD_TIME_RE.match(value)
+        if not m:
+            raise ValueError(f"Invalid upload time {value!r}") from None
+        date, time_, fraction, offset = m.groups()
+        fraction = (fraction or "")[:6].ljust(6, "0")
+        if not offset or offset == "Z":
+            offset = "+00:00"
+        elif len(offset) == 5:
+            offset = f"{offset[:3]}:{offset[3:]}"
+        dt = datetime.datetime.fromisoformat(f"{date}T{time_}.{fraction}{offset}")
+
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return (dt - EPOCH) // MICROSECOND
+
+
+def upload_time_to_datetime(value):
+    return EPOCH + datetime.timedelta(microseconds=value)
 
-            return
 
-    def handle_endtag(self, tag):
-        if tag == "form":
-            self._in_form = False
-            # If we're in a right form that contains the requested input and csrf is not set
-            if (not self._contains_input or self._input_contained) and not self.csrf:
-                self.csrf = self._csrf
+def filename_release_keys(filename):
+    """Yields every `(project, version)` pair a distribution file name can belong to.
+
+    Binary distributions (wheels, eggs, source RPMs) are named `{project}-{version}-{rest}`, so every
+    dash-delimited prefix after the project name is a version candidate. Source distributions are
+    named exactly `{project}-{version}.{ext}`. Names that follow neither grammar yield nothing.
+    """
+    filename = filename.lower()
+    project, sep, rest = filename.partition("-")
+    if not sep:
+        return
+
+    if filename.endswith(BINARY_DIST_EXTS):
+        idx = rest.find("-")
+        while idx >= 0:
+            yield project, rest[:idx]
+            idx = rest.find("-", idx + 1)
+        return
+
+    for ext in SOURCE_DIST_EXTS:
+        if rest.endswith(ext):
+            yield project, rest[:-len(ext)]
             return
 
 
+class ReleaseIndex:
+    """Compact table of the most recent upload time of every version of a single package.
+
+    Files are indexed by version as they are added, so a project document is processed in a single pass
+    and doesn't need to be retained. Upload times are kept as epoch microseconds and only converted to
+    datetimes for the versions returned. With `files`, the name, upload time and candidate versions of every
+    file are retained as well.
+    """
+
+    def __init__(self, package, files=False):
+        self.project = normalize_project(package)
+        self.latest_by_version = {}
+        self.files = [] if files else None
+
+    def add(self, f):
+        upload_time = None
+        versions = [] if self.files is not None else None
+        for file_project, version in filename_release_keys(f["filename"]):
+            if file_project != self.project:
+                break
+            if upload_time is None:
+                upload_time = parse_upload_time(f["upload-time"])
+            latest = self.latest_by_version.get(version)
+            if latest is None or latest < upload_time:
+                self.latest_by_version[version] = upload_time
+            if versions is not None:
+                versions.append(version)
+        if versions:
+            self.files.append((f["filename"], upload_time, versions))
+
+    def releases_by_date(self, versions):
+        latest_by_version = self.latest_by_version
+        return {version: upload_time_to_datetime(latest_by_version[version]) for version in versions
+                if version in latest_by_version}
+
+    def files_by_version(self, versions):
+        """Maps every version that has files to its `(filename, upload_time)` in document order.
+
+        A file belongs to the first of its candidate versions that is a version of the package.
+        """
+        versions = dict.fromkeys(versions)
+        files = {}
+        for filename, upload_time, candidates in self.files:
+            version = next((v for v in candidates if v in versions), None)
+            if version is not None:
+                files.setdefault(version, []).append((filename, upload_time_to_datetime(upload_time)))
+        return {version: files[version] for version in versions if version in files}
+
+    def result(self, versions):
+        return self.files_by_version(versions) if self.files is not None else self.releases_by_date(versions)
+
+
+def releases_by_date(package, project_info, files=False):
+    """Maps every version of `package` that has files to the upload time of its most recent file, or with `files`
+    to the `ReleaseIndex.files_by_version` of its files.
+
+    The result preserves the order of `project_info["versions"]`.
+    """
+    index = ReleaseIndex(package, files)
+    for f in project_info["files"]:
+        index.add(f)
+    return index.result(project_info["versions"])
+
+
+def stream_releases_by_date(package, chunks, files=False):
+    """Same as `releases_by_date`, but parses the project document incrementally from an iterable of byte chunks."""
+    index = ReleaseIndex(package, files)
+    versions = scan_project(chunks, index.add)
+    return index.result(versions)
+
+
+class VersionMatcher:
+    """Matches versions against a list of patterns with a single combined regex.
+
+    Every pattern becomes a group of one alternation, and the group closed last identifies the pattern that
+    matched. `match` returns the first pattern in list order that matches a version, exactly as trying the
+    patterns in turn would. Patterns that can't be safely combined (flags, group references that the combined
+    regex would renumber, clashing group names) are tried in turn instead.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._combined = None
+        self._rules = {}
+
+        default_flags = re.compile("").flags
+        if all(p.flags == default_flags and not references_groups(p) for p in self.patterns):
+            parts = []
+            group = 1
+            for p in self.patterns:
+                self._rules[group] = p
+                parts.append(f"({p.pattern})")
+                group += p.groups + 1
+            try:
+                self._combined = re.compile("|".join(parts))
+            except re.error:
+                self._combined = None
+
+    def match(self, version):
+        if self._combined is not None:
+            m = self._combined.match(version)
+            return self._rules[m.lastindex] if m else None
+
+        for p in self.patterns:
+            if p.match(version):
+                return p
+        return None
+
+
+def references_groups(pattern):
+    """Whether `pattern` refers to its groups, i.e. has backreferences or conditionals, numbered or named."""
+    try:
+        from re import _parser as sre_parse
+    except ImportError:  # Python < 3.11
+        import sre_parse
+
+    # Names are resolved to group numbers by the parser, so the numbers are all there is to look for
+    group_refs = {sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS, sre_parse.GROUPREF_IGNORE}
+
+    def walk(node):
+        if isinstance(node, sre_parse.SubPattern):
+            return any(op in group_refs or walk(av) for op, av in node)
+        if isinstance(node, (tuple, list)):
+            return any(walk(item) for item in node)
+        return False
+
+    return walk(sre_parse.parse(pattern.pattern, pattern.flags))
+
+
+def load_patterns(path):
+    """Reads version regexes from a file, one per line, ignoring blank lines and `#` comments."""
+    patterns = []
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                patterns.append(re.compile(line))
+            except re.error as e:
+                raise ValueError(f"{path}:{lineno}: invalid regex {line!r}: {e}") from None
+    return patterns
+
+
+def parse_shard(value):
+    """Parses `I/N` into `(I, N)`, shards being numbered from 1."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard {value!r}, expected I/N") from None
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"invalid shard {value!r}, I must be between 1 and N")
+    return index, count
+
+
+def glob_matches(name, globs):
+    name = normalize_project(name)
+    return any(fnmatch.fnmatchcase(name, normalize_project(glob)) for glob in globs)
+
+
 class PypiCleanup:
-    def __init__(self, url, username, packages, do_it, patterns, verbose, days, query_only, leave_most_recent_only,
-                 confirm, delete_project, **_):
+    """Cleans up releases of PyPI packages in three stages that can be used separately when embedded:
+
+    `plan` fetches the packages and selects the releases to delete, `authenticate` logs a session in and
+    `execute` deletes the releases of a plan using an authenticated session. `run` drives all of them as
+    the command line tool does. Stages raise `PypiCleanupError` once the failure has been reported.
+    """
+
+    def __init__(self, url, username=None, packages=(), do_it=False, patterns=None, verbose=0, days=0,
+                 query_only=False, leave_most_recent_only=False, confirm=False, delete_project=False, jobs=1,
+                 delete_jobs=1, rate_limit=DEFAULT_RATE_LIMIT, max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF,
+                 cache_dir=None, cache_size=DEFAULT_CACHE_SIZE, journal=None, resume=False,
+                 stream=False, session_store=None, engine="sync", all_projects=False, organization=None, include=None,
+                 exclude=None, metrics_json=None, metrics_prometheus=None, state=None, keep_dev=None,
+                 drop_pre_after_final=False, keep_per_minor=None, write_plan=None, shard=None, merge_journals=None,
+                 non_interactive=False, confirm_plan=None, grace_period=None, reuse_csrf=False,
+                 from_snapshot=None, output=None, file_tags=None, file_pythons=None, file_exts=None,
+                 max_retry_after=DEFAULT_MAX_RETRY_AFTER, **_):
         self.url = urlparse(url).geturl()
         if self.url[-1] == "/":
             self.url = self.url[:-1]
@@ -85,14 +318,621 @@ class PypiCleanup:
         self.delete_project = delete_project
         self.packages = packages
         self.patterns = patterns or DEFAULT_PATTERNS
+        self.matcher = VersionMatcher(self.patterns)
         self.verbose = verbose
         self.query_only = query_only
         self.leave_most_recent_only = leave_most_recent_only
-        self.date = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+        self.days = days
+        self.update_cutoff()
+        self.jobs = jobs
+        self.delete_jobs = delete_jobs
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+        self.cache = None
+        if cache_dir:
+            from pypi_cleanup.cache import MetadataCache
+            self.cache = MetadataCache(cache_dir, cache_size * 1024 * 1024)
+        self.journal = DeletionJournal(journal) if journal else None
+        self.resume = resume
+        self.write_plan = write_plan
+        self.shard = shard
+        self.merge_journals = merge_journals or []
+        self.non_interactive = non_interactive
+        self.confirm_plan = confirm_plan
+        if grace_period is None:
+            # An approved plan needs no second thoughts
+            grace_period = 0.0 if confirm_plan else DEFAULT_GRACE_PERIOD
+        self.grace_period = grace_period
+        self.reuse_csrf = reuse_csrf
+        self.snapshot = None
+        if from_snapshot:
+            from pypi_cleanup.snapshot import Snapshot
+            self.snapshot = Snapshot(from_snapshot, stream)
+        # Logs go to stderr, leaving stdout to the records
+        self.output = WRITERS[output](sys.stdout) if output else None
+        self.csrf_token = None
+        self.stream = stream
+        self.session_store = None
+        if session_store:
+            from pypi_cleanup.session import SessionStore
+            self.session_store = SessionStore(session_store)
+        self.engine = engine
+        self.all_projects = all_projects or organization is not None
+        self.organization = organization
+        self.include = include or []
+        self.exclude = exclude or []
+        self.metrics = Metrics()
+        self.metrics_json = metrics_json
+        self.metrics_prometheus = metrics_prometheus
+        self.policy = RetentionPolicy(keep_dev, drop_pre_after_final, keep_per_minor) or None
+        self.file_selector = FileSelector(file_tags, file_pythons, file_exts) or None
+        self.prune_files = self.file_selector is not None
+        # Files are selected from all releases unless the releases are restricted by patterns
+        self.file_versions = self.matcher if patterns else None
+        self.file_forms = {}  # (package, version): [FileForm] of the release management page
+        self.state = None
+        if state and not leave_most_recent_only and not self.policy and not self.prune_files:
+            from pypi_cleanup.state import SelectionState
+            self.state = SelectionState(state, self.patterns)
 
-    def run(self):
-        csrf = None
+    def fetch_release_dates(self, s, package):
+        url = f"{self.url}/simple/{package}/"
+        headers = {"Accept": SIMPLE_API_JSON}
+        if self.cache:
+            with s.get(url, headers={**headers, **self.cache.validators(url)}, stream=self.stream) as r:
+                r.raise_for_status()
+                if r.status_code != 304:
+                    return self.read_release_dates(package, url, r)
+
+            logging.debug(f"Metadata of package {package!r} has not changed since the last run")
+            cached = self.cache.open(url)
+            if cached:
+                with cached as f:
+                    if self.stream:
+                        return stream_releases_by_date(package, iter(lambda: f.read(STREAM_CHUNK_SIZE), b""),
+                                                       self.prune_files)
+                    return releases_by_date(package, json.load(f), self.prune_files)
+            # Evicted since revalidation, fetching unconditionally
+
+        with s.get(url, headers=headers, stream=self.stream) as r:
+            r.raise_for_status()
+            return self.read_release_dates(package, url, r)
+
+    def read_release_dates(self, package, url, r):
+        if self.stream:
+            chunks = r.iter_content(STREAM_CHUNK_SIZE)
+            if self.cache:
+                chunks = self.cache.store_stream(url, r.headers, chunks)
+            return stream_releases_by_date(package, chunks, self.prune_files)
+
+        if self.cache:
+            content = r.content
+            self.cache.store(url, r.headers, content)
+            return releases_by_date(package, json.loads(content), self.prune_files)
+        return releases_by_date(package, r.json(), self.prune_files)
+
+    def delete_release(self, s, package, pkg_ver):
+        with self.metrics.time("deletion_duration_seconds"):
+            logging.info(f"Deleting {package!r} version {pkg_ver}")
+            form_action = f"/manage/project/{package}/release/{pkg_ver}/"
+            form_url = f"{self.url}{form_action}"
+            # The CSRF token is session-scoped, so once scraped it is good for every release form
+            csrf = self.csrf_token if self.reuse_csrf else None
+            if csrf is not None:
+                with self.post_deletion(s, form_url, csrf, form_url, pkg_ver) as r:
+                    if r.status_code not in CSRF_FAILURE_STATUSES:
+                        r.raise_for_status()
+                        return
+                logging.info(f"The CSRF token was rejected by {form_action}, refreshing it")
+
+            from pypi_cleanup.forms import extract_csrf
+
+            with s.get(form_url, stream=True) as r:
+                r.raise_for_status()
+                csrf = extract_csrf(r, form_action, "confirm_delete_version")
+                if not csrf:
+                    raise ValueError(f"No CSFR found in {form_action}")
+                referer = r.url
+            self.csrf_token = csrf
+
+            with self.post_deletion(s, form_url, csrf, referer, pkg_ver) as r:
+                r.raise_for_status()
+
+    def post_deletion(self, s, form_url, csrf, referer, pkg_ver):
+        return s.post(form_url,
+                      data={"csrf_token": csrf,
+                            "confirm_delete_version": pkg_ver,
+                            },
+                      headers={"referer": referer})
+
+    def delete_file(self, s, package, pkg_ver, filename):
+        with self.metrics.time("deletion_duration_seconds"):
+            logging.info(f"Deleting file {filename} of {package!r} version {pkg_ver}")
+            from pypi_cleanup.forms import find_file_form, parse_file_forms
+
+            form_action = f"/manage/project/{package}/release/{pkg_ver}/"
+            form_url = f"{self.url}{form_action}"
+            # The forms of a release page are good for all of its files, the ids of the files don't change
+            forms = self.file_forms.get((package, pkg_ver))
+            if forms is None:
+                with s.get(form_url) as r:
+                    r.raise_for_status()
+                    forms = self.file_forms[(package, pkg_ver)] = parse_file_forms(r.text)
+            form = find_file_form(forms, filename)
+            if form is None or not form.csrf:
+                raise ValueError(f"No delete form of file {filename} found in {form_action}")
+
+            with s.post(form_url,
+                        data={"csrf_token": form.csrf,
+                              "file_id": form.file_id,
+                              "confirm_project_name": form.project or package,
+                              },
+                        headers={"referer": form_url}) as r:
+                r.raise_for_status()
+                # Warehouse redirects back to the release page whether or not the file was deleted
+                forms = self.file_forms[(package, pkg_ver)] = parse_file_forms(r.text)
+            if find_file_form(forms, filename) is not None:
+                raise ValueError(f"File {filename} was not deleted by {form_action}")
+
+    def delete(self, s, release):
+        if release.filename is None:
+            self.delete_release(s, release.package, release.version)
+        else:
+            self.delete_file(s, release.package, release.version, release.filename)
+
+    def delete_journaled(self, s, release):
+        """Deletes the `release` and journals it right away, returns False if it was found already deleted."""
+        from requests.exceptions import HTTPError
+
+        deleted = True
+        try:
+            self.delete(s, release)
+        except HTTPError as e:
+            if not self.already_deleted(e.response):
+                raise
+            deleted = False
+        if self.journal:
+            self.journal.deleted(*release.key)
+        return deleted
+
+    def already_deleted(self, r):
+        # A deletion of a resumed plan may have completed without being journaled before the interruption
+        return self.resume and r is not None and r.status_code == 404
+
+    def execute(self, s, plan):
+        """Deletes the releases of the `plan` on `delete_jobs` concurrent workers sharing the authenticated session `s`.
+
+        Outcomes are reported per release in plan order, a failed release doesn't stop the others.
+        Returns the list of the `key`s, e.g. `(package, version)`, of the releases and files that failed to be
+        deleted. In dry run mode nothing is deleted.
+        """
+        if not self.do_it:
+            for release in plan:
+                logging.info(f"Would be deleting {release}, but not doing it!")
+                self.record(release, DRY_RUN)
+            return []
+
+        from concurrent.futures import ThreadPoolExecutor
+        from requests.exceptions import RequestException
+
+        releases = list(plan)
+        failed = []
+        executor = ThreadPoolExecutor(max_workers=self.delete_jobs, thread_name_prefix="pypi-cleanup-delete")
+        try:
+            # Deletions are journaled by the workers as they complete, so that an interruption doesn't lose the
+            # ones completed ahead of plan order
+            deletions = [executor.submit(self.delete_journaled, s, release) for release in releases]
+            for release, deletion in zip(releases, deletions):
+                try:
+                    deleted = deletion.result()
+                except (RequestException, ValueError) as e:
+                    logging.error(f"Failed to delete {release}", exc_info=e)
+                    self.metrics.inc("deletions_total", result="failed")
+                    self.record(release, FAILED)
+                    failed.append(release.key)
+                else:
+                    logging.info(f"Deleted {release}" if deleted else f"Already deleted {release}")
+                    self.metrics.inc("deletions_total", result="deleted")
+                    self.record(release, DELETED)
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+        return failed
+
+    def plan(self, s, packages=None):
+        """Fetches `packages` (all packages of the cleanup by default) and selects their releases, or files, to delete.
+
+        Returns the `DeletionPlan`.
+        """
+        if packages is None:
+            packages = self.packages
+        self.update_cutoff()
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        from requests.exceptions import RequestException
+
+        from pypi_cleanup.snapshot import SnapshotError
+
+        plan = DeletionPlan(self.url)
+        if self.snapshot and self.jobs > 1:
+            # Parsing local documents is CPU-bound, so it is done by processes rather than threads
+            executor = ProcessPoolExecutor(max_workers=self.jobs)
+        else:
+            executor = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="pypi-cleanup-fetch")
+        try:
+            # Fetches run concurrently, while results are processed strictly in the order packages were specified
+            if self.snapshot:
+                fetches = [executor.submit(self.snapshot.release_dates, package, self.prune_files)
+                           for package in packages]
+            else:
+                fetches = [executor.submit(self.fetch_release_dates, s, package) for package in packages]
+            for package, fetch in zip(packages, fetches):
+                try:
+                    release_dates = fetch.result()
+                except (RequestException, SnapshotError) as e:
+                    logging.error(f"Unable to find package {package!r}", exc_info=e)
+                    raise PypiCleanupError(f"Unable to find package {package!r}") from e
+
+                select = self.select_files if self.prune_files else self.select_releases
+                for release in select(package, release_dates):
+                    plan.add(release)
+                    self.metrics.inc("releases_planned_total")
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+        return plan
+
+    def projects_url(self):
+        if self.organization:
+            return f"{self.url}/manage/organization/{self.organization}/projects/"
+        return f"{self.url}/manage/projects/"
+
+    def fetch_projects_page(self, s, page):
+        from pypi_cleanup.forms import parse_projects
+
+        with s.get(self.projects_url(), params={"page": page} if page > 1 else None) as r:
+            r.raise_for_status()
+            return parse_projects(r.text)
 
+    def discover_projects(self, s):
+        """Lists the projects the authenticated session `s` can manage, filtered by the include and exclude globs.
+
+        The first page reveals the number of pages, the rest are fetched on `jobs` concurrent workers.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from requests.exceptions import RequestException
+
+        url = self.projects_url()
+        executor = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="pypi-cleanup-discover")
+        try:
+            projects, pages = self.fetch_projects_page(s, 1)
+            for page_projects, _ in executor.map(lambda page: self.fetch_projects_page(s, page), range(2, pages + 1)):
+                projects.extend(page_projects)
+        except RequestException as e:
+            logging.error(f"Unable to list projects at {url}", exc_info=e)
+            raise PypiCleanupError(f"Unable to list projects at {url}") from e
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+        return self.select_projects(projects)
+
+    def update_cutoff(self):
+        """Moves the cutoff of the releases and files old enough to be selected to `days` before now.
+
+        Done at the start of every selection pass, so that a long-lived cleanup doesn't select against a stale cutoff.
+        """
+        self.date = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=self.days)
+
+    def select_projects(self, projects):
+        selected = [project for project in dict.fromkeys(projects)
+                    if (not self.include or glob_matches(project, self.include))
+                    and not glob_matches(project, self.exclude)]
+        logging.info(f"Discovered {len(projects)} project(s) at {self.projects_url()}, "
+                     f"{len(selected)} selected for cleanup")
+        if self.prune_files:
+            logging.info(f"Will delete the files selected by {self.file_selector} from the discovered projects")
+        elif self.leave_most_recent_only:
+            logging.info("Will only leave the MOST RECENT version of the discovered projects")
+        elif self.policy:
+            logging.info(f"Will apply the retention policy {self.policy} to the discovered projects")
+        else:
+            logging.info(f"Will use the following patterns {self.patterns} on the discovered projects")
+        return selected
+
+    def select_releases(self, package, release_dates):
+        """Selects the releases of `package` to delete out of its `release_dates`, returns `PlannedRelease`s."""
+        if not release_dates:
+            logging.info(f"No releases for package {package!r} have been found")
+            return []
+
+        rules = {}
+        if self.leave_most_recent_only:
+            leave_release = max(release_dates, key=release_dates.get)
+            logging.info(
+                f"Leaving the MOST RECENT version for {package!r}: {leave_release} - "
+                f"{release_dates[leave_release].strftime('%Y-%m-%dT%H:%M:%S.%f%z')}")
+            pkg_vers = list(r for r in release_dates if r != leave_release)
+        elif self.policy:
+            # The newest versions retained by a policy are retained regardless of their age
+            rules = {k: rule for k, rule in self.policy.select(release_dates).items() if release_dates[k] < self.date}
+            pkg_vers = [k for k in release_dates if k in rules]
+        else:
+            # Only versions uploaded since the cutoff of an earlier run by the same rule set need matching
+            rules, selected, unmatched = self.match_patterns(release_dates,
+                                                             self.state.load(self.url, package) if self.state else None)
+            pkg_vers = list(rules)
+            if self.state:
+                self.state.save(self.url, package, self.date, unmatched, selected)
+
+        if not pkg_vers:
+            logging.info(f"No releases were found matching specified {'policy' if self.policy else 'patterns'} "
+                         f"and dates in package {package!r}")
+        else:
+            logging.info(f"Found the following releases of package {package!r} to delete:")
+            # The records list the releases when they are written
+            log = logging.debug if self.output else logging.info
+            for pkg_ver in pkg_vers:
+                if (self.policy or len(self.patterns) > 1) and pkg_ver in rules:
+                    log(f" {pkg_ver} (matched {rules[pkg_ver]!r})")
+                else:
+                    log(f" {pkg_ver}")
+
+        if pkg_vers and set(pkg_vers) == set(release_dates.keys()):
+            selection = f"retention policy: {self.policy}" if self.policy else f"patterns: {self.patterns}"
+            msg = f"""
+            WARNING:
+            \tYou have selected the following {selection}
+            \tThese would delete ALL AVAILABLE RELEASED VERSIONS of {package!r}.
+            \tThis will render your project/package permanently inaccessible.
+            """
+
+            if not self.delete_project:
+                print(dedent(f"""
+                {msg}
+                \tSince the costs of an error are too high I'm refusing to do this.
+                \tGoodbye.
+                """), file=sys.stderr)
+                raise PypiCleanupError(f"Refusing to delete all releases of {package!r}", 3)
+            else:
+                print(dedent(f"""
+                {msg}
+                \tSince you've specified "--delete-project", I will proceed anyway.
+                """), file=sys.stderr)
+
+        releases = [PlannedRelease(package, pkg_ver, release_dates[pkg_ver], rules.get(pkg_ver)) for pkg_ver in pkg_vers]
+        if self.output:
+            self.output.write(releases, SELECTED)
+        return releases
+
+    def match_patterns(self, release_dates, known=None):
+        """Matches the versions older than the cutoff against the patterns, returns `{version: pattern}` of the
+        matching ones, `{version: pattern index}` of them when keeping state and the number of unmatched ones.
+
+        The unmatched versions under the cutoff of an earlier run are skipped given the `(cutoff, unmatched, matched)`
+        it is `known` by, unless their number differs from its `unmatched` ones.
+        """
+        mark, unmatched, matched = known or (None, 0, {})
+        rules = {}
+        selected = {}
+        skipped = misses = 0
+        for k, release_date in release_dates.items():
+            if release_date < self.date:
+                index = matched.get(k)
+                if index is not None:
+                    rule = self.patterns[index]
+                elif mark is not None and release_date < mark:
+                    skipped += 1
+                    continue
+                else:
+                    rule = self.matcher.match(k)
+                    if not rule:
+                        misses += 1
+                        continue
+                rules[k] = rule.pattern
+                if self.state:
+                    selected[k] = self.patterns.index(rule)
+        if mark is not None and skipped != unmatched:
+            # Versions appeared under the cutoff, so the unmatched ones are evaluated again
+            logging.debug(f"Found {skipped} unmatched version(s) under the cutoff of an earlier run, "
+                          f"expected {unmatched}")
+            return self.match_patterns(release_dates, (None, 0, matched))
+        return rules, selected, skipped + misses
+
+    def select_files(self, package, files_by_version):
+        """Selects the files of `package` to delete out of its `files_by_version`, returns `PlannedRelease`s
+        of the files, refusing to delete all files of a release."""
+        if not files_by_version:
+            logging.info(f"No releases for package {package!r} have been found")
+            return []
+
+        rule = str(self.file_selector)
+        releases = []
+        for pkg_ver, files in files_by_version.items():
+            if self.file_versions and not self.file_versions.match(pkg_ver):
+                continue
+            selected = [(filename, upload_time) for filename, upload_time in files
+                        if upload_time < self.date and self.file_selector.matches(filename)]
+            if selected and len(selected) == len(files):
+                print(dedent(f"""
+                WARNING:
+                \tYou have selected the following files: {self.file_selector}
+                \tThese selectors would delete ALL FILES of {package!r} version {pkg_ver}.
+                \tDelete the release instead if that's what you want.
+                \tSince the costs of an error are too high I'm refusing to do this.
+                \tGoodbye.
+                """), file=sys.stderr)
+                raise PypiCleanupError(f"Refusing to delete all files of {package!r} version {pkg_ver}", 3)
+            releases.extend(PlannedRelease(package, pkg_ver, upload_time, rule, filename)
+                            for filename, upload_time in selected)
+
+        if not releases:
+            logging.info(f"No files were found matching specified file selectors and dates in package {package!r}")
+        else:
+            logging.info(f"Found the following files of package {package!r} to delete:")
+            log = logging.debug if self.output else logging.info
+            for release in releases:
+                log(f" {release.version}: {release.filename}")
+
+        if self.output:
+            self.output.write(releases, SELECTED)
+        return releases
+
+    def record(self, release, action):
+        if self.output:
+            self.output.write((release,), action)
+
+    def create_session(self):
+        """Returns a new session configured for the PyPI host, that may be reused across cleanups."""
+        import requests
+        from requests.adapters import DEFAULT_POOLSIZE
+
+        from pypi_cleanup.adapter import ThrottlingAdapter
+
+        s = requests.Session()
+        s.headers.update({"User-Agent": f"pypi-cleanup/{__version__} (requests/{requests.__version__})"})
+
+        adapter = ThrottlingAdapter(RateLimiter(self.rate_limit), retries=self.max_retries, backoff=self.backoff,
+                                    metrics=self.metrics, max_retry_after=self.max_retry_after,
+                                    pool_maxsize=max(self.jobs, self.delete_jobs, DEFAULT_POOLSIZE))
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+        return s
+
+    def session_valid(self, s):
+        # Unauthenticated requests to the management pages are redirected to the login form
+        with s.get(f"{self.url}/manage/projects/", allow_redirects=False, stream=True) as r:
+            return r.status_code == 200
+
+    def credentials(self):
+        """Resolves the username from `~/.pypirc` if it wasn't specified, returns the password if it's known."""
+        password = os.getenv("PYPI_CLEANUP_PASSWORD")
+
+        if self.username is None:
+            realpath = os.path.realpath(os.path.expanduser("~/.pypirc"))
+            import configparser
+
+            parser = configparser.RawConfigParser()
+            try:
+                with open(realpath) as f:
+                    parser.read_file(f)
+                    logging.info(f"Using configuration from {realpath}")
+            except FileNotFoundError:
+                logging.error(f"Could not find configuration file {realpath} and no username was set")
+                raise PypiCleanupError("No username")
+            repo = None
+            if self.url == "https://pypi.org":
+                repo = "pypi"
+            if self.url == "https://test.pypi.org":
+                repo = "testpypi"
+            if repo:
+                self.username = parser.get(repo, "username", fallback=None)
+                password = parser.get(repo, "password", fallback=None)
+        return password
+
+    def prompt_password(self):
+        if self.non_interactive:
+            logging.error(f"No password for user {self.username}, set PYPI_CLEANUP_PASSWORD or configure ~/.pypirc")
+            raise PypiCleanupError("No password")
+        import getpass
+
+        return getpass.getpass("Password: ")
+
+    def auth_code(self):
+        """Returns the TOTP code computed from `PYPI_CLEANUP_TOTP_SEED`, the one in `PYPI_CLEANUP_AUTH_CODE`
+        or the one read from the standard input, prompting for it unless running non-interactively."""
+        seed = os.getenv("PYPI_CLEANUP_TOTP_SEED")
+        if seed:
+            try:
+                from pypi_cleanup.totp import totp
+                return totp(seed)
+            except ValueError as e:
+                logging.error(f"Unable to compute the authentication code: {e}")
+                raise PypiCleanupError("Invalid TOTP seed") from None
+
+        auth_code = os.getenv("PYPI_CLEANUP_AUTH_CODE")
+        if auth_code:
+            return auth_code
+
+        if not self.non_interactive:
+            return input("Authentication code: ")
+
+        auth_code = sys.stdin.readline().strip() if not sys.stdin.isatty() else None
+        if not auth_code:
+            logging.error("No authentication code, set PYPI_CLEANUP_TOTP_SEED or PYPI_CLEANUP_AUTH_CODE "
+                          "or pipe the code to the standard input")
+            raise PypiCleanupError("No authentication code")
+        return auth_code
+
+    def check_plan(self, plan):
+        """Logs the digest of the `plan` and verifies it against the approved one before deleting anything."""
+        digest = plan.digest()
+        logging.info(f"Plan digest: {digest}")
+        if self.do_it and self.confirm_plan and self.confirm_plan != digest:
+            logging.error(f"The plan differs from the one approved with --confirm-plan {self.confirm_plan}, "
+                          f"review it and approve it again")
+            raise PypiCleanupError("Plan not approved")
+
+    def authenticate(self, s):
+        """Logs the session `s` into the PyPI host, reusing a stored session if it is still valid."""
+        from pypi_cleanup.forms import extract_csrf
+
+        password = self.credentials()
+
+        if self.session_store:
+            if self.session_store.load(s, self.url, self.username):
+                if self.session_valid(s):
+                    logging.info(f"Reusing the stored session of user {self.username}")
+                    return
+                logging.info(f"The stored session of user {self.username} has expired")
+                s.cookies.clear()
+                self.session_store.discard(self.url, self.username)
+
+        if password is None:
+            password = self.prompt_password()
+
+        with s.get(f"{self.url}/account/login/", stream=True) as r:
+            r.raise_for_status()
+            form_action = "/account/login/"
+            csrf = extract_csrf(r, form_action)
+            if not csrf:
+                raise ValueError(f"No CSFR found in {form_action}")
+
+        two_factor = False
+        with s.post(f"{self.url}/account/login/",
+                    data={"csrf_token": csrf,
+                          "username": self.username,
+                          "password": password},
+                    headers={"referer": f"{self.url}/account/login/"},
+                    stream=True) as r:
+            r.raise_for_status()
+            if r.url == f"{self.url}/account/login/":
+                logging.error(f"Login for user {self.username} failed")
+                raise PypiCleanupError(f"Login for user {self.username} failed")
+
+            if r.url.startswith(f"{self.url}/account/two-factor/"):
+                form_action = r.url[len(self.url):]
+                csrf = extract_csrf(r, form_action)
+                if not csrf:
+                    raise ValueError(f"No CSFR found in {form_action}")
+                two_factor = True
+                two_factor_url = r.url
+
+        if two_factor:
+            auth_code = self.auth_code()
+            with s.post(two_factor_url, data={"csrf_token": csrf,
+                                              "method": "totp",
+                                              "totp_value": auth_code},
+                        headers={"referer": two_factor_url}) as r:
+                r.raise_for_status()
+                if r.url == two_factor_url:
+                    logging.error(f"Authentication code {auth_code} is invalid")
+                    raise PypiCleanupError("Invalid authentication code")
+
+        if self.session_store:
+            self.session_store.save(s, self.url, self.username)
+
+    def run(self):
         if self.verbose:
             logging.root.setLevel(logging.DEBUG)
 
@@ -105,192 +945,118 @@ class PypiCleanup:
             logging.info("Running in QUERY-ONLY mode")
 
         for package in self.packages:
-            if not self.leave_most_recent_only:
-                logging.info(f"Will use the following patterns {self.patterns} on package {package!r}")
-            else:
+            if self.prune_files:
+                logging.info(f"Will delete the files selected by {self.file_selector} from package {package!r}")
+            elif self.leave_most_recent_only:
                 logging.info(f"Will only leave the MOST RECENT version of the package {package!r}")
+            elif self.policy:
+                logging.info(f"Will apply the retention policy {self.policy} to package {package!r}")
+            else:
+                logging.info(f"Will use the following patterns {self.patterns} on package {package!r}")
 
-        with requests.Session() as s:
-            s.headers.update({"User-Agent": f"pypi-cleanup/{__version__} (requests/{requests_version})"})
+        try:
+            if self.merge_journals:
+                try:
+                    self.journal.merge(self.merge_journals)
+                except PypiCleanupError as e:
+                    return e.exit_code
+                return
 
-            pkg_to_pkg_vers = {}
-            for package in self.packages:
-                with s.get(f"{self.url}/simple/{package}/",
-                           headers={"Accept": "application/vnd.pypi.simple.v1+json"}) as r:
-                    try:
-                        r.raise_for_status()
-                    except RequestException as e:
-                        logging.error(f"Unable to find package {package!r}", exc_info=e)
-                        return 1
-
-                    project_info = r.json()
-                    releases_by_date = {}
-
-                    def package_matches_file(p, v, f):
-                        filename = f["filename"].lower()
-                        p = p.lower().replace('-', '_')
-                        if filename.endswith(".whl") or filename.endswith(".egg") or filename.endswith(".src.rpm"):
-                            return filename.startswith(f"{p}-{v}-")
-
-                        return filename in (f"{p}-{v}.tar.gz", f"{p}-{v}.zip")
-
-                    for version in project_info["versions"]:
-                        matches = [datetime.datetime.strptime(f["upload-time"], "%Y-%m-%dT%H:%M:%S.%f%z")
-                                   for f in project_info["files"]
-                                   if package_matches_file(package, version, f)]
-                        if matches:
-                            releases_by_date[version] = max(matches)
-
-                if not releases_by_date:
-                    logging.info(f"No releases for package {package!r} have been found")
-                    continue
+            if self.engine == "async":
+                import asyncio
 
-                if self.leave_most_recent_only:
-                    leave_release = max(releases_by_date, key=releases_by_date.get)
-                    logging.info(
-                        f"Leaving the MOST RECENT version for {package!r}: {leave_release} - "
-                        f"{releases_by_date[leave_release].strftime('%Y-%m-%dT%H:%M:%S.%f%z')}")
-                    pkg_vers = list(r for r in releases_by_date if r != leave_release)
-                else:
-                    pkg_vers = list(filter(lambda k:
-                                           any(filter(lambda rex: rex.match(k),
-                                                      self.patterns)) and releases_by_date[k] < self.date,
-                                           releases_by_date.keys()))
-
-                if not pkg_vers:
-                    logging.info(f"No releases were found matching specified patterns "
-                                 f"and dates in package {package!r}")
-                else:
-                    logging.info(f"Found the following releases of package {package!r} to delete:")
-                    for pkg_ver in pkg_vers:
-                        logging.info(f" {pkg_ver}")
-
-                if pkg_vers and set(pkg_vers) == set(releases_by_date.keys()):
-                    msg = f"""
-                    WARNING:
-                    \tYou have selected the following patterns: {self.patterns}
-                    \tThese patterns would delete ALL AVAILABLE RELEASED VERSIONS of {package!r}.
-                    \tThis will render your project/package permanently inaccessible.
-                    """
-
-                    if not self.delete_project:
-                        print(dedent(f"""
-                        {msg}
-                        \tSince the costs of an error are too high I'm refusing to do this.
-                        \tGoodbye.
-                        """), file=sys.stderr)
-                        return 3
+                from pypi_cleanup.aio import AsyncEngine
+                return asyncio.run(AsyncEngine(self).run())
+
+            with self.create_session() as s:
+                try:
+                    if self.resume:
+                        plan = self.resume_plan()
+                    elif self.all_projects:
+                        # Listing the projects requires logging in before planning
+                        with self.metrics.time("phase_duration_seconds", phase="authenticate"):
+                            self.authenticate(s)
+                        with self.metrics.time("phase_duration_seconds", phase="discover"):
+                            packages = self.discover_projects(s)
+                        with self.metrics.time("phase_duration_seconds", phase="plan"):
+                            plan = self.plan(s, packages)
                     else:
-                        print(dedent(f"""
-                        {msg}
-                        \tSince you've specified "--delete-project", I will proceed anyway.
-                        """), file=sys.stderr)
+                        with self.metrics.time("phase_duration_seconds", phase="plan"):
+                            plan = self.plan(s)
 
-                if pkg_vers:
-                    pkg_to_pkg_vers[package] = pkg_vers
+                    if not self.resume:
+                        self.check_plan(plan)
 
-            if self.query_only:
-                logging.info("Query-only mode - exiting")
-                return
+                    if self.write_plan:
+                        self.save_plan(plan)
+                        return
 
-            if not pkg_to_pkg_vers:
-                return
+                    if self.query_only:
+                        logging.info("Query-only mode - exiting")
+                        return
+
+                    if not plan:
+                        return
+
+                    if self.journal and self.do_it and not self.resume:
+                        self.journal.plan(plan)
 
-            password = os.getenv("PYPI_CLEANUP_PASSWORD")
+                    if self.resume or not self.all_projects:
+                        with self.metrics.time("phase_duration_seconds", phase="authenticate"):
+                            self.authenticate(s)
+                except PypiCleanupError as e:
+                    return e.exit_code
+
+                if self.do_it and self.grace_period:
+                    logging.warning("!!! WILL ACTUALLY DELETE THINGS - LAST CHANCE TO CHANGE YOUR MIND !!!")
+                    logging.warning(f"Sleeping for {self.grace_period:g} seconds - Ctrl-C to abort!")
+                    time.sleep(self.grace_period)
 
-            if self.username is None:
-                realpath = os.path.realpath(os.path.expanduser("~/.pypirc"))
-                parser = configparser.RawConfigParser()
                 try:
-                    with open(realpath) as f:
-                        parser.read_file(f)
-                        logging.info(f"Using configuration from {realpath}")
-                except FileNotFoundError:
-                    logging.error(f"Could not find configuration file {realpath} and no username was set")
-                    return 1
-                repo = None
-                if self.url == "https://pypi.org":
-                    repo = "pypi"
-                if self.url == "https://test.pypi.org":
-                    repo = "testpypi"
-                if repo:
-                    self.username = parser.get(repo, "username", fallback=None)
-                    password = parser.get(repo, "password", fallback=None)
-
-            if password is None:
-                password = getpass.getpass("Password: ")
-
-            with s.get(f"{self.url}/account/login/") as r:
-                r.raise_for_status()
-                form_action = "/account/login/"
-                parser = CsfrParser(form_action)
-                parser.feed(r.text)
-                if not parser.csrf:
-                    raise ValueError(f"No CSFR found in {form_action}")
-                csrf = parser.csrf
-
-            two_factor = False
-            with s.post(f"{self.url}/account/login/",
-                        data={"csrf_token": csrf,
-                              "username": self.username,
-                              "password": password},
-                        headers={"referer": f"{self.url}/account/login/"}) as r:
-                r.raise_for_status()
-                if r.url == f"{self.url}/account/login/":
-                    logging.error(f"Login for user {self.username} failed")
-                    return 1
-
-                if r.url.startswith(f"{self.url}/account/two-factor/"):
-                    form_action = r.url[len(self.url):]
-                    parser = CsfrParser(form_action)
-                    parser.feed(r.text)
-                    if not parser.csrf:
-                        raise ValueError(f"No CSFR found in {form_action}")
-                    csrf = parser.csrf
-                    two_factor = True
-                    two_factor_url = r.url
-
-            if two_factor:
-                auth_code = input("Authentication code: ")
-                with s.post(two_factor_url, data={"csrf_token": csrf,
-                                                  "method": "totp",
-                                                  "totp_value": auth_code},
-                            headers={"referer": two_factor_url}) as r:
-                    r.raise_for_status()
-                    if r.url == two_factor_url:
-                        logging.error(f"Authentication code {auth_code} is invalid")
-                        return 1
+                    with self.metrics.time("phase_duration_seconds", phase="execute"):
+                        failed = self.execute(s, plan)
+                finally:
+                    if self.journal:
+                        self.journal.close()
+                return self.report_failures(failed)
+        finally:
+            if self.state:
+                self.state.close()
+            self.write_metrics()
 
-            if self.do_it:
-                logging.warning("!!! WILL ACTUALLY DELETE THINGS - LAST CHANCE TO CHANGE YOUR MIND !!!")
-                logging.warning("Sleeping for 5 seconds - Ctrl-C to abort!")
-                time.sleep(5.0)
-
-            for package, pkg_vers in pkg_to_pkg_vers.items():
-                for pkg_ver in pkg_vers:
-                    if self.do_it:
-                        logging.info(f"Deleting {package!r} version {pkg_ver}")
-                        form_action = f"/manage/project/{package}/release/{pkg_ver}/"
-                        form_url = f"{self.url}{form_action}"
-                        with s.get(form_url) as r:
-                            r.raise_for_status()
-                            parser = CsfrParser(form_action, "confirm_delete_version")
-                            parser.feed(r.text)
-                            if not parser.csrf:
-                                raise ValueError(f"No CSFR found in {form_action}")
-                            csrf = parser.csrf
-                            referer = r.url
-
-                        with s.post(form_url,
-                                    data={"csrf_token": csrf,
-                                          "confirm_delete_version": pkg_ver,
-                                          },
-                                    headers={"referer": referer}) as r:
-                            r.raise_for_status()
-
-                        logging.info(f"Deleted {package!r} version {pkg_ver}")
-                    else:
-                        logging.info(f"Would be deleting {package!r} version {pkg_ver}, but not doing it!")
+    def resume_plan(self):
+        """Returns the remaining releases of the journaled plan, verifying the plan as a whole against the approved one."""
+        plan = self.journal.resume(self.url)
+        self.check_plan(self.journal.replay()[0])
+        if self.shard:
+            index, count = self.shard
+            plan = plan.shard(index, count)
+            logging.info(f"Shard {index}/{count}: {len(plan)} release(s) to delete")
+        return plan
+
+    def save_plan(self, plan):
+        journal = DeletionJournal(self.write_plan)
+        try:
+            journal.plan(plan)
+        finally:
+            journal.close()
+        logging.info(f"Wrote the plan of {len(plan)} release(s) to {self.write_plan}")
+
+    def write_metrics(self):
+        try:
+            if self.metrics_json:
+                self.metrics.write_json(self.metrics_json)
+            if self.metrics_prometheus:
+                self.metrics.write_prometheus(self.metrics_prometheus)
+        except OSError as e:
+            logging.error("Unable to write metrics", exc_info=e)
+
+    def report_failures(self, failed):
+        if failed:
+            files = any(len(key) > 2 for key in failed)
+            logging.error(f"Failed to delete {len(failed)} {'file(s)' if files else 'release(s)'}: "
+                          f"{', '.join(describe(*key) for key in failed)}")
+            return 1
 
 
 def main():
@@ -300,16 +1066,44 @@ def main():
         parser = argparse.ArgumentParser(description=f"PyPi Package Cleanup Utility v{__version__}",
                                          formatter_class=argparse.ArgumentDefaultsHelpFormatter)
         parser.add_argument("-u", "--username", help="authentication username")
-        parser.add_argument("-p", "--package", dest="packages", action="append", required=True,
+        parser.add_argument("-p", "--package", dest="packages", action="append", default=[],
                             help="PyPI package name")
+        parser.add_argument("--all-projects", action="store_true", default=False,
+                            help="log in and clean up all projects the user can manage instead of the `-p` packages")
+        parser.add_argument("--organization",
+                            help="log in and clean up all projects of the organization instead of the `-p` packages")
+        parser.add_argument("--include", action="append", metavar="GLOB",
+                            help="only clean up the discovered projects with names matching the glob")
+        parser.add_argument("--exclude", action="append", metavar="GLOB",
+                            help="don't clean up the discovered projects with names matching the glob")
         parser.add_argument("-t", "--host", default="https://pypi.org/", dest="url",
                             help="PyPI <proto>://<host> prefix")
         g = parser.add_mutually_exclusive_group()
         g.add_argument("-r", "--version-regex", type=re.compile, action="append",
                        dest="patterns", help="regex to use to match package versions to be deleted")
+        parser.add_argument("--patterns-file",
+                            help="file with regexes to use to match package versions to be deleted, one per line, "
+                                 "in addition to those specified with `-r`")
         g.add_argument("--leave-most-recent-only", action="store_true", default=False,
                        help="delete all releases except the *most recent* one, i.e. the one containing "
                             "the most recently created files")
+        parser.add_argument("--keep-dev", type=int, metavar="N",
+                            help="retention policy: delete all but the N newest .devN releases of every version "
+                                 "they precede, requires `packaging`")
+        parser.add_argument("--drop-pre-after-final", action="store_true", default=False,
+                            help="retention policy: delete the pre-releases of every release that has a final version, "
+                                 "requires `packaging`")
+        parser.add_argument("--keep-per-minor", type=int, metavar="N",
+                            help="retention policy: delete all but the N newest versions of every major.minor line, "
+                                 "requires `packaging`")
+        parser.add_argument("--file-tag", action="append", dest="file_tags", metavar="GLOB",
+                            help="delete the wheels whose `{python}-{abi}-{platform}` tags all match the glob, "
+                                 "e.g. `*-manylinux1_*`, instead of whole releases")
+        parser.add_argument("--file-python", action="append", dest="file_pythons", metavar="GLOB",
+                            help="delete the wheels and eggs whose Python tags all match the glob, e.g. `cp3[67]`, "
+                                 "instead of whole releases")
+        parser.add_argument("--file-ext", action="append", dest="file_exts", metavar="EXT",
+                            help="delete the files with the extension, e.g. `.egg`, instead of whole releases")
         parser.add_argument("--query-only", action="store_true", default=False,
                             help="only queries and processes the package, no login required")
         parser.add_argument("--do-it", action="store_true", default=False,
@@ -320,10 +1114,151 @@ def main():
                             help="confirm extremely dangerous destructive delete")
         parser.add_argument("-d", "--days", type=int, default=0,
                             help="only delete releases **matching specified patterns** where all files are "
-                                 "older than X days")
+                                 "older than X days, or with file selectors, files older than X days")
+        parser.add_argument("-j", "--jobs", type=int, default=1,
+                            help="number of packages to fetch and analyze concurrently")
+        parser.add_argument("--delete-jobs", type=int, default=1,
+                            help="number of releases to delete concurrently")
+        parser.add_argument("--rate-limit", type=float, default=DEFAULT_RATE_LIMIT,
+                            help="maximum number of requests per second to the PyPI host, halved on every "
+                                 "throttling response and recovered gradually; 0, the default, leaves requests "
+                                 "unlimited until the host responds with 429 or 503")
+        parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                            help="number of times to retry a request that failed with a transient error")
+        parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF,
+                            help="base delay in seconds of the jittered exponential backoff between retries "
+                                 "when the server sends no Retry-After")
+        parser.add_argument("--max-retry-after", type=float, default=DEFAULT_MAX_RETRY_AFTER, metavar="SECONDS",
+                            help="maximum number of seconds to wait for when the server asks to retry later with "
+                                 "Retry-After")
+        parser.add_argument("--cache-dir",
+                            help="directory to cache simple-API metadata in, revalidated on every run")
+        parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                            help="maximum size of the metadata cache in MiB")
+        parser.add_argument("--from-snapshot", metavar="PATH",
+                            help="select the releases from the PEP 691 JSON documents of a snapshot or mirror directory, "
+                                 "or of a single package's document, without network access, requires "
+                                 "`--query-only` or `--write-plan`")
+        parser.add_argument("--stream", action="store_true", default=False,
+                            help="parse project metadata incrementally while it is being downloaded, or "
+                                 "memory-mapped from a snapshot, retaining only release dates, to cap peak memory usage")
+        parser.add_argument("--reuse-csrf", action="store_true", default=False,
+                            help="reuse the session-scoped CSRF token of the first release form for every deletion, "
+                                 "refreshing it only when it is rejected, instead of fetching every release form")
+        parser.add_argument("--journal",
+                            help="file to journal planned and completed deletions to, so that an interrupted "
+                                 "cleanup can be resumed")
+        parser.add_argument("--resume", action="store_true", default=False,
+                            help="resume the deletions planned in the journal, skipping the ones already completed, "
+                                 "without querying the packages again")
+        parser.add_argument("--write-plan",
+                            help="file to write the planned deletions to instead of deleting them, to be executed "
+                                 "with `--journal` and `--resume`, e.g. in shards")
+        parser.add_argument("--shard", type=parse_shard, metavar="I/N",
+                            help="only delete the releases of shard I of N of the resumed plan, so that N processes "
+                                 "or machines can execute the same plan at once")
+        parser.add_argument("--merge-journal", action="append", dest="merge_journals", metavar="JOURNAL",
+                            help="merge the deletions completed in a copy of the `--journal`, e.g. by a shard on "
+                                 "another machine, into it and report the progress of the plan")
+        parser.add_argument("--non-interactive", action="store_true", default=False,
+                            help="never prompt: take the password from PYPI_CLEANUP_PASSWORD or ~/.pypirc and "
+                                 "the authentication code from PYPI_CLEANUP_TOTP_SEED, PYPI_CLEANUP_AUTH_CODE or "
+                                 "the standard input")
+        parser.add_argument("--confirm-plan", metavar="DIGEST",
+                            help="only delete if the plan has the digest logged by a previous run, i.e. it was "
+                                 "reviewed and approved")
+        parser.add_argument("--grace-period", type=float, metavar="SECONDS",
+                            help=f"seconds to wait before deleting, {DEFAULT_GRACE_PERIOD:g} by default "
+                                 f"and 0 if the plan is approved with `--confirm-plan`, which is required to wait "
+                                 f"less than {DEFAULT_GRACE_PERIOD:g}")
+        parser.add_argument("--session-store",
+                            help="directory to store the encrypted authenticated session in and reuse it from "
+                                 "on subsequent runs, requires `cryptography`")
+        parser.add_argument("--state",
+                            help="SQLite database to remember the cutoff of the last run and the versions it matched by "
+                                 "the same patterns in, so that repeated runs only evaluate the versions uploaded since")
+        parser.add_argument("--metrics-json",
+                            help="file to write the request, phase and deletion metrics of the run to as JSON")
+        parser.add_argument("--metrics-prometheus",
+                            help="file to write the request, phase and deletion metrics of the run to in the "
+                                 "Prometheus text format, e.g. for the node exporter textfile collector")
+        parser.add_argument("--engine", choices=("sync", "async"), default="sync",
+                            help="run the cleanup on a thread pool with `requests` or on a single asyncio event loop "
+                                 "with `httpx`, the latter requires `httpx` and uses HTTP/2 if `h2` is installed")
+        parser.add_argument("--output", choices=sorted(WRITERS),
+                            help="write a record of every selected release and of the action taken on it to stdout, "
+                                 "as soon as each package has been analyzed and each release has been processed")
         parser.add_argument("-v", "--verbose", action="store_const", const=1, default=0, help="be verbose")
 
         args = parser.parse_args()
+        discover = args.all_projects or args.organization is not None
+        if args.resume:
+            # The packages and releases to delete come from the journal
+            if args.packages or discover:
+                parser.error("--resume is not allowed with -p/--package, --all-projects and --organization")
+        elif not args.merge_journals and discover == bool(args.packages):
+            parser.error("either -p/--package or one of --all-projects and --organization is required")
+        if (args.include or args.exclude) and not discover:
+            parser.error("--include and --exclude require --all-projects or --organization")
+        if args.jobs < 1:
+            parser.error("--jobs must be at least 1")
+        if args.delete_jobs < 1:
+            parser.error("--delete-jobs must be at least 1")
+        if args.patterns_file:
+            if args.leave_most_recent_only:
+                parser.error("--patterns-file is not allowed with --leave-most-recent-only")
+            try:
+                file_patterns = load_patterns(args.patterns_file)
+            except (OSError, ValueError) as e:
+                parser.error(f"unable to load --patterns-file: {e}")
+            if not file_patterns:
+                parser.error(f"--patterns-file {args.patterns_file} contains no patterns")
+            args.patterns = (args.patterns or []) + file_patterns
+        policy = RetentionPolicy(args.keep_dev, args.drop_pre_after_final, args.keep_per_minor)
+        if policy:
+            if args.patterns or args.leave_most_recent_only:
+                parser.error("retention policies are not allowed with -r, --patterns-file and --leave-most-recent-only")
+            if any(n is not None and n < 0 for n in (args.keep_dev, args.keep_per_minor)):
+                parser.error("--keep-dev and --keep-per-minor must not be negative")
+        if args.state and (args.leave_most_recent_only or policy):
+            parser.error("--state is not allowed with --leave-most-recent-only and retention policies")
+        file_selector = FileSelector(args.file_tags, args.file_pythons, args.file_exts)
+        if file_selector and (args.leave_most_recent_only or policy or args.state):
+            parser.error("--file-tag, --file-python and --file-ext are not allowed with --leave-most-recent-only, "
+                         "retention policies and --state")
+        if args.resume and not args.journal:
+            parser.error("--resume requires --journal")
+        if args.merge_journals and not args.journal:
+            parser.error("--merge-journal requires --journal")
+        if args.shard and not args.resume:
+            parser.error("--shard requires --resume")
+        if args.write_plan and args.resume:
+            parser.error("--write-plan is not allowed with --resume")
+        if args.engine == "async" and (args.stream or args.session_store or args.from_snapshot or file_selector):
+            parser.error("--stream, --session-store, --from-snapshot and file selectors are not supported "
+                         "with --engine async")
+        if args.from_snapshot:
+            if discover or args.resume:
+                parser.error("--from-snapshot requires -p/--package and is not allowed with --resume")
+            if not args.query_only and not args.write_plan:
+                parser.error("--from-snapshot requires --query-only or --write-plan")
+            if not os.path.isdir(args.from_snapshot) and len(args.packages) > 1:
+                parser.error("--from-snapshot of a single document requires a single -p/--package")
+        if args.rate_limit < 0 or args.max_retries < 0 or args.backoff < 0 or args.max_retry_after < 0:
+            parser.error("--rate-limit, --max-retries, --backoff and --max-retry-after must not be negative")
+        if args.grace_period is not None and args.grace_period < 0:
+            parser.error("--grace-period must not be negative")
+        if args.grace_period is not None and args.grace_period < DEFAULT_GRACE_PERIOD and not args.confirm_plan:
+            parser.error(f"--grace-period below {DEFAULT_GRACE_PERIOD:g} seconds requires an approved plan, "
+                         f"see --confirm-plan")
+        # Optional dependencies are only imported once needed, so their absence is reported before doing anything
+        if policy and not importlib.util.find_spec("packaging"):
+            parser.error("retention policies require the `packaging` package, install pypi-cleanup[policy]")
+        if args.session_store and not importlib.util.find_spec("cryptography"):
+            parser.error("--session-store requires the `cryptography` package, install pypi-cleanup[session-store]")
+        if args.engine == "async" and not importlib.util.find_spec("httpx"):
+            parser.error("--engine async requires the `httpx` package, install pypi-cleanup[async]")
+
         if args.patterns and not args.confirm and not args.do_it and not args.query_only:
             logging.warning(dedent(f"""
             WARNING:
@@ -335,6 +1270,29 @@ def main():
             \t"""))
             return 3
 
+        if policy and not args.confirm and not args.do_it and not args.query_only:
+            logging.warning(dedent(f"""
+            WARNING:
+            \tYou're using the retention policy: {policy}.
+            \tVersions are deleted based on their PEP 440 ordering, regardless of how they are named.
+            \tMake sure to test the policy with `--query-only` before running the destructive cleanup.
+            \tOnce you're satisfied the policy is correct re-run with `-y`/`--yes` to confirm you know what you're doing.
+            \tGoodbye.
+            \t"""))
+            return 3
+
+        if file_selector and not args.confirm and not args.do_it and not args.query_only:
+            logging.warning(dedent(f"""
+            WARNING:
+            \tYou're deleting individual files selected by: {file_selector}.
+            \tFiles are deleted from releases that are kept, a release without a file for a platform or Python
+            \tcan no longer be installed there.
+            \tMake sure to test the selectors with `--query-only` before running the destructive cleanup.
+            \tOnce you're satisfied the selectors are correct re-run with `-y`/`--yes` to confirm you know what you're doing.
+            \tGoodbye.
+            \t"""))
+            return 3
+
         if args.leave_most_recent_only and not args.confirm and not args.do_it and not args.query_only:
             logging.warning(dedent("""
             WARNING:
@@ -0,0 +1,126 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import logging
+import time
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, ConnectTimeout, Timeout
+from urllib3.exceptions import NewConnectionError
+
+from pypi_cleanup.metrics import record_request, record_response_bytes, record_retry
+from pypi_cleanup.throttle import (DEFAULT_BACKOFF, DEFAULT_MAX_RETRIES, DEFAULT_MAX_RETRY_AFTER, IDEMPOTENT_METHODS,
+                                   OVERLOAD_STATUSES, RETRY_STATUSES, backoff_delay, retry_after)
+
+
+def connection_failed(e):
+    """Whether the request failed before a connection was established, i.e. it was never sent."""
+    if isinstance(e, ConnectTimeout):
+        return True
+    # Refused connections and failed name resolutions are wrapped by urllib3's MaxRetryError
+    reason = e.args[0] if e.args else None
+    return isinstance(getattr(reason, "reason", reason), NewConnectionError)
+
+
+class CountingBody:
+    """Wraps a urllib3 response, passing the size of every chunk of the body read through it to `count`."""
+
+    def __init__(self, raw, count):
+        self._raw = raw
+        self._count = count
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def read(self, *args, **kwargs):
+        data = self._raw.read(*args, **kwargs)
+        self._count(len(data))
+        return data
+
+    def stream(self, *args, **kwargs):
+        for chunk in self._raw.stream(*args, **kwargs):
+            self._count(len(chunk))
+            yield chunk
+
+
+class ThrottlingAdapter(HTTPAdapter):
+    """Transport adapter that rate-limits every request and retries transient warehouse failures.
+
+    Idempotent requests are retried on connection errors and on 429/5xx responses. Other requests
+    (i.e. form POSTs) are only retried when the server explicitly refused to process them with a 429
+    or the connection could not be established at all (timed out, refused or the name didn't resolve).
+    `Retry-After` is honored up to `max_retry_after` seconds.
+    """
+
+    def __init__(self, limiter, retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF, metrics=None,
+                 max_retry_after=DEFAULT_MAX_RETRY_AFTER, **kwargs):
+        super().__init__(**kwargs)
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff = backoff
+        self.metrics = metrics
+        self.max_retry_after = max_retry_after
+
+    def backoff_delay(self, attempt):
+        return backoff_delay(self.backoff, attempt)
+
+    def counted(self, request, response):
+        """Counts the body of `response` towards `response_bytes_total` as it is read, however it is read."""
+        if self.metrics and response.raw is not None:
+            url = request.url
+            response.raw = CountingBody(response.raw, lambda n: record_response_bytes(self.metrics, url, n))
+        return response
+
+    def send(self, request, **kwargs):
+        idempotent = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = super().send(request, **kwargs)
+            except (ConnectionError, Timeout) as e:
+                if self.metrics:
+                    record_request(self.metrics, request.method, request.url, type(e).__name__, time.perf_counter() - start)
+                if attempt >= self.retries or not (idempotent or connection_failed(e)):
+                    raise
+                delay = self.backoff_delay(attempt)
+                self.limiter.throttle(delay)
+                if self.metrics:
+                    record_retry(self.metrics, request.url, type(e).__name__)
+                logging.warning(f"{request.method} {request.url} failed with {e!r}, "
+                                f"retrying in {delay:.1f}s ({attempt + 1}/{self.retries})")
+            else:
+                status = response.status_code
+                if self.metrics:
+                    record_request(self.metrics, request.method, request.url, status, time.perf_counter() - start)
+                if status not in RETRY_STATUSES:
+                    self.limiter.success()
+                    return self.counted(request, response)
+                if attempt >= self.retries or not (idempotent or status == 429):
+                    return self.counted(request, response)
+                delay = retry_after(response, self.max_retry_after)
+                if delay is None:
+                    delay = self.backoff_delay(attempt)
+                self.limiter.throttle(delay, status in OVERLOAD_STATUSES)
+                if self.metrics:
+                    record_retry(self.metrics, request.url, status)
+                response.close()
+                logging.warning(f"{request.method} {request.url} returned {status}, "
+                                f"retrying in {delay:.1f}s ({attempt + 1}/{self.retries})")
+
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,393 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import asyncio
+import json
+import logging
+import time
+
+from pypi_cleanup import CSRF_FAILURE_STATUSES, SIMPLE_API_JSON, releases_by_date
+from pypi_cleanup.__version__ import __version__
+from pypi_cleanup.forms import CsfrParser, parse_projects
+from pypi_cleanup.metrics import record_request, record_response_bytes, record_retry
+from pypi_cleanup.output import DELETED, FAILED
+from pypi_cleanup.plan import DeletionPlan, PypiCleanupError
+from pypi_cleanup.throttle import (IDEMPOTENT_METHODS, OVERLOAD_STATUSES, RETRY_STATUSES, RateLimiter, backoff_delay,
+                                   retry_after)
+
+
+def _httpx():
+    try:
+        import httpx
+    except ImportError:
+        raise RuntimeError("The async engine requires the `httpx` package to be installed") from None
+    return httpx
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _csrf(r, target, contains_input=None):
+    parser = CsfrParser(target, contains_input)
+    parser.feed(r.text)
+    return parser.csrf
+
+
+async def _cancel(tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class AsyncEngine:
+    """Runs the stages of a `PypiCleanup` on a single asyncio event loop with `httpx`.
+
+    Packages are fetched on `jobs` and releases deleted on `delete_jobs` concurrent tasks. Requests are
+    rate-limited and retried the same way the thread pool engine does, and multiplexed over HTTP/2
+    connections if `h2` is installed and the server supports it.
+    """
+
+    def __init__(self, cleanup, transport=None):
+        self.cleanup = cleanup
+        self.transport = transport
+        self.limiter = RateLimiter(cleanup.rate_limit)
+
+    def create_client(self):
+        httpx = _httpx()
+        c = self.cleanup
+        return httpx.AsyncClient(http2=_http2_available(),
+                                 headers={"User-Agent": f"pypi-cleanup/{__version__} (httpx/{httpx.__version__})"},
+                                 limits=httpx.Limits(max_connections=max(c.jobs, c.delete_jobs)),
+                                 follow_redirects=True,
+                                 timeout=None,
+                                 transport=self.transport)
+
+    async def request(self, client, method, url, **kwargs):
+        httpx = _httpx()
+        c = self.cleanup
+        idempotent = method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            wait = self.limiter.reserve()
+            if wait:
+                await asyncio.sleep(wait)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                record_request(c.metrics, method, url, type(e).__name__, time.perf_counter() - start)
+                # ConnectError covers refused connections and failed name resolutions
+                if attempt >= c.max_retries or not (idempotent or isinstance(e, (httpx.ConnectTimeout, httpx.ConnectError))):
+                    raise
+                delay = backoff_delay(c.backoff, attempt)
+                self.limiter.throttle(delay)
+                record_retry(c.metrics, url, type(e).__name__)
+                logging.warning(f"{method} {url} failed with {e!r}, "
+                                f"retrying in {delay:.1f}s ({attempt + 1}/{c.max_retries})")
+            else:
+                status = response.status_code
+                record_request(c.metrics, method, url, status, time.perf_counter() - start)
+                # The client reads the whole body before returning, whatever its transfer encoding
+                record_response_bytes(c.metrics, url, len(response.content))
+                if status not in RETRY_STATUSES:
+                    self.limiter.success()
+                    return response
+                if attempt >= c.max_retries or not (idempotent or status == 429):
+                    return response
+                delay = retry_after(response, c.max_retry_after)
+                if delay is None:
+                    delay = backoff_delay(c.backoff, attempt)
+                self.limiter.throttle(delay, status in OVERLOAD_STATUSES)
+                record_retry(c.metrics, url, status)
+                logging.warning(f"{method} {url} returned {status}, "
+                                f"retrying in {delay:.1f}s ({attempt + 1}/{c.max_retries})")
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def fetch_projects_page(self, client, page):
+        r = await self.request(client, "GET", self.cleanup.projects_url(), params={"page": page} if page > 1 else None)
+        r.raise_for_status()
+        return parse_projects(r.text)
+
+    async def discover_projects(self, client):
+        """Lists the projects the authenticated `client` can manage, filtered by the include and exclude globs."""
+        httpx = _httpx()
+        c = self.cleanup
+        url = c.projects_url()
+        semaphore = asyncio.Semaphore(c.jobs)
+
+        async def fetch(page):
+            async with semaphore:
+                return await self.fetch_projects_page(client, page)
+
+        fetches = []
+        try:
+            projects, pages = await self.fetch_projects_page(client, 1)
+            fetches = [asyncio.ensure_future(fetch(page)) for page in range(2, pages + 1)]
+            for page_fetch in fetches:
+                page_projects, _ = await page_fetch
+                projects.extend(page_projects)
+        except httpx.HTTPError as e:
+            logging.error(f"Unable to list projects at {url}", exc_info=e)
+            raise PypiCleanupError(f"Unable to list projects at {url}") from e
+        finally:
+            await _cancel(fetches)
+
+        return c.select_projects(projects)
+
+    async def fetch_release_dates(self, client, package):
+        c = self.cleanup
+        url = f"{c.url}/simple/{package}/"
+        headers = {"Accept": SIMPLE_API_JSON}
+        if c.cache:
+            r = await self.request(client, "GET", url, headers={**headers, **c.cache.validators(url)})
+            if r.status_code != 304:
+                return self.read_release_dates(package, url, r)
+
+            logging.debug(f"Metadata of package {package!r} has not changed since the last run")
+            cached = c.cache.load(url)
+            if cached is not None:
+                return releases_by_date(package, json.loads(cached))
+            # Evicted since revalidation, fetching unconditionally
+
+        r = await self.request(client, "GET", url, headers=headers)
+        return self.read_release_dates(package, url, r)
+
+    def read_release_dates(self, package, url, r):
+        r.raise_for_status()
+        if self.cleanup.cache:
+            self.cleanup.cache.store(url, r.headers, r.content)
+        return releases_by_date(package, r.json())
+
+    async def plan(self, client, packages=None):
+        """Fetches `packages` (all packages of the cleanup by default) and selects their releases to delete.
+
+        Returns the `DeletionPlan`.
+        """
+        httpx = _httpx()
+        c = self.cleanup
+        if packages is None:
+            packages = c.packages
+        c.update_cutoff()
+        plan = DeletionPlan(c.url)
+        semaphore = asyncio.Semaphore(c.jobs)
+
+        async def fetch(package):
+            async with semaphore:
+                return await self.fetch_release_dates(client, package)
+
+        fetches = [asyncio.ensure_future(fetch(package)) for package in packages]
+        try:
+            # Results are processed strictly in the order packages were specified
+            for package, fetch in zip(packages, fetches):
+                try:
+                    release_dates = await fetch
+                except httpx.HTTPError as e:
+                    logging.error(f"Unable to find package {package!r}", exc_info=e)
+                    raise PypiCleanupError(f"Unable to find package {package!r}") from e
+
+                for release in c.select_releases(package, release_dates):
+                    plan.add(release)
+                    c.metrics.inc("releases_planned_total")
+        finally:
+            await _cancel(fetches)
+
+        return plan
+
+    async def authenticate(self, client):
+        """Logs the `client` into the PyPI host."""
+        c = self.cleanup
+        password = c.credentials()
+        if password is None:
+            password = c.prompt_password()
+
+        login_url = f"{c.url}/account/login/"
+        r = await self.request(client, "GET", login_url)
+        r.raise_for_status()
+        form_action = "/account/login/"
+        csrf = _csrf(r, form_action)
+        if not csrf:
+            raise ValueError(f"No CSFR found in {form_action}")
+
+        r = await self.request(client, "POST", login_url,
+                               data={"csrf_token": csrf,
+                                     "username": c.username,
+                                     "password": password},
+                               headers={"referer": login_url})
+        r.raise_for_status()
+        if str(r.url) == login_url:
+            logging.error(f"Login for user {c.username} failed")
+            raise PypiCleanupError(f"Login for user {c.username} failed")
+
+        if str(r.url).startswith(f"{c.url}/account/two-factor/"):
+            two_factor_url = str(r.url)
+            form_action = two_factor_url[len(c.url):]
+            csrf = _csrf(r, form_action)
+            if not csrf:
+                raise ValueError(f"No CSFR found in {form_action}")
+
+            auth_code = c.auth_code()
+            r = await self.request(client, "POST", two_factor_url,
+                                   data={"csrf_token": csrf,
+                                         "method": "totp",
+                                         "totp_value": auth_code},
+                                   headers={"referer": two_factor_url})
+            r.raise_for_status()
+            if str(r.url) == two_factor_url:
+                logging.error(f"Authentication code {auth_code} is invalid")
+                raise PypiCleanupError("Invalid authentication code")
+
+    async def delete_release(self, client, package, pkg_ver):
+        with self.cleanup.metrics.time("deletion_duration_seconds"):
+            logging.info(f"Deleting {package!r} version {pkg_ver}")
+            form_action = f"/manage/project/{package}/release/{pkg_ver}/"
+            form_url = f"{self.cleanup.url}{form_action}"
+            csrf = self.cleanup.csrf_token if self.cleanup.reuse_csrf else None
+            if csrf is not None:
+                r = await self.post_deletion(client, form_url, csrf, form_url, pkg_ver)
+                if r.status_code not in CSRF_FAILURE_STATUSES:
+                    r.raise_for_status()
+                    return
+                logging.info(f"The CSRF token was rejected by {form_action}, refreshing it")
+
+            r = await self.request(client, "GET", form_url)
+            r.raise_for_status()
+            csrf = _csrf(r, form_action, "confirm_delete_version")
+            if not csrf:
+                raise ValueError(f"No CSFR found in {form_action}")
+            self.cleanup.csrf_token = csrf
+
+            r = await self.post_deletion(client, form_url, csrf, str(r.url), pkg_ver)
+            r.raise_for_status()
+
+    async def post_deletion(self, client, form_url, csrf, referer, pkg_ver):
+        return await self.request(client, "POST", form_url,
+                                  data={"csrf_token": csrf,
+                                        "confirm_delete_version": pkg_ver,
+                                        },
+                                  headers={"referer": referer})
+
+    async def execute(self, client, plan):
+        """Deletes the releases of the `plan` on `delete_jobs` concurrent tasks sharing the authenticated `client`.
+
+        Returns the list of `(package, version)` that failed to be deleted. In dry run mode nothing is deleted.
+        """
+        httpx = _httpx()
+        c = self.cleanup
+        if not c.do_it:
+            return c.execute(None, plan)
+
+        semaphore = asyncio.Semaphore(c.delete_jobs)
+
+        async def delete(release):
+            if release.filename is not None:
+                raise ValueError("File deletions are not supported by the async engine")
+            deleted = True
+            async with semaphore:
+                try:
+                    await self.delete_release(client, release.package, release.version)
+                except httpx.HTTPStatusError as e:
+                    if not c.already_deleted(e.response):
+                        raise
+                    deleted = False
+            # Journaled as soon as completed, not in plan order
+            if c.journal:
+                c.journal.deleted(*release.key)
+            return deleted
+
+        releases = list(plan)
+        failed = []
+        deletions = [asyncio.ensure_future(delete(release)) for release in releases]
+        try:
+            for release, deletion in zip(releases, deletions):
+                try:
+                    deleted = await deletion
+                except (httpx.HTTPError, ValueError) as e:
+                    logging.error(f"Failed to delete {release}", exc_info=e)
+                    c.metrics.inc("deletions_total", result="failed")
+                    c.record(release, FAILED)
+                    failed.append(release.key)
+                else:
+                    logging.info(f"Deleted {release}" if deleted else f"Already deleted {release}")
+                    c.metrics.inc("deletions_total", result="deleted")
+                    c.record(release, DELETED)
+        finally:
+            await _cancel(deletions)
+
+        return failed
+
+    async def run(self):
+        c = self.cleanup
+        if c.prune_files:
+            logging.error("File selectors are not supported by the async engine")
+            return 1
+        async with self.create_client() as client:
+            try:
+                if c.resume:
+                    plan = c.resume_plan()
+                elif c.all_projects:
+                    # Listing the projects requires logging in before planning
+                    with c.metrics.time("phase_duration_seconds", phase="authenticate"):
+                        await self.authenticate(client)
+                    with c.metrics.time("phase_duration_seconds", phase="discover"):
+                        packages = await self.discover_projects(client)
+                    with c.metrics.time("phase_duration_seconds", phase="plan"):
+                        plan = await self.plan(client, packages)
+                else:
+                    with c.metrics.time("phase_duration_seconds", phase="plan"):
+                        plan = await self.plan(client)
+
+                if not c.resume:
+                    c.check_plan(plan)
+
+                if c.write_plan:
+                    c.save_plan(plan)
+                    return
+
+                if c.query_only:
+                    logging.info("Query-only mode - exiting")
+                    return
+
+                if not plan:
+                    return
+
+                if c.journal and c.do_it and not c.resume:
+                    c.journal.plan(plan)
+
+                if c.resume or not c.all_projects:
+                    with c.metrics.time("phase_duration_seconds", phase="authenticate"):
+                        await self.authenticate(client)
+            except PypiCleanupError as e:
+                return e.exit_code
+
+            if c.do_it and c.grace_period:
+                logging.warning("!!! WILL ACTUALLY DELETE THINGS - LAST CHANCE TO CHANGE YOUR MIND !!!")
+                logging.warning(f"Sleeping for {c.grace_period:g} seconds - Ctrl-C to abort!")
+                await asyncio.sleep(c.grace_period)
+
+            try:
+                with c.metrics.time("phase_duration_seconds", phase="execute"):
+                    failed = await self.execute(client, plan)
+            finally:
+                if c.journal:
+                    c.journal.close()
+            return c.report_failures(failed)
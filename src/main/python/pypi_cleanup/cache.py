@@ -0,0 +1,142 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import json
+import logging
+import os
+import tempfile
+import threading
+
+DEFAULT_CACHE_SIZE = 512  # MiB
+
+
+class MetadataCache:
+    """Size-bounded on-disk cache of simple-API documents revalidated with conditional requests.
+
+    Every URL is stored as a pair of files named after the hash of the URL: `<key>.json` holds the
+    validators (`ETag`, `Last-Modified`) and `<key>.body` holds the raw document. Once the total size
+    exceeds `max_size` bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_CACHE_SIZE * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url, ext):
+        # Loads OpenSSL, which the command line doesn't need until a cleanup runs
+        import hashlib
+
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ext)
+
+    def validators(self, url):
+        """Returns conditional request headers for a cached `url`, an empty dict if nothing is cached."""
+        try:
+            with open(self._path(url, ".json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if meta.get("url") != url or not os.path.exists(self._path(url, ".body")):
+            return {}
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def open(self, url):
+        """Returns the cached document body for `url` opened for binary reading or None if it has been evicted."""
+        body_path = self._path(url, ".body")
+        try:
+            f = open(body_path, "rb")
+        except OSError:
+            return None
+        os.utime(body_path)
+        return f
+
+    def load(self, url):
+        """Returns the cached document body for `url` or None if it has been evicted."""
+        f = self.open(url)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def store(self, url, headers, content):
+        if headers.get("ETag") or headers.get("Last-Modified"):
+            self._commit(url, headers, self._write(content))
+
+    def store_stream(self, url, headers, chunks):
+        """Yields `chunks` through while writing them to the cache, the entry is only stored once they are exhausted."""
+        if not headers.get("ETag") and not headers.get("Last-Modified"):
+            yield from chunks
+            return
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            self._commit(url, headers, tmp_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def _commit(self, url, headers, body_tmp_path):
+        meta_tmp_path = self._write(json.dumps({"url": url,
+                                                "etag": headers.get("ETag"),
+                                                "last_modified": headers.get("Last-Modified")}).encode("utf-8"))
+        with self._lock:
+            os.replace(body_tmp_path, self._path(url, ".body"))
+            os.replace(meta_tmp_path, self._path(url, ".json"))
+            self._evict()
+
+    def _write(self, content):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return tmp_path
+
+    def _evict(self):
+        entries = []
+        total_size = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".body"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_size += stat.st_size
+
+        entries.sort()
+        for _, size, body_path in entries:
+            if total_size <= self.max_size:
+                break
+            logging.debug(f"Evicting {body_path} from the metadata cache")
+            for path in (body_path, body_path[:-len(".body")] + ".json"):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            total_size -= size
@@ -0,0 +1,99 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import fnmatch
+import re
+
+EGG_PYTHON_RE = re.compile(r"^py(\d+)(?:\.(\d+))?$")
+# The stable ABI, a wheel built for it with `cp36` is installable on every CPython from 3.6 on
+STABLE_ABI = "abi3"
+
+
+def _wheel_tag_triples(filename):
+    if not filename.lower().endswith(".whl"):
+        return []
+    parts = filename[:-4].split("-")
+    if len(parts) not in (5, 6):
+        return []
+    pythons, abis, platforms = parts[-3:]
+    # The Python tag of a stable ABI wheel is open-ended, e.g. `cp36+`
+    return [(f"{python}+" if abi == STABLE_ABI else python, abi, platform) for python in pythons.split(".")
+            for abi in abis.split(".") for platform in platforms.split(".")]
+
+
+def wheel_tags(filename):
+    """Returns the set of `{python}-{abi}-{platform}` tags a wheel is compatible with, compressed tag sets
+    expanded, or an empty set if `filename` isn't a wheel. The Python tag of the `abi3` tags is open-ended,
+    e.g. `cp36+-abi3-manylinux2014_x86_64`."""
+    return {"-".join(triple) for triple in _wheel_tag_triples(filename)}
+
+
+def python_tags(filename):
+    """Returns the set of Python tags a wheel or an egg is built for, e.g. `cp38`, `py27` or the open-ended
+    `cp36+` of an `abi3` wheel, or an empty set."""
+    lower = filename.lower()
+    if lower.endswith(".whl"):
+        return {python for python, _, _ in _wheel_tag_triples(filename)}
+    if lower.endswith(".egg"):
+        # {name}-{version}-py{X.Y}[-{platform}].egg
+        for part in filename[:-4].split("-")[2:]:
+            m = EGG_PYTHON_RE.match(part)
+            if m:
+                return {f"py{m.group(1)}{m.group(2) or ''}"}
+    return set()
+
+
+def _all_match(tags, globs):
+    return bool(tags) and all(any(fnmatch.fnmatchcase(tag, glob) for glob in globs) for tag in tags)
+
+
+class FileSelector:
+    """Selects individual distribution files to delete rather than whole releases.
+
+    `tags` are globs of the `{python}-{abi}-{platform}` tags of wheels, `pythons` are globs of the Python tags of
+    wheels and eggs and `extensions` are file name suffixes. A file is selected if it matches every kind of
+    selector given. A tag selector only matches a file if all the tags the file is compatible with match, so
+    that a file still installable on a kept platform or Python isn't deleted, and never matches files without
+    tags such as source distributions. As an `abi3` wheel is installable on all later CPythons too, its Python
+    tag, e.g. `cp36+`, is only matched by globs covering them, e.g. `cp3*`, or by asking for it explicitly.
+    """
+
+    def __init__(self, tags=None, pythons=None, extensions=None):
+        self.tags = tags or []
+        self.pythons = pythons or []
+        self.extensions = [(ext if ext.startswith(".") else f".{ext}").lower() for ext in extensions or []]
+
+    def __bool__(self):
+        return bool(self.tags or self.pythons or self.extensions)
+
+    def __str__(self):
+        selectors = []
+        if self.tags:
+            selectors.append(f"tag={','.join(self.tags)}")
+        if self.pythons:
+            selectors.append(f"python={','.join(self.pythons)}")
+        if self.extensions:
+            selectors.append(f"ext={','.join(self.extensions)}")
+        return ", ".join(selectors)
+
+    def matches(self, filename):
+        if self.extensions and not filename.lower().endswith(tuple(self.extensions)):
+            return False
+        if self.tags and not _all_match(wheel_tags(filename), self.tags):
+            return False
+        if self.pythons and not _all_match(python_tags(filename), self.pythons):
+            return False
+        return True
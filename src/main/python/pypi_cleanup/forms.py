@@ -0,0 +1,175 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import re
+from collections import deque, namedtuple
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+CSRF_CHUNK_SIZE = 8192
+MANAGED_PROJECT_RE = re.compile(r"^/manage/project/([^/]+)/")
+PAGE_RE = re.compile(r"(?:^|&)page=(\d+)(?:&|$)")
+# A file name is only found in text when not surrounded by file name characters, save for a full stop ending a sentence
+FILENAME_BOUNDARY = r"(?<![\w.+!-]){}(?!\.?[\w+!-])"
+
+# A per-file delete form of a release management page, `project` is the name to confirm the deletion with
+FileForm = namedtuple("FileForm", ("file_id", "project", "csrf", "text"))
+
+
+def _attr(attrs, name):
+    # Last occurrence wins, same as `dict(attrs)`
+    value = None
+    for attr_name, attr_value in attrs:
+        if attr_name == name:
+            value = attr_value
+    return value
+
+
+class CsfrParser(HTMLParser):
+    def __init__(self, target, contains_input=None):
+        super().__init__()
+        self._target = target
+        self._contains_input = contains_input
+        self.csrf = None  # Result value from all forms on page
+        self._csrf = None  # Temp value from current form
+        self._in_form = False  # Currently parsing a form with an action we're interested in
+        self._input_contained = False  # Input field requested is contained in the current form
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "form":
+            action = _attr(attrs, "action")  # Might be None.
+            if action and (action == self._target or action.startswith(self._target)):
+                self._in_form = True
+            return
+
+        if self._in_form and tag == "input":
+            name = _attr(attrs, "name")
+            if name == "csrf_token":
+                self._csrf = _attr(attrs, "value")
+
+            if self._contains_input and name == self._contains_input:
+                self._input_contained = True
+
+            return
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._in_form = False
+            # If we're in a right form that contains the requested input and csrf is not set
+            if (not self._contains_input or self._input_contained) and not self.csrf:
+                self.csrf = self._csrf
+            return
+
+
+def extract_csrf(r, target, contains_input=None):
+    """Returns the CSRF token `CsfrParser` finds in the response, feeding it the body as it's being downloaded.
+
+    The token can't change once the first qualifying form has been closed, so parsing stops right there. The rest
+    of a streamed page is still read without parsing it, as closing a partly read response drops its connection
+    instead of returning it to the pool.
+    """
+    parser = CsfrParser(target, contains_input)
+    if r.encoding is None:
+        r.encoding = "utf-8"
+    chunks = r.iter_content(CSRF_CHUNK_SIZE, decode_unicode=True)
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.csrf:
+            deque(chunks, maxlen=0)
+            break
+    return parser.csrf
+
+
+class ProjectsParser(HTMLParser):
+    """Collects the names of the projects linked from a project management page and its number of pages."""
+
+    def __init__(self):
+        super().__init__()
+        self.projects = {}  # Ordered set of project names
+        self.pages = 1
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            href = _attr(attrs, "href")
+            if not href:
+                return
+            url = urlparse(href)
+            m = MANAGED_PROJECT_RE.match(url.path)
+            if m:
+                self.projects[m.group(1)] = None
+            m = PAGE_RE.search(url.query)
+            if m:
+                self.pages = max(self.pages, int(m.group(1)))
+
+
+def parse_projects(text):
+    """Returns the project names linked from a project management page and the number of pages."""
+    parser = ProjectsParser()
+    parser.feed(text)
+    parser.close()
+    return list(parser.projects), parser.pages
+
+
+class FileFormsParser(HTMLParser):
+    """Collects the forms of a release management page that delete a single file, i.e. post a `file_id`."""
+
+    def __init__(self):
+        super().__init__()
+        self.forms = []
+        self._inputs = None  # {name: (value, placeholder)} of the current form, None outside of a form
+        self._text = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "form":
+            self._inputs = {}
+            self._text = []
+            return
+
+        if self._inputs is not None and tag == "input":
+            name = _attr(attrs, "name")
+            if name:
+                self._inputs[name] = (_attr(attrs, "value"), _attr(attrs, "placeholder"))
+
+    def handle_data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "form" and self._inputs is not None:
+            inputs = self._inputs
+            if inputs.get("file_id", (None,))[0]:
+                self.forms.append(FileForm(inputs["file_id"][0], inputs.get("confirm_project_name", (None, None))[1],
+                                           inputs.get("csrf_token", (None,))[0], " ".join(self._text)))
+            self._inputs = self._text = None
+
+
+def parse_file_forms(text):
+    """Returns the `FileForm`s of the per-file delete forms of a release management page."""
+    parser = FileFormsParser()
+    parser.feed(text)
+    parser.close()
+    return parser.forms
+
+
+def find_file_form(forms, filename):
+    """Returns the form of `forms` that deletes `filename`, i.e. the only one naming it, or None.
+
+    Forms only identify their file by id, so a form is attributed to the file it names in its text, e.g. in
+    the title of its confirmation dialog, and a form is never guessed when no or several forms name the file.
+    """
+    name_re = re.compile(FILENAME_BOUNDARY.format(re.escape(filename)))
+    matching = [form for form in forms if name_re.search(form.text)]
+    return matching[0] if len(matching) == 1 else None
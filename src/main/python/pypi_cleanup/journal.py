@@ -0,0 +1,144 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import json
+import logging
+import os
+import threading
+
+from pypi_cleanup.plan import DeletionPlan, PypiCleanupError
+
+
+class DeletionJournal:
+    """Append-only JSON-lines journal of planned and completed deletions.
+
+    The first record holds the plan, every following record marks one release, or file, as deleted. Each record is
+    fsync'd before the call returns, so a journal survives the process being killed at any point. A torn
+    trailing record left by a crash is ignored on replay.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._f = None
+
+    def _append(self, record):
+        with self._lock:
+            if self._f is None:
+                self._f = open(self.path, "a", encoding="utf-8")
+                # A record torn by a crash must not be continued by the first record appended after it
+                if self._torn():
+                    self._f.write("\n")
+            self._f.write(json.dumps(record) + "\n")
+            self._f.flush()
+            os.fsync(self._f.fileno())
+
+    def _torn(self):
+        with open(self.path, "rb") as f:
+            if not f.seek(0, os.SEEK_END):
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def plan(self, plan):
+        with self._lock:
+            # A new plan starts a new journal
+            if self._f is not None:
+                self._f.close()
+            self._f = open(self.path, "w", encoding="utf-8")
+        self._append({"event": "plan", "plan": plan.to_dict()})
+        logging.info(f"Journaling deletions to {self.path}")
+
+    def deleted(self, package, version, filename=None):
+        record = {"event": "deleted", "package": package, "version": version}
+        if filename is not None:
+            record["filename"] = filename
+        self._append(record)
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+    def replay(self):
+        """Returns a tuple of the journaled `DeletionPlan` (None if there is none) and the set of the `key`s of
+        the completed deletions."""
+        plan = None
+        deleted = set()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logging.warning(f"Ignoring a torn record in journal {self.path}")
+                    continue
+                if record["event"] == "plan":
+                    plan = DeletionPlan.from_dict(record["plan"])
+                    deleted = set()
+                elif record["event"] == "deleted":
+                    key = record["package"], record["version"]
+                    deleted.add(key + (record["filename"],) if "filename" in record else key)
+        return plan, deleted
+
+    def _replay_plan(self):
+        try:
+            plan, deleted = self.replay()
+        except FileNotFoundError:
+            logging.error(f"Journal {self.path} does not exist")
+            raise PypiCleanupError(f"Journal {self.path} does not exist") from None
+
+        if plan is None:
+            logging.error(f"Journal {self.path} contains no plan")
+            raise PypiCleanupError(f"Journal {self.path} contains no plan")
+        return plan, deleted
+
+    def merge(self, paths):
+        """Appends the deletions recorded in copies of this journal at `paths`, e.g. by shards on other machines."""
+        plan, deleted = self._replay_plan()
+        merged = set()
+        for path in paths:
+            other_plan, other_deleted = DeletionJournal(path)._replay_plan()
+            if other_plan != plan:
+                logging.error(f"Journal {path} holds a different plan than {self.path}")
+                raise PypiCleanupError(f"Journal {path} holds a different plan than {self.path}")
+            merged |= other_deleted - deleted
+
+        try:
+            for key in sorted(merged):
+                self.deleted(*key)
+        finally:
+            self.close()
+        deleted |= merged
+        logging.info(f"Merged {len(merged)} deletion(s) into journal {self.path}: "
+                     f"{len(deleted)} of {len(plan)} planned releases deleted, "
+                     f"{len(plan.without(deleted))} remaining")
+        return plan.without(deleted)
+
+    def resume(self, url):
+        """Returns the `DeletionPlan` of releases in the journal that haven't been deleted yet."""
+        plan, deleted = self._replay_plan()
+        if plan.url != url:
+            logging.error(f"Journal {self.path} was planned against {plan.url}, not {url}")
+            raise PypiCleanupError(f"Journal {self.path} was planned against {plan.url}")
+
+        remaining = plan.without(deleted)
+        logging.info(f"Resuming journal {self.path}: {len(remaining)} of {len(plan)} planned releases remaining")
+        for package, package_releases in remaining.releases.items():
+            logging.info(f"Remaining releases of package {package!r} to delete:")
+            for release in package_releases:
+                logging.info(f" {release.version}" if release.filename is None else f" {release.version}: {release.filename}")
+        return remaining
@@ -0,0 +1,190 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+PREFIX = "pypi_cleanup_"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Name: (type, help)
+METRICS = {
+    "requests_total": ("counter", "HTTP requests sent to the PyPI host, including retries"),
+    "retries_total": ("counter", "HTTP requests retried after a transient failure"),
+    "response_bytes_total": ("counter", "Bytes of HTTP response bodies read"),
+    "request_duration_seconds": ("histogram", "Time until HTTP response headers were received"),
+    "phase_duration_seconds": ("histogram", "Duration of the cleanup phases"),
+    "releases_planned_total": ("counter", "Releases or files selected for deletion"),
+    "deletions_total": ("counter", "Release or file deletions attempted by result"),
+    "deletion_duration_seconds": ("histogram", "Duration of a release or file deletion, form retrieval included"),
+}
+
+
+def endpoint(url):
+    """Classifies a PyPI URL into the endpoint label of request metrics."""
+    path = urlparse(url).path
+    if path.startswith("/simple/"):
+        return "simple"
+    if path.startswith("/account/login/"):
+        return "login"
+    if path.startswith("/account/two-factor/"):
+        return "two_factor"
+    if path.startswith("/manage/project/") and "/release/" in path:
+        return "release"
+    if path.startswith("/manage/projects/") or path.startswith("/manage/organization/"):
+        return "projects"
+    return "other"
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for le, count in zip(BUCKETS + (float("inf"),), self.counts):
+            total += count
+            yield le, total
+
+
+class Metrics:
+    """Thread-safe counters and latency histograms of a cleanup, exported as JSON or as a Prometheus textfile."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}  # (name, labels): float or _Histogram
+
+    @staticmethod
+    def _key(name, labels):
+        if name not in METRICS:
+            raise KeyError(f"Unknown metric {name!r}")
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = _Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def time(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def value(self, name, **labels):
+        """Returns the value of a counter, or the number of observations of a histogram."""
+        with self._lock:
+            value = self._values.get(self._key(name, labels), 0)
+            return value.count if isinstance(value, _Histogram) else value
+
+    def to_dict(self):
+        result = {}
+        with self._lock:
+            for (name, labels), value in sorted(self._values.items(), key=lambda item: item[0]):
+                sample = {"labels": dict(labels)}
+                if isinstance(value, _Histogram):
+                    sample.update(count=value.count, sum=value.sum,
+                                  buckets={str(le): count for le, count in value.cumulative()})
+                else:
+                    sample["value"] = value
+                result.setdefault(PREFIX + name, []).append(sample)
+        return result
+
+    def to_prometheus(self):
+        lines = []
+        samples = self.to_dict()
+        for name, (metric_type, help_text) in METRICS.items():
+            full_name = PREFIX + name
+            if full_name not in samples:
+                continue
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for sample in samples[full_name]:
+                labels = sample["labels"]
+                if metric_type == "histogram":
+                    for le, count in sample["buckets"].items():
+                        lines.append(f"{full_name}_bucket{_labels({**labels, 'le': '+Inf' if le == 'inf' else le})} {count}")
+                    lines.append(f"{full_name}_sum{_labels(labels)} {sample['sum']}")
+                    lines.append(f"{full_name}_count{_labels(labels)} {sample['count']}")
+                else:
+                    lines.append(f"{full_name}{_labels(labels)} {sample['value']}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        _write_atomically(path, json.dumps(self.to_dict(), indent=2) + "\n")
+
+    def write_prometheus(self, path):
+        _write_atomically(path, self.to_prometheus())
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def _write_atomically(path, content):
+    # Collectors such as the node exporter textfile collector must never see a partially written file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def record_request(metrics, method, url, status, elapsed):
+    """Records an HTTP request attempt, `status` being the response status or the error preventing one."""
+    label = endpoint(url)
+    metrics.inc("requests_total", endpoint=label, method=method, status=status)
+    metrics.observe("request_duration_seconds", elapsed, endpoint=label)
+
+
+def record_response_bytes(metrics, url, count):
+    """Records `count` bytes of a response body as they are read, chunked and streamed bodies included."""
+    if count:
+        metrics.inc("response_bytes_total", count, endpoint=endpoint(url))
+
+
+def record_retry(metrics, url, reason):
+    metrics.inc("retries_total", endpoint=endpoint(url), reason=reason)
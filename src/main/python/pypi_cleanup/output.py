@@ -0,0 +1,59 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import csv
+import json
+
+# `filename` is only set for the deletion of a single file of a release
+FIELDS = ("package", "version", "filename", "upload_time", "rule", "action")
+
+# Actions recorded for a release or a file
+SELECTED = "selected"
+DRY_RUN = "dry-run"
+DELETED = "deleted"
+FAILED = "failed"
+
+
+class JsonlWriter:
+    """Streams a JSON object per release and action, one per line."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, releases, action):
+        for release in releases:
+            self.f.write(json.dumps({**release.to_dict(), "action": action}) + "\n")
+        self.f.flush()
+
+
+class CsvWriter:
+    """Streams a CSV row per release and action, preceded by a header row."""
+
+    def __init__(self, f):
+        self.f = f
+        self._writer = csv.DictWriter(f, FIELDS)
+        self._header = False
+
+    def write(self, releases, action):
+        if not self._header:
+            self._writer.writeheader()
+            self._header = True
+        for release in releases:
+            self._writer.writerow({**release.to_dict(), "action": action})
+        self.f.flush()
+
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter}
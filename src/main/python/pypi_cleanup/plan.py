@@ -0,0 +1,129 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import datetime
+import json
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+class PypiCleanupError(Exception):
+    """Stops a cleanup stage. The cause has already been reported, `exit_code` is what the CLI exits with."""
+
+    def __init__(self, message, exit_code=1):
+        super().__init__(message)
+        self.exit_code = exit_code
+
+
+@dataclass(frozen=True)
+class PlannedRelease:
+    package: str
+    version: str
+    upload_time: datetime.datetime  # Upload time of the most recent file of the release
+    rule: Optional[str] = None  # Pattern that selected the release, None if not selected by a pattern
+    filename: Optional[str] = None  # File of the release to delete instead of the whole release
+
+    @property
+    def key(self):
+        """Identifies the deletion: `(package, version)` of a release or `(package, version, filename)` of a file."""
+        if self.filename is None:
+            return self.package, self.version
+        return self.package, self.version, self.filename
+
+    def __str__(self):
+        return describe(*self.key)
+
+    def to_dict(self):
+        d = {"package": self.package,
+             "version": self.version,
+             "upload_time": self.upload_time.isoformat(),
+             "rule": self.rule}
+        if self.filename is not None:
+            d["filename"] = self.filename
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["package"], d["version"], datetime.datetime.fromisoformat(d["upload_time"]), d.get("rule"),
+                   d.get("filename"))
+
+
+def describe(package, version, filename=None):
+    if filename is None:
+        return f"{package!r} version {version}"
+    return f"file {filename} of {package!r} version {version}"
+
+
+@dataclass
+class DeletionPlan:
+    """Releases, or files of releases, selected for deletion from the PyPI host at `url`, by package in the order
+    they were planned."""
+
+    url: str
+    releases: Dict[str, List[PlannedRelease]] = field(default_factory=dict)
+
+    def add(self, release):
+        self.releases.setdefault(release.package, []).append(release)
+
+    def __iter__(self):
+        for package_releases in self.releases.values():
+            yield from package_releases
+
+    def __len__(self):
+        return sum(map(len, self.releases.values()))
+
+    @property
+    def pkg_to_pkg_vers(self):
+        return {package: [release.version for release in package_releases]
+                for package, package_releases in self.releases.items()}
+
+    def without(self, completed):
+        """Returns a plan without the deletions whose `key` is in `completed`."""
+        plan = DeletionPlan(self.url)
+        for release in self:
+            if release.key not in completed:
+                plan.add(release)
+        return plan
+
+    def shard(self, index, count):
+        """Returns the plan of shard `index` (1-based) of `count`.
+
+        Releases are assigned by the hash of their package and version (and file name), so a release belongs to the
+        same shard no matter which releases have been completed or removed from the plan.
+        """
+        plan = DeletionPlan(self.url)
+        for release in self:
+            if zlib.crc32("\n".join(release.key).encode("utf-8")) % count == index - 1:
+                plan.add(release)
+        return plan
+
+    def digest(self):
+        """Identifies the releases the plan deletes, regardless of their order, upload times and matching rules."""
+        import hashlib
+
+        releases = sorted(list(release.key) for release in self)
+        return hashlib.sha256(json.dumps({"url": self.url, "releases": releases}).encode("utf-8")).hexdigest()
+
+    def to_dict(self):
+        return {"url": self.url, "releases": [release.to_dict() for release in self]}
+
+    @classmethod
+    def from_dict(cls, d):
+        plan = cls(d["url"])
+        for release in d["releases"]:
+            plan.add(PlannedRelease.from_dict(release))
+        return plan
@@ -0,0 +1,100 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import logging
+
+
+def _version_class():
+    try:
+        from packaging.version import InvalidVersion, Version
+    except ImportError:
+        raise RuntimeError("Retention policies require the `packaging` package to be installed") from None
+    return Version, InvalidVersion
+
+
+def _release(v):
+    # 1.0 and 1.0.0 are the same release
+    release = v.release
+    end = len(release)
+    while end > 1 and release[end - 1] == 0:
+        end -= 1
+    return release[:end]
+
+
+class RetentionPolicy:
+    """Selects releases to delete by their PEP 440 ordering rather than by regex.
+
+    `keep_dev` keeps the newest N `.devN` releases of every version they precede, `drop_pre_after_final`
+    deletes the pre-releases (and their `.devN`) of every release that has a final version and
+    `keep_per_minor` keeps the newest N versions of every `major.minor` line. A version selected by any of
+    the rules is deleted. Versions that aren't valid PEP 440 are never selected.
+    """
+
+    def __init__(self, keep_dev=None, drop_pre_after_final=False, keep_per_minor=None):
+        self.keep_dev = keep_dev
+        self.drop_pre_after_final = drop_pre_after_final
+        self.keep_per_minor = keep_per_minor
+
+    def __bool__(self):
+        return self.keep_dev is not None or self.drop_pre_after_final or self.keep_per_minor is not None
+
+    def __str__(self):
+        rules = []
+        if self.keep_dev is not None:
+            rules.append(f"keep-dev={self.keep_dev}")
+        if self.drop_pre_after_final:
+            rules.append("drop-pre-after-final")
+        if self.keep_per_minor is not None:
+            rules.append(f"keep-per-minor={self.keep_per_minor}")
+        return ", ".join(rules)
+
+    def select(self, versions):
+        """Returns `{version: rule}` of the `versions` to delete along with the rule that selected each of them."""
+        version_class, invalid_version = _version_class()
+        parsed = []
+        for version in versions:
+            try:
+                parsed.append((version_class(version), version))
+            except invalid_version:
+                logging.debug(f"Version {version} is not a valid PEP 440 version, retaining it")
+
+        # Newest first: a final release precedes its pre-releases, which precede their dev releases
+        parsed.sort(reverse=True)
+
+        selected = {}
+        finals = set()
+        dev_counts = {}
+        minor_counts = {}
+        for v, version in parsed:
+            release = (v.epoch, _release(v))
+            if not v.is_prerelease:
+                finals.add(release)
+
+            if self.keep_per_minor is not None:
+                minor = (v.epoch, (v.release + (0,))[:2])
+                seen = minor_counts[minor] = minor_counts.get(minor, 0) + 1
+                if seen > self.keep_per_minor:
+                    selected[version] = f"keep-per-minor={self.keep_per_minor}"
+
+            if self.drop_pre_after_final and v.pre is not None and release in finals:
+                selected[version] = "drop-pre-after-final"
+
+            if self.keep_dev is not None and v.dev is not None:
+                series = (release, v.pre, v.post)
+                seen = dev_counts[series] = dev_counts.get(series, 0) + 1
+                if seen > self.keep_dev:
+                    selected[version] = f"keep-dev={self.keep_dev}"
+        return selected
@@ -0,0 +1,119 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import hashlib
+import json
+import logging
+import os
+import stat
+import tempfile
+
+SESSION_KEY_ENV = "PYPI_CLEANUP_SESSION_KEY"
+KEY_FILE = "session.key"
+
+
+def _fernet_class():
+    try:
+        from cryptography.fernet import Fernet
+    except ImportError:
+        raise RuntimeError("Storing sessions requires the `cryptography` package to be installed") from None
+    return Fernet
+
+
+class SessionStore:
+    """Encrypted store of authenticated session cookies per PyPI host and user.
+
+    Sessions are encrypted with Fernet using the key in the `PYPI_CLEANUP_SESSION_KEY` environment variable or,
+    if it's not set, a key generated into the store directory. The directory is only accessible by its owner,
+    and stored files that are accessible by anyone else are refused.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fernet = None
+
+    def _check_private(self, path):
+        if os.name == "posix":
+            mode = os.stat(path).st_mode
+            if mode & (stat.S_IRWXG | stat.S_IRWXO):
+                raise PermissionError(f"{path} is accessible by users other than its owner "
+                                      f"({stat.filemode(mode)}), refusing to use it")
+
+    def _write_private(self, path, content):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=".tmp-")  # mkstemp creates files with 0600
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _cipher(self):
+        if self._fernet is None:
+            fernet = _fernet_class()
+            os.makedirs(self.path, mode=0o700, exist_ok=True)
+            self._check_private(self.path)
+
+            key = os.getenv(SESSION_KEY_ENV)
+            if not key:
+                key_path = os.path.join(self.path, KEY_FILE)
+                try:
+                    self._check_private(key_path)
+                    with open(key_path, "rb") as f:
+                        key = f.read()
+                except FileNotFoundError:
+                    key = fernet.generate_key()
+                    self._write_private(key_path, key)
+            self._fernet = fernet(key)
+        return self._fernet
+
+    def _session_path(self, url, username):
+        return os.path.join(self.path, hashlib.sha256(f"{url}\n{username}".encode("utf-8")).hexdigest() + ".session")
+
+    def load(self, s, url, username):
+        """Loads the cookies stored for `url` and `username` into the session `s`, returns whether there were any."""
+        path = self._session_path(url, username)
+        if not os.path.exists(path):
+            return False
+
+        cipher = self._cipher()
+        self._check_private(path)
+        with open(path, "rb") as f:
+            token = f.read()
+        try:
+            cookies = json.loads(cipher.decrypt(token))
+        except Exception as e:  # InvalidToken is only importable from the optional dependency
+            logging.warning(f"Unable to decrypt the stored session {path}, ignoring it", exc_info=e)
+            return False
+
+        for cookie in cookies:
+            s.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"],
+                          secure=cookie["secure"], expires=cookie["expires"])
+        return bool(cookies)
+
+    def save(self, s, url, username):
+        cookies = [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path, "secure": c.secure,
+                    "expires": c.expires} for c in s.cookies]
+        cipher = self._cipher()
+        self._write_private(self._session_path(url, username), cipher.encrypt(json.dumps(cookies).encode("utf-8")))
+        logging.info(f"Stored the session of user {username} in {self.path}")
+
+    def discard(self, url, username):
+        try:
+            os.unlink(self._session_path(url, username))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,78 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import json
+import mmap
+import os
+import re
+
+from pypi_cleanup.stream import STREAM_CHUNK_SIZE
+
+# Locations of the PEP 691 JSON document of a project relative to a snapshot directory, tried in turn:
+# archived documents named after the project and bandersnatch mirrors, with and without the `web` root
+LAYOUTS = ("{name}.json", "{name}/index.v1_json", "{name}/index.json", "simple/{name}/index.v1_json",
+           "web/simple/{name}/index.v1_json")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _normalize(name):
+    # PEP 503
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+class Snapshot:
+    """Offline source of the PEP 691 JSON documents of projects, e.g. archived documents or a mirror.
+
+    `path` is either a directory holding documents in one of the `LAYOUTS` or the document of a single project.
+    With `stream` documents are memory-mapped and parsed incrementally, so that they're never read into memory as
+    a whole, otherwise they're read and parsed at once, which is faster. Instances are picklable, so that documents
+    can be parsed in parallel by worker processes.
+    """
+
+    def __init__(self, path, stream=False):
+        self.path = path
+        self.stream = stream
+
+    def locate(self, package):
+        if not os.path.isdir(self.path):
+            return self.path
+
+        names = dict.fromkeys((package, _normalize(package)))
+        for layout in LAYOUTS:
+            for name in names:
+                path = os.path.join(self.path, layout.format(name=name))
+                if os.path.isfile(path):
+                    return path
+        raise SnapshotError(f"No document of package {package!r} in snapshot {self.path}")
+
+    def release_dates(self, package, files=False):
+        """Returns the `releases_by_date` of `package` from its document in the snapshot."""
+        # The package imports this module
+        from pypi_cleanup import releases_by_date, stream_releases_by_date
+
+        path = self.locate(package)
+        try:
+            with open(path, "rb") as f:
+                if not self.stream:
+                    return releases_by_date(package, json.load(f), files)
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    chunks = (m[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(m), STREAM_CHUNK_SIZE))
+                    return stream_releases_by_date(package, chunks, files)
+        except (OSError, ValueError, KeyError) as e:
+            raise SnapshotError(f"Unable to load the document of package {package!r} from {path}: {e}") from None
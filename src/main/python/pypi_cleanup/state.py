@@ -0,0 +1,81 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import datetime
+import hashlib
+import json
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS selections (
+    host TEXT NOT NULL,
+    package TEXT NOT NULL,
+    rules TEXT NOT NULL,
+    cutoff TEXT NOT NULL,
+    unmatched INTEGER NOT NULL,
+    matched TEXT NOT NULL,
+    PRIMARY KEY (host, package, rules)
+) WITHOUT ROWID
+"""
+
+
+def rules_hash(patterns):
+    """Identifies a rule set, patterns being order-sensitive since the first matching one wins."""
+    return hashlib.sha256(json.dumps([[p.pattern, p.flags] for p in patterns]).encode("utf-8")).hexdigest()
+
+
+class SelectionState:
+    """SQLite database of the versions of a package a rule set has been evaluated against, one row per package.
+
+    A version's decision only depends on the version and the rule set, so each run records its cutoff as a
+    high-water mark: every version uploaded before it has been decided. Only the matched ones are stored, as
+    `{version: index of the matching pattern}`, along with the number of unmatched ones. A later run only
+    evaluates the versions uploaded since the mark, unless the number of unmatched versions under the mark
+    changed, i.e. versions appeared under it, in which case all unmatched ones are evaluated again.
+    """
+
+    def __init__(self, path, patterns):
+        self.path = path
+        self.rules = rules_hash(patterns)
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=30)
+            with self._db:
+                self._db.execute(SCHEMA)
+        return self._db
+
+    def load(self, host, package):
+        """Returns the `(cutoff, unmatched, matched)` of the last run over `package`, `None` if there was none."""
+        row = self._connect().execute("SELECT cutoff, unmatched, matched FROM selections "
+                                      "WHERE host = ? AND package = ? AND rules = ?",
+                                      (host, package, self.rules)).fetchone()
+        if row is None:
+            return None
+        cutoff, unmatched, matched = row
+        return datetime.datetime.fromisoformat(cutoff), unmatched, json.loads(matched)
+
+    def save(self, host, package, cutoff, unmatched, matched):
+        db = self._connect()
+        with db:
+            db.execute("INSERT OR REPLACE INTO selections VALUES (?, ?, ?, ?, ?, ?)",
+                       (host, package, self.rules, cutoff.isoformat(), unmatched, json.dumps(matched)))
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
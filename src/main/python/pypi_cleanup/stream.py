@@ -0,0 +1,129 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import codecs
+import json
+import re
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class _Scanner:
+    """Incremental JSON scanner over an iterable of UTF-8 byte chunks.
+
+    Only the text not consumed yet is buffered, so memory is bounded by the chunk size and the largest
+    single value decoded with `value()`.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        while not self._eof:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                text = self._decoder.decode(b"", final=True)
+                self._eof = True
+            else:
+                text = self._decoder.decode(chunk)
+            if text:
+                self._buf = self._buf[self._pos:] + text
+                self._pos = 0
+                return True
+        return False
+
+    def peek(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def next(self, expected):
+        char = self.peek()
+        if char not in expected:
+            raise ValueError(f"Expected one of {expected!r} in JSON document, got {char!r}")
+        self._pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A value ending exactly at the end of the buffer might be a number continued in the next chunk
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def end(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                raise ValueError("Extra data after the end of JSON document")
+            if not self._fill():
+                return
+
+
+def scan_project(chunks, on_file):
+    """Incrementally parses a PEP 691 simple-API project document from an iterable of byte chunks.
+
+    Every element of `files` is passed to `on_file` as soon as it has been read and is discarded afterwards,
+    all other keys except for `versions` are skipped. Returns the list of versions.
+    """
+    scanner = _Scanner(chunks)
+    versions = None
+    scanner.next("{")
+    if scanner.peek() == "}":
+        scanner.next("}")
+    else:
+        while True:
+            key = scanner.value()
+            scanner.next(":")
+            if key == "files":
+                scanner.next("[")
+                if scanner.peek() == "]":
+                    scanner.next("]")
+                else:
+                    while True:
+                        on_file(scanner.value())
+                        if scanner.next(",]") == "]":
+                            break
+            elif key == "versions":
+                versions = scanner.value()
+            else:
+                scanner.value()
+
+            if scanner.next(",}") == "}":
+                break
+    scanner.end()
+
+    if versions is None:
+        raise ValueError("Project document contains no versions")
+    return versions
@@ -0,0 +1,129 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import datetime
+import random
+import threading
+import time
+from collections import deque
+
+DEFAULT_RATE_LIMIT = 0.0
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 60.0
+# A misbehaving server must not be able to stall a cleanup indefinitely
+DEFAULT_MAX_RETRY_AFTER = 300.0
+
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+# The number of most recent requests the rate an unlimited bucket is engaged at is observed over
+OBSERVED_REQUESTS = 256
+# Statuses by which the server signals that it's receiving too many requests
+OVERLOAD_STATUSES = frozenset((429, 503))
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+
+
+class RateLimiter:
+    """Token bucket shared by all workers talking to the same warehouse.
+
+    The rate adapts to the errors observed: every throttling response halves it and pauses all callers
+    until the server is willing to talk again, every successful response increases it additively back
+    up to the configured limit. A limit of 0 leaves requests unlimited until the server signals that it's
+    overloaded: the bucket then starts at half the rate observed until then, and is disengaged again once
+    it has recovered to it. Pauses are honored either way.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.limit = rate
+        self.max_rate = rate
+        self.min_rate = rate / 100
+        self.rate = rate
+        self._burst = burst or max(rate, 1.0)
+        self._tokens = self._burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        # When the most recent requests were sent
+        self._sent = deque(maxlen=OBSERVED_REQUESTS)
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token and returns the number of seconds the caller has to wait before sending its request."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self._paused_until - now, 0.0)
+            if self.rate:
+                self._tokens = min(self._burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                # Reserve the token now, the caller will sleep off the debt
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self.rate)
+            self._sent.append(now + wait)
+        return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    def success(self):
+        if self.rate and self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+                if not self.limit and self.rate >= self.max_rate:
+                    # Recovered from the overload, back to unlimited
+                    self.rate = 0.0
+
+    def throttle(self, delay, overloaded=False):
+        """Pauses all callers for `delay` seconds and halves the rate, engaging an unlimited bucket if the
+        server is `overloaded`, i.e. it responded with one of `OVERLOAD_STATUSES`."""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + delay)
+            span = self._sent[-1] - self._sent[0] if self._sent else 0.0
+            if not self.rate and overloaded and span > 0:
+                observed = (len(self._sent) - 1) / span
+                self.max_rate = self.rate = observed
+                self.min_rate = observed / 100
+                self._burst = max(observed, 1.0)
+                self._updated = now
+            if self.rate:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._tokens = min(self._tokens, 0.0)
+
+
+def backoff_delay(backoff, attempt):
+    # "Full jitter" exponential backoff
+    return random.uniform(0, min(MAX_BACKOFF, backoff * 2 ** attempt))
+
+
+def retry_after(response, maximum=DEFAULT_MAX_RETRY_AFTER):
+    """Returns the delay in seconds requested by the `Retry-After` header, capped at `maximum`, or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return min(max(float(value), 0.0), maximum)
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return min(max((retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0), maximum)
@@ -0,0 +1,38 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import base64
+import hashlib
+import hmac
+import struct
+import time
+
+PERIOD = 30
+DIGITS = 6
+
+
+def totp(seed, now=None, period=PERIOD, digits=DIGITS):
+    """Returns the RFC 6238 time-based one-time password of the base32 `seed` at `now` (current time by default)."""
+    seed = seed.replace(" ", "").replace("-", "").upper()
+    try:
+        key = base64.b32decode(seed + "=" * (-len(seed) % 8))
+    except ValueError:
+        raise ValueError("TOTP seed is not valid base32") from None
+    counter = int((time.time() if now is None else now) // period)
+    digest = hmac.new(key, struct.pack(">Q", counter), hashlib.sha1).digest()
+    offset = digest[-1] & 0x0F
+    code = struct.unpack(">I", digest[offset:offset + 4])[0] & 0x7FFFFFFF
+    return str(code % 10 ** digits).zfill(digits)
@@ -0,0 +1,94 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import asyncio
+import importlib.util
+import unittest
+
+from pypi_cleanup import DeletionPlan, PypiCleanup, PypiCleanupError
+
+URL = "https://test.pypi.org"
+FORM = ('<form action="/manage/project/{package}/release/{version}/">'
+        '<input name="csrf_token" value="token-{version}"><input name="confirm_delete_version"></form>')
+
+
+def warehouse(request):
+    import httpx
+
+    path = request.url.path.strip("/").split("/")
+    if path[0] == "simple":
+        package = path[1]
+        if package == "missing":
+            return httpx.Response(404)
+        return httpx.Response(200, json={
+            "versions": ["1.0", "1.1.dev1"],
+            "files": [
+                {"filename": f"{package}-1.0.tar.gz", "upload-time": "2024-01-01T12:00:00.000000+00:00"},
+                {"filename": f"{package}-1.1.dev1.tar.gz", "upload-time": "2024-01-02T12:00:00.000000+00:00"},
+            ]})
+    if path[0] == "manage":
+        package, version = path[2], path[4]
+        if version == "2.0.dev1":
+            return httpx.Response(503)
+        if request.method == "GET":
+            return httpx.Response(200, text=FORM.format(package=package, version=version))
+        return httpx.Response(200)
+    return httpx.Response(404)
+
+
+@unittest.skipUnless(importlib.util.find_spec("httpx"), "httpx is not installed")
+class TestAsyncEngine(unittest.TestCase):
+    def engine(self, packages, do_it=False):
+        import httpx
+        from pypi_cleanup.aio import AsyncEngine
+
+        cleanup = PypiCleanup(url=URL, packages=packages, do_it=do_it, jobs=4, delete_jobs=4, max_retries=0,
+                              engine="async")
+        return AsyncEngine(cleanup, transport=httpx.MockTransport(warehouse))
+
+    async def plan(self, engine):
+        async with engine.create_client() as client:
+            return await engine.plan(client)
+
+    async def execute(self, engine, plan):
+        async with engine.create_client() as client:
+            return await engine.execute(client, plan)
+
+    def test_plan_in_package_order(self):
+        packages = [f"pkg{i}" for i in range(20)]
+        with self.assertLogs(level="INFO"):
+            plan = asyncio.run(self.plan(self.engine(packages)))
+        self.assertEqual(list(plan.releases), packages)
+        self.assertEqual(plan.pkg_to_pkg_vers["pkg0"], ["1.1.dev1"])
+
+    def test_failed_package_stops_plan(self):
+        with self.assertLogs(level="ERROR"), self.assertRaises(PypiCleanupError):
+            asyncio.run(self.plan(self.engine(["pkg0", "missing", "pkg1"])))
+
+    def test_failures_reported_per_release(self):
+        engine = self.engine(["a", "b"], do_it=True)
+        with self.assertLogs(level="INFO"):
+            plan = asyncio.run(self.plan(engine))
+        plan = DeletionPlan.from_dict({"url": URL, "releases": [
+            *(release.to_dict() for release in plan),
+            {"package": "b", "version": "2.0.dev1", "upload_time": "2024-01-02T12:00:00+00:00", "rule": None}]})
+
+        with self.assertLogs(level="INFO") as logs:
+            failed = asyncio.run(self.execute(engine, plan))
+
+        self.assertEqual(failed, [("b", "2.0.dev1")])
+        self.assertIn("INFO:root:Deleted 'a' version 1.1.dev1", logs.output)
+        self.assertIn("INFO:root:Deleted 'b' version 1.1.dev1", logs.output)
@@ -0,0 +1,119 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from pypi_cleanup import PypiCleanup
+from pypi_cleanup.cache import MetadataCache
+
+URL = "https://test.pypi.org/simple/test-package/"
+PROJECT_INFO = {
+    "versions": ["1.0.dev1"],
+    "files": [{"filename": "test_package-1.0.dev1.tar.gz", "upload-time": "2024-01-01T12:00:00.000000+00:00"}]
+}
+
+
+class TestMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_roundtrip(self):
+        cache = MetadataCache(self.tmp_dir.name)
+        self.assertEqual(cache.validators(URL), {})
+        cache.store(URL, {"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2024 12:00:00 GMT"}, b"{}")
+        self.assertEqual(cache.validators(URL), {"If-None-Match": '"abc"',
+                                                 "If-Modified-Since": "Mon, 01 Jan 2024 12:00:00 GMT"})
+        self.assertEqual(cache.load(URL), b"{}")
+
+    def test_not_stored_without_validators(self):
+        cache = MetadataCache(self.tmp_dir.name)
+        cache.store(URL, {}, b"{}")
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def test_stream_stored_once_exhausted(self):
+        cache = MetadataCache(self.tmp_dir.name)
+        chunks = cache.store_stream(URL, {"ETag": '"abc"'}, [b"{", b"}"])
+        self.assertEqual(next(chunks), b"{")
+        chunks.close()
+        self.assertEqual(cache.validators(URL), {})
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+        self.assertEqual(b"".join(cache.store_stream(URL, {"ETag": '"abc"'}, [b"{", b"}"])), b"{}")
+        self.assertEqual(cache.load(URL), b"{}")
+
+    def test_least_recently_used_evicted(self):
+        cache = MetadataCache(self.tmp_dir.name, max_size=350)
+        for i in range(3):
+            url = f"{URL}{i}"
+            cache.store(url, {"ETag": str(i)}, b"x" * 100)
+            os.utime(cache._path(url, ".body"), (i, i))
+        cache.load(f"{URL}0")
+        cache.store(f"{URL}3", {"ETag": "3"}, b"x" * 100)
+
+        self.assertIsNotNone(cache.load(f"{URL}0"))
+        self.assertIsNone(cache.load(f"{URL}1"))
+        self.assertIsNotNone(cache.load(f"{URL}2"))
+        self.assertEqual(cache.validators(f"{URL}1"), {})
+        self.assertIsNotNone(cache.load(f"{URL}3"))
+
+
+class TestCachedFetch(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.cleanup = PypiCleanup(url="https://test.pypi.org", username=None, packages=["test-package"],
+                                   do_it=False, patterns=None, verbose=False, days=0, query_only=True,
+                                   leave_most_recent_only=False, confirm=False, delete_project=False,
+                                   cache_dir=self.tmp_dir.name)
+
+    @staticmethod
+    def session(status, content=b""):
+        r = MagicMock()
+        r.status_code = status
+        r.content = content
+        r.headers = {"ETag": '"v1"'}
+        r.__enter__.return_value = r
+        s = MagicMock()
+        s.get.return_value = r
+        return s
+
+    def test_not_modified_served_from_cache(self):
+        content = json.dumps(PROJECT_INFO).encode("utf-8")
+        expected = self.cleanup.fetch_release_dates(self.session(200, content), "test-package")
+
+        s = self.session(304)
+        self.assertEqual(self.cleanup.fetch_release_dates(s, "test-package"), expected)
+        self.assertEqual(s.get.call_count, 1)
+        self.assertEqual(s.get.call_args.kwargs["headers"]["If-None-Match"], '"v1"')
+
+    def test_streamed_not_modified_served_from_cache(self):
+        self.cleanup.stream = True
+        content = json.dumps(PROJECT_INFO).encode("utf-8")
+        s = self.session(200)
+        s.get.return_value.iter_content.return_value = iter([content[:10], content[10:]])
+        expected = self.cleanup.fetch_release_dates(s, "test-package")
+        self.assertEqual(list(expected), ["1.0.dev1"])
+
+        self.assertEqual(self.cleanup.fetch_release_dates(self.session(304), "test-package"), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
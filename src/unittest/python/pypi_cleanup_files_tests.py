@@ -0,0 +1,182 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import datetime
+import re
+import unittest
+from unittest.mock import MagicMock
+
+from requests.exceptions import RequestException
+
+from pypi_cleanup import DeletionPlan, PlannedRelease, PypiCleanup, PypiCleanupError, releases_by_date
+from pypi_cleanup.files import FileSelector, python_tags, wheel_tags
+from pypi_cleanup.forms import find_file_form, parse_file_forms
+
+URL = "https://test.pypi.org"
+NOW = datetime.datetime.now(datetime.timezone.utc)
+PROJECT_INFO = {
+    "versions": ["1.0", "1.1.dev1"],
+    "files": [
+        {"filename": "a-1.0.tar.gz", "upload-time": "2024-01-01T12:00:00.000000+00:00"},
+        {"filename": "a-1.0-cp36-cp36m-manylinux1_x86_64.whl", "upload-time": "2024-01-01T12:01:00.000000+00:00"},
+        {"filename": "a-1.0-cp38-cp38-manylinux1_x86_64.manylinux2010_x86_64.whl",
+         "upload-time": "2024-01-01T12:02:00.000000+00:00"},
+        {"filename": "a-1.0-py2.7.egg", "upload-time": "2024-01-01T12:03:00.000000+00:00"},
+        {"filename": "a-1.1.dev1.tar.gz", "upload-time": "2024-01-02T12:00:00.000000+00:00"},
+        {"filename": "a-1.1.dev1-cp36-cp36m-win32.whl", "upload-time": "2024-01-02T12:01:00.000000+00:00"},
+    ]
+}
+
+
+def page(files):
+    forms = "".join(f'<form method="POST"><h3>Delete {filename}</h3><input name="csrf_token" value="token">'
+                    f'<input name="file_id" type="hidden" value="id-{filename}">'
+                    f'<input name="confirm_project_name" placeholder="A"></form>' for filename in files)
+    return f'<html><body><form method="POST"><input name="confirm_delete_version"></form>{forms}</body></html>'
+
+
+class TestFileSelector(unittest.TestCase):
+    def test_tags(self):
+        self.assertEqual(wheel_tags("a-1.0-cp38-cp38-manylinux1_x86_64.manylinux2010_x86_64.whl"),
+                         {"cp38-cp38-manylinux1_x86_64", "cp38-cp38-manylinux2010_x86_64"})
+        self.assertEqual(wheel_tags("a-1.0-1-py2.py3-none-any.whl"), {"py2-none-any", "py3-none-any"})
+        self.assertEqual(wheel_tags("a-1.0.tar.gz"), set())
+        self.assertEqual(python_tags("a-1.0-py2.py3-none-any.whl"), {"py2", "py3"})
+        self.assertEqual(python_tags("a-1.0-py2.7-linux-x86_64.egg"), {"py27"})
+        self.assertEqual(python_tags("a-1.0.zip"), set())
+
+    def test_all_tags_must_match(self):
+        selector = FileSelector(tags=["*-manylinux1_*"])
+        self.assertTrue(selector.matches("a-1.0-cp36-cp36m-manylinux1_x86_64.whl"))
+        self.assertFalse(selector.matches("a-1.0-cp38-cp38-manylinux1_x86_64.manylinux2010_x86_64.whl"))
+        self.assertFalse(selector.matches("a-1.0.tar.gz"))
+        selector = FileSelector(pythons=["py2"])
+        self.assertFalse(selector.matches("a-1.0-py2.py3-none-any.whl"))
+        self.assertTrue(selector.matches("a-1.0-py2-none-any.whl"))
+
+    def test_stable_abi_open_ended(self):
+        wheel = "a-1.0-cp36-abi3-manylinux2014_x86_64.whl"
+        self.assertEqual(wheel_tags(wheel), {"cp36+-abi3-manylinux2014_x86_64"})
+        self.assertEqual(python_tags(wheel), {"cp36+"})
+        self.assertEqual(python_tags("a-1.0-cp36-cp36m.abi3-win32.whl"), {"cp36", "cp36+"})
+        for selector in (FileSelector(pythons=["cp36"]), FileSelector(tags=["cp36-*"]),
+                         FileSelector(pythons=["cp36"], tags=["*-manylinux2014_*"])):
+            self.assertFalse(selector.matches(wheel), selector)
+        for selector in (FileSelector(pythons=["cp36+"]), FileSelector(pythons=["cp3*"]),
+                         FileSelector(tags=["*-abi3-*"]), FileSelector(tags=["*-manylinux2014_*"])):
+            self.assertTrue(selector.matches(wheel), selector)
+
+    def test_selectors_combined(self):
+        selector = FileSelector(pythons=["cp36", "py27"], extensions=["whl"])
+        self.assertEqual(str(selector), "python=cp36,py27, ext=.whl")
+        self.assertTrue(selector.matches("a-1.0-cp36-cp36m-win32.whl"))
+        self.assertFalse(selector.matches("a-1.0-py2.7.egg"))
+        self.assertFalse(FileSelector())
+
+
+class TestSelectFiles(unittest.TestCase):
+    def select(self, cleanup):
+        files_by_version = releases_by_date("a", PROJECT_INFO, files=True)
+        with self.assertLogs(level="INFO"):
+            return [(r.version, r.filename) for r in cleanup.select_files("a", files_by_version)]
+
+    def test_files_by_version(self):
+        files_by_version = releases_by_date("a", PROJECT_INFO, files=True)
+        self.assertEqual(list(files_by_version), ["1.0", "1.1.dev1"])
+        self.assertEqual([filename for filename, _ in files_by_version["1.0"]],
+                         [f["filename"] for f in PROJECT_INFO["files"][:4]])
+        self.assertEqual(files_by_version["1.0"][3][1], datetime.datetime(2024, 1, 1, 12, 3, tzinfo=datetime.timezone.utc))
+
+    def test_select(self):
+        cleanup = PypiCleanup(url=URL, packages=["a"], file_pythons=["cp36", "py27"])
+        self.assertEqual(self.select(cleanup), [("1.0", "a-1.0-cp36-cp36m-manylinux1_x86_64.whl"),
+                                                ("1.0", "a-1.0-py2.7.egg"),
+                                                ("1.1.dev1", "a-1.1.dev1-cp36-cp36m-win32.whl")])
+
+    def test_versions_and_age_restricted(self):
+        cleanup = PypiCleanup(url=URL, packages=["a"], file_tags=["cp36-*"], patterns=[re.compile(r".*\.dev\d+$")])
+        self.assertEqual(self.select(cleanup), [("1.1.dev1", "a-1.1.dev1-cp36-cp36m-win32.whl")])
+        cleanup = PypiCleanup(url=URL, packages=["a"], file_tags=["cp36-*"], days=(NOW.year - 2023) * 366)
+        self.assertEqual(self.select(cleanup), [])
+
+    def test_refuses_to_delete_all_files(self):
+        cleanup = PypiCleanup(url=URL, packages=["a"], file_exts=[".tar.gz", ".whl"])
+        with self.assertRaises(PypiCleanupError) as e:
+            self.select(cleanup)
+        self.assertEqual(e.exception.exit_code, 3)
+
+
+class TestDeleteFiles(unittest.TestCase):
+    FILES = ["a-1.0.tar.gz", "a-1.0-cp36-cp36m-manylinux1_x86_64.whl", "a-1.0-cp36-cp36m-win32.whl"]
+
+    def test_parse_file_forms(self):
+        forms = parse_file_forms(page(self.FILES))
+        self.assertEqual([(form.file_id, form.project, form.csrf) for form in forms],
+                         [(f"id-{filename}", "A", "token") for filename in self.FILES])
+        self.assertEqual(find_file_form(forms, "a-1.0-cp36-cp36m-win32.whl").file_id, "id-a-1.0-cp36-cp36m-win32.whl")
+        self.assertIsNone(find_file_form(forms, "1.0.tar.gz"))
+        self.assertIsNone(find_file_form(forms + forms[:1], "a-1.0.tar.gz"))
+
+    def session(self, broken_files=()):
+        files = list(self.FILES)
+
+        def response(text):
+            r = MagicMock()
+            r.text = text
+            r.__enter__.return_value = r
+            return r
+
+        def post(url, data, **_):
+            filename = data["file_id"][3:]
+            if data["confirm_project_name"] == "A" and filename not in broken_files:
+                files.remove(filename)
+            return response(page(files))
+
+        s = MagicMock()
+        s.get.side_effect = lambda url, **_: response(page(files))
+        s.post.side_effect = post
+        return s
+
+    def test_execute(self):
+        cleanup = PypiCleanup(url=URL, packages=["a"], do_it=True, file_exts=[".whl"])
+        plan = DeletionPlan(URL)
+        for filename in self.FILES[1:]:
+            plan.add(PlannedRelease("a", "1.0", NOW, "ext=.whl", filename))
+        plan.add(PlannedRelease("a", "1.0", NOW, "ext=.whl", "a-1.0-cp37-cp37m-win32.whl"))
+        s = self.session(broken_files={"a-1.0-cp36-cp36m-win32.whl"})
+        with self.assertLogs(level="INFO") as logs:
+            failed = cleanup.execute(s, plan)
+            self.assertEqual(cleanup.report_failures(failed), 1)
+
+        self.assertEqual(failed, [("a", "1.0", "a-1.0-cp36-cp36m-win32.whl"), ("a", "1.0", "a-1.0-cp37-cp37m-win32.whl")])
+        self.assertIn("INFO:root:Deleted file a-1.0-cp36-cp36m-manylinux1_x86_64.whl of 'a' version 1.0", logs.output)
+        # The release page is only fetched once, the forms are refreshed by the redirects of the deletions
+        self.assertEqual(s.get.call_count, 1)
+        self.assertEqual(s.post.call_count, 2)
+        self.assertTrue(logs.output[-1].startswith("ERROR:root:Failed to delete 2 file(s): file a-1.0-cp36-cp36m-win32.whl"))
+
+    def test_request_failure(self):
+        cleanup = PypiCleanup(url=URL, packages=["a"], do_it=True, file_exts=[".whl"])
+        s = self.session()
+        s.get.side_effect = RequestException("500")
+        plan = DeletionPlan(URL)
+        plan.add(PlannedRelease("a", "1.0", NOW, None, self.FILES[1]))
+        with self.assertLogs(level="INFO"):
+            self.assertEqual(cleanup.execute(s, plan), [("a", "1.0", self.FILES[1])])
+
+
+if __name__ == '__main__':
+    unittest.main()
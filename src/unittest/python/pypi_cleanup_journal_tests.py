@@ -0,0 +1,156 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import datetime
+import os
+import tempfile
+import unittest
+
+from pypi_cleanup.journal import DeletionJournal
+from pypi_cleanup.plan import DeletionPlan, PlannedRelease, PypiCleanupError
+
+URL = "https://test.pypi.org"
+UPLOAD_TIME = datetime.datetime(2024, 1, 1, 12, tzinfo=datetime.timezone.utc)
+
+
+def plan(releases, url=URL):
+    plan = DeletionPlan(url)
+    for package, versions in releases.items():
+        for version in versions:
+            plan.add(PlannedRelease(package, version, UPLOAD_TIME, r".*\.dev\d+$"))
+    return plan
+
+
+class TestDeletionJournal(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, "journal.jsonl")
+
+    def test_resume_skips_deleted(self):
+        journal = DeletionJournal(self.path)
+        journal.plan(plan({"a": ["1.0.dev1", "1.0.dev2"], "b": ["2.0.dev1"]}))
+        journal.deleted("a", "1.0.dev1")
+        journal.deleted("b", "2.0.dev1")
+        journal.close()
+
+        with open(self.path, "a") as f:
+            f.write('{"event": "deleted", "pack')
+
+        with self.assertLogs(level="INFO"):
+            self.assertEqual(DeletionJournal(self.path).resume(URL), plan({"a": ["1.0.dev2"]}))
+
+    def test_deletions_recorded_after_torn_record(self):
+        journal = DeletionJournal(self.path)
+        journal.plan(plan({"a": ["1.0.dev1", "1.0.dev2", "1.0.dev3"]}))
+        journal.deleted("a", "1.0.dev1")
+        journal.close()
+        with open(self.path, "a") as f:
+            f.write('{"event": "deleted", "pack')
+
+        journal = DeletionJournal(self.path)
+        with self.assertLogs(level="INFO"):
+            journal.resume(URL)
+        journal.deleted("a", "1.0.dev2")
+        journal.close()
+
+        with self.assertLogs(level="INFO"):
+            self.assertEqual(DeletionJournal(self.path).resume(URL), plan({"a": ["1.0.dev3"]}))
+
+    def test_new_plan_replaces_journal(self):
+        journal = DeletionJournal(self.path)
+        journal.plan(plan({"a": ["1.0.dev1"]}))
+        journal.deleted("a", "1.0.dev1")
+        journal.plan(plan({"a": ["1.0.dev1"]}))
+        journal.close()
+
+        with self.assertLogs(level="INFO"):
+            self.assertEqual(DeletionJournal(self.path).resume(URL), plan({"a": ["1.0.dev1"]}))
+
+    def test_resume_refused(self):
+        with self.assertLogs(level="ERROR"):
+            self.assertRaises(PypiCleanupError, DeletionJournal(self.path).resume, URL)
+
+        journal = DeletionJournal(self.path)
+        journal.plan(plan({"a": ["1.0.dev1"]}))
+        journal.close()
+        with self.assertLogs(level="ERROR"):
+            self.assertRaises(PypiCleanupError, DeletionJournal(self.path).resume, "https://pypi.org")
+
+    def test_shards_partition_plan(self):
+        full = plan({"a": [f"1.0.dev{i}" for i in range(50)], "b": ["2.0.dev1"]})
+        shards = [full.shard(i, 3) for i in range(1, 4)]
+        self.assertEqual(sum(len(shard) for shard in shards), len(full))
+        self.assertTrue(all(shards))
+        releases = [(r.package, r.version) for shard in shards for r in shard]
+        self.assertCountEqual(releases, [(r.package, r.version) for r in full])
+
+        # A completed deletion doesn't move the remaining releases between shards
+        completed = full.without({("a", "1.0.dev0"), ("a", "1.0.dev1")})
+        self.assertEqual(completed.shard(2, 3), shards[1].without({("a", "1.0.dev0"), ("a", "1.0.dev1")}))
+
+    def test_merge(self):
+        shared = plan({"a": ["1.0.dev1", "1.0.dev2"], "b": ["2.0.dev1"]})
+        copies = []
+        for name, deleted in (("copy1.jsonl", [("a", "1.0.dev1")]), ("copy2.jsonl", [("b", "2.0.dev1")])):
+            copy = DeletionJournal(os.path.join(os.path.dirname(self.path), name))
+            copy.plan(shared)
+            for release in deleted:
+                copy.deleted(*release)
+            copy.close()
+            copies.append(copy.path)
+
+        journal = DeletionJournal(self.path)
+        journal.plan(shared)
+        journal.deleted("a", "1.0.dev1")
+        journal.close()
+
+        with self.assertLogs(level="INFO") as logs:
+            self.assertEqual(DeletionJournal(self.path).merge(copies), plan({"a": ["1.0.dev2"]}))
+        self.assertIn("Merged 1 deletion(s)", logs.output[-1])
+        self.assertIn("2 of 3 planned releases deleted, 1 remaining", logs.output[-1])
+        self.assertEqual(DeletionJournal(self.path).replay()[1], {("a", "1.0.dev1"), ("b", "2.0.dev1")})
+
+    def test_merge_refuses_different_plan(self):
+        journal = DeletionJournal(self.path)
+        journal.plan(plan({"a": ["1.0.dev1"]}))
+        journal.close()
+        other = DeletionJournal(self.path + ".other")
+        other.plan(plan({"a": ["1.0.dev2"]}))
+        other.close()
+
+        with self.assertLogs(level="ERROR"):
+            self.assertRaises(PypiCleanupError, DeletionJournal(self.path).merge, [other.path])
+
+    def test_resume_file_deletions(self):
+        files = DeletionPlan(URL)
+        for filename in ("a-1.0-cp36-cp36m-win32.whl", "a-1.0-cp36-cp36m-win_amd64.whl"):
+            files.add(PlannedRelease("a", "1.0", UPLOAD_TIME, "python=cp36", filename))
+        self.assertNotEqual(files.digest(), plan({"a": ["1.0"]}).digest())
+
+        journal = DeletionJournal(self.path)
+        journal.plan(files)
+        journal.deleted("a", "1.0", "a-1.0-cp36-cp36m-win32.whl")
+        journal.close()
+
+        with self.assertLogs(level="INFO") as logs:
+            remaining = DeletionJournal(self.path).resume(URL)
+        self.assertEqual([release.filename for release in remaining], ["a-1.0-cp36-cp36m-win_amd64.whl"])
+        self.assertEqual(logs.output[-1], "INFO:root: 1.0: a-1.0-cp36-cp36m-win_amd64.whl")
+
+
+if __name__ == '__main__':
+    unittest.main()
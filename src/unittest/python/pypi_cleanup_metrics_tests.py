@@ -0,0 +1,109 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+from requests.exceptions import ConnectionError
+from urllib3 import HTTPResponse
+
+from pypi_cleanup.metrics import Metrics, endpoint
+from pypi_cleanup.adapter import ThrottlingAdapter
+from pypi_cleanup.throttle import RateLimiter
+
+
+def response(status, headers=None):
+    r = MagicMock()
+    r.status_code = status
+    r.headers = headers or {}
+    return r
+
+
+class TestMetrics(unittest.TestCase):
+    def test_endpoint(self):
+        self.assertEqual(endpoint("https://pypi.org/simple/a/"), "simple")
+        self.assertEqual(endpoint("https://pypi.org/account/login/"), "login")
+        self.assertEqual(endpoint("https://pypi.org/account/two-factor/totp"), "two_factor")
+        self.assertEqual(endpoint("https://pypi.org/manage/project/a/release/1.0/"), "release")
+        self.assertEqual(endpoint("https://pypi.org/manage/projects/?page=2"), "projects")
+        self.assertEqual(endpoint("https://pypi.org/manage/project/a/releases/"), "other")
+
+    def test_histogram(self):
+        metrics = Metrics()
+        for value in (0.001, 0.3, 0.3, 100):
+            metrics.observe("deletion_duration_seconds", value)
+        sample = metrics.to_dict()["pypi_cleanup_deletion_duration_seconds"][0]
+        self.assertEqual(sample["count"], 4)
+        self.assertAlmostEqual(sample["sum"], 100.601)
+        self.assertEqual(sample["buckets"]["0.005"], 1)
+        self.assertEqual(sample["buckets"]["0.25"], 1)
+        self.assertEqual(sample["buckets"]["0.5"], 3)
+        self.assertEqual(sample["buckets"]["inf"], 4)
+
+    def test_unknown_metric(self):
+        self.assertRaises(KeyError, Metrics().inc, "typo_total")
+
+    def test_prometheus(self):
+        metrics = Metrics()
+        metrics.inc("requests_total", endpoint="simple", method="GET", status=200)
+        metrics.inc("requests_total", endpoint="simple", method="GET", status=200)
+        metrics.observe("phase_duration_seconds", 1.5, phase="plan")
+        text = metrics.to_prometheus()
+        self.assertIn("# TYPE pypi_cleanup_requests_total counter\n", text)
+        self.assertIn('pypi_cleanup_requests_total{endpoint="simple",method="GET",status="200"} 2\n', text)
+        self.assertIn('pypi_cleanup_phase_duration_seconds_bucket{phase="plan",le="1.0"} 0\n', text)
+        self.assertIn('pypi_cleanup_phase_duration_seconds_bucket{phase="plan",le="+Inf"} 1\n', text)
+        self.assertIn('pypi_cleanup_phase_duration_seconds_count{phase="plan"} 1\n', text)
+        self.assertNotIn("retries_total", text)
+
+    def test_write(self):
+        metrics = Metrics()
+        metrics.inc("deletions_total", result="deleted")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "metrics.json")
+            metrics.write_json(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f),
+                                 {"pypi_cleanup_deletions_total": [{"labels": {"result": "deleted"}, "value": 1}]})
+            metrics.write_prometheus(os.path.join(tmp_dir, "metrics.prom"))
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ["metrics.json", "metrics.prom"])
+
+
+@patch("pypi_cleanup.throttle.time.sleep")
+class TestAdapterMetrics(unittest.TestCase):
+    def test_requests_and_retries_recorded(self, sleep):
+        metrics = Metrics()
+        adapter = ThrottlingAdapter(RateLimiter(0), retries=3, backoff=0.5, metrics=metrics)
+        chunked = response(200, {"Transfer-Encoding": "chunked"})
+        chunked.raw = HTTPResponse(io.BytesIO(b"x" * 1234), preload_content=False)
+        responses = [ConnectionError("reset"), response(503), chunked]
+        with patch("requests.adapters.HTTPAdapter.send", side_effect=responses), self.assertLogs(level="WARNING"):
+            r = adapter.send(requests.Request("GET", "https://test.pypi.org/simple/a/").prepare())
+        self.assertEqual(metrics.value("response_bytes_total", endpoint="simple"), 0)
+        self.assertEqual(b"".join(r.raw.stream(100)), b"x" * 1234)
+
+        self.assertEqual(metrics.value("requests_total", endpoint="simple", method="GET", status="ConnectionError"), 1)
+        self.assertEqual(metrics.value("requests_total", endpoint="simple", method="GET", status=503), 1)
+        self.assertEqual(metrics.value("requests_total", endpoint="simple", method="GET", status=200), 1)
+        self.assertEqual(metrics.value("retries_total", endpoint="simple", reason="ConnectionError"), 1)
+        self.assertEqual(metrics.value("retries_total", endpoint="simple", reason=503), 1)
+        self.assertEqual(metrics.value("response_bytes_total", endpoint="simple"), 1234)
+        self.assertEqual(metrics.value("request_duration_seconds", endpoint="simple"), 3)
@@ -0,0 +1,85 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import csv
+import datetime
+import io
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from pypi_cleanup import PlannedRelease, PypiCleanup
+from pypi_cleanup.output import CsvWriter, JsonlWriter
+
+UPLOAD_TIME = datetime.datetime(2024, 1, 2, 12, tzinfo=datetime.timezone.utc)
+RELEASES = [PlannedRelease("a", "1.0.dev1", UPLOAD_TIME, r".*\.dev\d+$"), PlannedRelease("a", "1.0rc1", UPLOAD_TIME)]
+
+
+def simple_response(url, **_):
+    package = url.rstrip("/").rsplit("/", 1)[-1]
+    response = MagicMock()
+    response.json.return_value = {
+        "versions": ["1.0", "1.1.dev1"],
+        "files": [
+            {"filename": f"{package}-1.0.tar.gz", "upload-time": "2024-01-01T12:00:00.000000+00:00"},
+            {"filename": f"{package}-1.1.dev1.tar.gz", "upload-time": "2024-01-02T12:00:00.000000+00:00"},
+        ]
+    }
+    response.__enter__.return_value = response
+    return response
+
+
+class TestWriters(unittest.TestCase):
+    def test_jsonl(self):
+        f = io.StringIO()
+        JsonlWriter(f).write(RELEASES, "selected")
+        self.assertEqual([json.loads(line) for line in f.getvalue().splitlines()],
+                         [{"package": "a", "version": "1.0.dev1", "upload_time": "2024-01-02T12:00:00+00:00",
+                           "rule": r".*\.dev\d+$", "action": "selected"},
+                          {"package": "a", "version": "1.0rc1", "upload_time": "2024-01-02T12:00:00+00:00",
+                           "rule": None, "action": "selected"}])
+
+    def test_csv(self):
+        f = io.StringIO()
+        writer = CsvWriter(f)
+        writer.write(RELEASES[:1], "selected")
+        writer.write(RELEASES[1:], "deleted")
+        rows = list(csv.DictReader(io.StringIO(f.getvalue())))
+        self.assertEqual([(row["version"], row["rule"], row["action"]) for row in rows],
+                         [("1.0.dev1", r".*\.dev\d+$", "selected"), ("1.0rc1", "", "deleted")])
+
+
+class TestOutput(unittest.TestCase):
+    @patch("pypi_cleanup.sys.stdout", new_callable=io.StringIO)
+    @patch("pypi_cleanup.requests.Session")
+    def test_dry_run_records(self, mock_session, stdout):
+        s = mock_session.return_value.__enter__.return_value
+        s.get.side_effect = simple_response
+        s.post.return_value.__enter__.return_value.url = "https://test.pypi.org/manage/projects/"
+        cleanup = PypiCleanup(url="https://test.pypi.org", username="user", packages=["a", "b"], output="jsonl")
+        with patch.dict("os.environ", {"PYPI_CLEANUP_PASSWORD": "password"}), \
+                patch("pypi_cleanup.forms.extract_csrf", return_value="token"), self.assertLogs(level="INFO") as logs:
+            self.assertIsNone(cleanup.run())
+
+        records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([(r["package"], r["version"], r["action"]) for r in records],
+                         [("a", "1.1.dev1", "selected"), ("b", "1.1.dev1", "selected"),
+                          ("a", "1.1.dev1", "dry-run"), ("b", "1.1.dev1", "dry-run")])
+        self.assertFalse(any(line.endswith(" 1.1.dev1") for line in logs.output))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import datetime
+import importlib.util
+import random
+import unittest
+from unittest.mock import patch
+
+from pypi_cleanup import PypiCleanup, PypiCleanupError
+from pypi_cleanup.policy import RetentionPolicy
+
+
+@unittest.skipUnless(importlib.util.find_spec("packaging"), "packaging is not installed")
+class TestRetentionPolicy(unittest.TestCase):
+    def select(self, versions, **policy):
+        versions = list(versions)
+        random.Random(0).shuffle(versions)
+        return RetentionPolicy(**policy).select(versions)
+
+    def test_keep_dev(self):
+        versions = ["1.0.dev1", "1.0.dev2", "1.0.dev3", "1.0", "1.1.dev1", "1.0rc1.dev1", "1.0rc1.dev2", "1.0.post1.dev1"]
+        self.assertEqual(self.select(versions, keep_dev=1),
+                         {"1.0.dev1": "keep-dev=1", "1.0.dev2": "keep-dev=1", "1.0rc1.dev1": "keep-dev=1"})
+        self.assertEqual(len(self.select(versions, keep_dev=0)), 7)
+
+    def test_drop_pre_after_final(self):
+        versions = ["1.0a1", "1.0rc1", "1.0rc2.dev1", "1.0.0", "1.0.dev1", "1.1rc1", "2!1.0rc1", "1.0.post1"]
+        self.assertEqual(set(self.select(versions, drop_pre_after_final=True)), {"1.0a1", "1.0rc1", "1.0rc2.dev1"})
+
+    def test_keep_per_minor(self):
+        versions = ["1.0", "1.0.1", "1.0.2", "1.1", "1.1.1rc1", "2", "2.0.1", "invalid-version"]
+        self.assertEqual(set(self.select(versions, keep_per_minor=2)), {"1.0"})
+        self.assertEqual(set(self.select(versions, keep_per_minor=1)), {"1.0", "1.0.1", "1.1", "2"})
+
+    def test_any_rule_selects(self):
+        versions = ["1.0rc1", "1.0", "1.1.dev1", "1.1.dev2"]
+        self.assertEqual(self.select(versions, keep_dev=1, drop_pre_after_final=True),
+                         {"1.0rc1": "drop-pre-after-final", "1.1.dev1": "keep-dev=1"})
+        self.assertEqual(str(RetentionPolicy(keep_dev=1, drop_pre_after_final=True)), "keep-dev=1, drop-pre-after-final")
+        self.assertFalse(RetentionPolicy())
+
+    def test_select_releases(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        release_dates = {"1.0.dev1": now - datetime.timedelta(days=10),
+                         "1.0.dev2": now - datetime.timedelta(days=5),
+                         "1.0.dev3": now - datetime.timedelta(days=1),
+                         "1.0.dev4": now}
+        cleanup = PypiCleanup(url="https://test.pypi.org", packages=["a"], keep_dev=1, days=3)
+        with self.assertLogs(level="INFO") as logs:
+            releases = cleanup.select_releases("a", release_dates)
+        self.assertEqual([(r.version, r.rule) for r in releases], [("1.0.dev1", "keep-dev=1"), ("1.0.dev2", "keep-dev=1")])
+        self.assertIn("INFO:root: 1.0.dev1 (matched 'keep-dev=1')", logs.output)
+
+    @patch("sys.stderr")
+    def test_refuses_to_delete_all_releases(self, stderr):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cleanup = PypiCleanup(url="https://test.pypi.org", packages=["a"], keep_per_minor=0)
+        with self.assertLogs(level="INFO"), self.assertRaises(PypiCleanupError) as e:
+            cleanup.select_releases("a", {"1.0": now, "1.1": now})
+        self.assertEqual(e.exception.exit_code, 3)
+        warning = "".join(call.args[0] for call in stderr.write.call_args_list)
+        self.assertIn("You have selected the following retention policy: keep-per-minor=0", warning)
+        self.assertNotIn("patterns", warning)
@@ -0,0 +1,79 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from pypi_cleanup.session import SESSION_KEY_ENV, SessionStore
+
+URL = "https://test.pypi.org"
+
+
+@unittest.skipUnless(importlib.util.find_spec("cryptography"), "cryptography is not installed")
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, "sessions")
+        patcher = patch.dict(os.environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop(SESSION_KEY_ENV, None)
+
+    @staticmethod
+    def session():
+        s = requests.Session()
+        s.cookies.set("session_id", "secret", domain="test.pypi.org", path="/", secure=True)
+        return s
+
+    def test_roundtrip(self):
+        SessionStore(self.path).save(self.session(), URL, "user")
+
+        s = requests.Session()
+        self.assertTrue(SessionStore(self.path).load(s, URL, "user"))
+        self.assertEqual(s.cookies.get("session_id", domain="test.pypi.org"), "secret")
+        self.assertFalse(SessionStore(self.path).load(requests.Session(), URL, "other-user"))
+
+        for name in os.listdir(self.path):
+            with open(os.path.join(self.path, name), "rb") as f:
+                self.assertNotIn(b"secret", f.read())
+
+    @unittest.skipUnless(os.name == "posix", "POSIX permissions")
+    def test_private(self):
+        store = SessionStore(self.path)
+        store.save(self.session(), URL, "user")
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o700)
+        session_path = store._session_path(URL, "user")
+        self.assertEqual(os.stat(session_path).st_mode & 0o777, 0o600)
+
+        os.chmod(session_path, 0o644)
+        self.assertRaises(PermissionError, SessionStore(self.path).load, requests.Session(), URL, "user")
+
+    def test_wrong_key_ignored(self):
+        SessionStore(self.path).save(self.session(), URL, "user")
+        from cryptography.fernet import Fernet
+        os.environ[SESSION_KEY_ENV] = Fernet.generate_key().decode("ascii")
+        with self.assertLogs(level="WARNING"):
+            self.assertFalse(SessionStore(self.path).load(requests.Session(), URL, "user"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import json
+import mmap
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from pypi_cleanup import PypiCleanup, PypiCleanupError
+from pypi_cleanup.snapshot import Snapshot, SnapshotError
+
+
+def document(package):
+    return {
+        "versions": ["1.0", "1.1.dev1"],
+        "files": [
+            {"filename": f"{package}-1.0.tar.gz", "upload-time": "2024-01-01T12:00:00.000000+00:00"},
+            {"filename": f"{package}-1.1.dev1.tar.gz", "upload-time": "2024-01-02T12:00:00.000000+00:00"},
+        ]
+    }
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = tmp_dir.name
+
+    def write(self, relative_path, content):
+        path = os.path.join(self.path, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content if isinstance(content, str) else json.dumps(content))
+        return path
+
+    def test_layouts(self):
+        self.write("archived.json", document("archived"))
+        self.write("web/simple/mirrored-pkg/index.v1_json", document("mirrored_pkg"))
+        for stream in (False, True):
+            snapshot = Snapshot(self.path, stream)
+            self.assertEqual(list(snapshot.release_dates("archived")), ["1.0", "1.1.dev1"])
+            self.assertEqual(snapshot.release_dates("Mirrored_Pkg"), snapshot.release_dates("mirrored-pkg"))
+            self.assertEqual(len(snapshot.release_dates("MIRRORED-PKG")), 2)
+            self.assertRaises(SnapshotError, snapshot.release_dates, "missing")
+
+    def test_single_document(self):
+        path = self.write("doc.json", document("pkg"))
+        self.assertEqual(list(Snapshot(path).release_dates("pkg")), ["1.0", "1.1.dev1"])
+
+    def test_memory_mapped_when_streaming(self):
+        path = self.write("doc.json", document("pkg"))
+        for stream in (False, True):
+            with patch("pypi_cleanup.snapshot.mmap.mmap", wraps=mmap.mmap) as mapped:
+                self.assertEqual(list(Snapshot(path, stream).release_dates("pkg")), ["1.0", "1.1.dev1"])
+            self.assertEqual(mapped.called, stream)
+
+    def test_invalid_documents(self):
+        self.write("empty.json", "")
+        self.write("truncated.json", json.dumps(document("truncated"))[:-10])
+        for stream in (False, True):
+            for package in ("empty", "truncated"):
+                self.assertRaises(SnapshotError, Snapshot(self.path, stream).release_dates, package)
+
+    def test_plan_in_parallel(self):
+        packages = [f"pkg{i}" for i in range(10)]
+        for package in packages:
+            self.write(f"{package}.json", document(package))
+
+        plans = []
+        for jobs in (1, 3):
+            cleanup = PypiCleanup(url="https://test.pypi.org", packages=packages, query_only=True, jobs=jobs,
+                                  from_snapshot=self.path)
+            with self.assertLogs(level="INFO"):
+                plans.append(cleanup.plan(None))
+        self.assertEqual(plans[0], plans[1])
+        self.assertEqual(plans[0].pkg_to_pkg_vers, {package: ["1.1.dev1"] for package in packages})
+
+        cleanup = PypiCleanup(url="https://test.pypi.org", packages=["pkg0", "missing"], jobs=3, from_snapshot=self.path)
+        with self.assertLogs(level="ERROR"):
+            self.assertRaises(PypiCleanupError, cleanup.plan, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import datetime
+import os
+import re
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from pypi_cleanup import PypiCleanup
+from pypi_cleanup.state import SelectionState, rules_hash
+
+URL = "https://test.pypi.org"
+NOW = datetime.datetime.now(datetime.timezone.utc)
+PATTERNS = [re.compile(r".*\.dev\d+$"), re.compile(r".*rc\d+$")]
+
+
+class TestSelectionState(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, "state.db")
+
+    def cleanup(self, days=0, patterns=PATTERNS):
+        cleanup = PypiCleanup(url=URL, packages=["a"], patterns=patterns, days=days, state=self.path)
+        self.addCleanup(cleanup.state.close)
+        return cleanup
+
+    def select(self, cleanup, release_dates):
+        with self.assertLogs(level="INFO"):
+            return [(r.version, r.rule) for r in cleanup.select_releases("a", release_dates)]
+
+    def test_rules_hash(self):
+        self.assertEqual(rules_hash(PATTERNS), rules_hash([re.compile(p.pattern) for p in PATTERNS]))
+        self.assertNotEqual(rules_hash(PATTERNS), rules_hash(PATTERNS[::-1]))
+        self.assertNotEqual(rules_hash(PATTERNS), rules_hash([re.compile(r".*\.dev\d+$", re.I), PATTERNS[1]]))
+
+    def test_only_new_versions_evaluated(self):
+        release_dates = {"1.0": NOW - datetime.timedelta(days=3),
+                         "1.1.dev1": NOW - datetime.timedelta(days=3),
+                         "1.1rc1": NOW - datetime.timedelta(days=2)}
+        expected = [("1.1.dev1", PATTERNS[0].pattern), ("1.1rc1", PATTERNS[1].pattern)]
+        self.assertEqual(self.select(self.cleanup(days=1.5), release_dates), expected)
+
+        cleanup = self.cleanup()
+        release_dates["1.2.dev1"] = NOW - datetime.timedelta(days=1)
+        with patch.object(cleanup.matcher, "match", wraps=cleanup.matcher.match) as match:
+            self.assertEqual(self.select(cleanup, release_dates), expected + [("1.2.dev1", PATTERNS[0].pattern)])
+        match.assert_called_once_with("1.2.dev1")
+
+    def test_versions_passing_cutoff_evaluated(self):
+        release_dates = {"1.0": NOW - datetime.timedelta(days=3), "1.1.dev1": NOW - datetime.timedelta(days=1)}
+        self.assertEqual(self.select(self.cleanup(days=2), release_dates), [])
+        self.assertEqual(SelectionState(self.path, PATTERNS).load(URL, "a")[1:], (1, {}))
+
+        cleanup = self.cleanup(days=0)
+        with patch.object(cleanup.matcher, "match", wraps=cleanup.matcher.match) as match:
+            self.assertEqual(self.select(cleanup, release_dates), [("1.1.dev1", PATTERNS[0].pattern)])
+        match.assert_called_once_with("1.1.dev1")
+
+    def test_versions_appearing_under_mark_evaluated(self):
+        release_dates = {"1.0": NOW - datetime.timedelta(days=3), "1.1.dev1": NOW - datetime.timedelta(days=3)}
+        self.select(self.cleanup(), release_dates)
+
+        cleanup = self.cleanup()
+        release_dates["1.0.dev5"] = NOW - datetime.timedelta(days=5)
+        with patch.object(cleanup.matcher, "match", wraps=cleanup.matcher.match) as match:
+            self.assertEqual(self.select(cleanup, release_dates),
+                             [("1.1.dev1", PATTERNS[0].pattern), ("1.0.dev5", PATTERNS[0].pattern)])
+        self.assertCountEqual([call.args for call in match.call_args_list], [("1.0",), ("1.0.dev5",)])
+
+    def test_deleted_versions_forgotten_and_rule_sets_separate(self):
+        release_dates = {"1.0": NOW - datetime.timedelta(days=3), "1.1.dev1": NOW - datetime.timedelta(days=3)}
+        self.select(self.cleanup(), release_dates)
+        self.assertEqual(SelectionState(self.path, PATTERNS).load(URL, "a")[1:], (1, {"1.1.dev1": 0}))
+        del release_dates["1.1.dev1"]
+        self.select(self.cleanup(), release_dates)
+        self.assertEqual(SelectionState(self.path, PATTERNS).load(URL, "a")[1:], (1, {}))
+        self.assertIsNone(SelectionState(self.path, PATTERNS[:1]).load(URL, "a"))
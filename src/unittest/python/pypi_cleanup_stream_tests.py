@@ -0,0 +1,71 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import json
+import unittest
+
+from pypi_cleanup import releases_by_date, stream_releases_by_date
+from pypi_cleanup.stream import scan_project
+
+PROJECT_INFO = {
+    "meta": {"api-version": "1.1", "_last-serial": 1234567890},
+    "name": "test-package",
+    "files": [
+        {"filename": f"test_package-1.0.dev{i}.tar.gz",
+         "hashes": {"sha256": "0" * 64},
+         "requires-python": ">=3.9",
+         "data-dist-info-metadata": False,
+         "upload-time": f"2024-01-{i + 1:02d}T12:00:00.000000+00:00"}
+        for i in range(20)
+    ] + [{"filename": "test_package-1.0.dev3-py3-none-any.whl", "upload-time": "2024-02-01T12:00:00.000000+00:00",
+          "yanked": "Ünïcödé ✓"}],
+    "versions": [f"1.0.dev{i}" for i in range(20)],
+    "project-status": {"status": "active"},
+    "size": 123456789,
+}
+
+
+def chunked(content, size):
+    return (content[i:i + size] for i in range(0, len(content), size))
+
+
+class TestStreamReleasesByDate(unittest.TestCase):
+    def test_matches_full_parse(self):
+        expected = releases_by_date("test-package", PROJECT_INFO)
+        for indent in (None, 2):
+            content = json.dumps(PROJECT_INFO, indent=indent, ensure_ascii=False).encode("utf-8")
+            for size in (1, 7, 1024, len(content)):
+                self.assertEqual(stream_releases_by_date("test-package", chunked(content, size)), expected)
+
+    def test_files_only_retained_by_callback(self):
+        content = json.dumps(PROJECT_INFO).encode("utf-8")
+        filenames = []
+        versions = scan_project(chunked(content, 3), lambda f: filenames.append(f["filename"]))
+        self.assertEqual(versions, PROJECT_INFO["versions"])
+        self.assertEqual(filenames, [f["filename"] for f in PROJECT_INFO["files"]])
+
+    def test_empty_files(self):
+        self.assertEqual(scan_project([b'{"files": [], "versions": []}'], None), [])
+
+    def test_malformed(self):
+        content = json.dumps(PROJECT_INFO).encode("utf-8")
+        self.assertRaises(ValueError, scan_project, chunked(content[:-10], 5), lambda f: None)
+        self.assertRaises(ValueError, scan_project, [content, b"{}"], lambda f: None)
+        self.assertRaises(ValueError, scan_project, [b'{"files": []}'], lambda f: None)
+
+
+if __name__ == '__main__':
+    unittest.main()
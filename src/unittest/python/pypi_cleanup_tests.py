@@ -14,9 +14,27 @@
 #   limitations under the License.
 #
 
+import datetime
+import importlib.util
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import Mock, patch, MagicMock
-from pypi_cleanup import PypiCleanup
+
+import requests
+from requests.exceptions import HTTPError, RequestException
+
+from pypi_cleanup import (CsfrParser, DeletionPlan, PlannedRelease, PypiCleanup, PypiCleanupError, VersionMatcher,
+                          extract_csrf, filename_release_keys, load_patterns, main, parse_projects, parse_upload_time,
+                          releases_by_date)
+from pypi_cleanup.journal import DeletionJournal
 
 
 class TestEmptyMatchesListRegression(unittest.TestCase):
@@ -82,5 +100,562 @@ class TestEmptyMatchesListRegression(unittest.TestCase):
             raise
 
 
+class TestReleasesByDate(unittest.TestCase):
+    PROJECT_INFO = {
+        "versions": ["1.0", "1.0.dev1", "2.0", "3.0", "4.0"],
+        "files": [
+            {"filename": "test_package-1.0.tar.gz", "upload-time": "2024-01-01T12:00:00.000000+00:00"},
+            {"filename": "test_package-1.0-py3-none-any.whl", "upload-time": "2024-01-03T12:00:00.000000+00:00"},
+            {"filename": "Test_Package-1.0.dev1.zip", "upload-time": "2024-01-02T12:00:00.000000+00:00"},
+            {"filename": "test_package-2.0-py2.7.egg", "upload-time": "2024-02-01T12:00:00.000000+00:00"},
+            {"filename": "test_package-3.0-1.src.rpm", "upload-time": "2024-03-01T12:00:00.000000+00:00"},
+            {"filename": "test-package-4.0.tar.gz", "upload-time": "2024-04-01T12:00:00.000000+00:00"},
+            {"filename": "other_package-4.0.tar.gz", "upload-time": "2024-04-01T12:00:00.000000+00:00"},
+        ]
+    }
+
+    @staticmethod
+    def brute_force_releases_by_date(package, project_info):
+        def package_matches_file(p, v, f):
+            filename = f["filename"].lower()
+            p = p.lower().replace('-', '_')
+            if filename.endswith(".whl") or filename.endswith(".egg") or filename.endswith(".src.rpm"):
+                return filename.startswith(f"{p}-{v}-")
+
+            return filename in (f"{p}-{v}.tar.gz", f"{p}-{v}.zip")
+
+        result = {}
+        for version in project_info["versions"]:
+            matches = [datetime.datetime.strptime(f["upload-time"], "%Y-%m-%dT%H:%M:%S.%f%z")
+                       for f in project_info["files"]
+                       if package_matches_file(package, version, f)]
+            if matches:
+                result[version] = max(matches)
+        return result
+
+    def test_filename_release_keys(self):
+        self.assertEqual(list(filename_release_keys("Foo_Bar-1.0-py3-none-any.whl")),
+                         [("foo_bar", "1.0"), ("foo_bar", "1.0-py3"), ("foo_bar", "1.0-py3-none")])
+        self.assertEqual(list(filename_release_keys("foo_bar-1.0.tar.gz")), [("foo_bar", "1.0")])
+        self.assertEqual(list(filename_release_keys("foo_bar-1.0.exe")), [])
+        self.assertEqual(list(filename_release_keys("foo_bar.tar.gz")), [])
+
+    def test_matches_brute_force(self):
+        for package in ("test-package", "Test_Package", "other-package", "missing"):
+            self.assertEqual(releases_by_date(package, self.PROJECT_INFO),
+                             self.brute_force_releases_by_date(package, self.PROJECT_INFO))
+
+    def test_latest_file_wins(self):
+        release_dates = releases_by_date("test-package", self.PROJECT_INFO)
+        self.assertEqual(list(release_dates), ["1.0", "1.0.dev1", "2.0", "3.0"])
+        self.assertEqual(release_dates["1.0"],
+                         datetime.datetime(2024, 1, 3, 12, tzinfo=datetime.timezone.utc))
+
+
+class TestParseUploadTime(unittest.TestCase):
+    EXPECTED = int(datetime.datetime(2024, 1, 1, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc).timestamp()) * 1000000
+
+    def test_canonical(self):
+        self.assertEqual(parse_upload_time("2024-01-01T12:00:00.123456+00:00"), self.EXPECTED + 123456)
+
+    def test_variants(self):
+        self.assertEqual(parse_upload_time("2024-01-01T12:00:00.123456Z"), self.EXPECTED + 123456)
+        self.assertEqual(parse_upload_time("2024-01-01T12:00:00Z"), self.EXPECTED)
+        self.assertEqual(parse_upload_time("2024-01-01T12:00:00"), self.EXPECTED)
+        self.assertEqual(parse_upload_time("2024-01-01T12:00:00.1234+0000"), self.EXPECTED + 123400)
+        self.assertEqual(parse_upload_time("2024-01-01T14:00:00.123456789+02:00"), self.EXPECTED + 123456)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, parse_upload_time, "yesterday")
+
+
+class TestVersionMatcher(unittest.TestCase):
+    VERSIONS = ["1.0", "1.0.dev1", "1.0rc1", "1.0rc1.post3", "2.0.0.dev20240101", "2.0a1", "2.0A1", "3.0.post1.dev2"]
+
+    def assert_equivalent(self, patterns, combined=True):
+        matcher = VersionMatcher(patterns)
+        self.assertEqual(matcher._combined is not None, combined)
+        for version in self.VERSIONS:
+            expected = next((p for p in patterns if p.match(version)), None)
+            self.assertIs(matcher.match(version), expected, version)
+
+    def test_combined(self):
+        self.assert_equivalent([re.compile(r".*\.dev\d+$"), re.compile(r".*(rc|a)\d+(\.post\d+)?$"),
+                                re.compile(r"(?P<major>\d+)\.0\.post"), re.compile(r"1\.")])
+
+    def test_first_pattern_wins(self):
+        first, second = re.compile(r"1\."), re.compile(r".*dev")
+        self.assertIs(VersionMatcher([first, second]).match("1.0.dev1"), first)
+        self.assertIs(VersionMatcher([second, first]).match("1.0.dev1"), second)
+
+    def test_fallback(self):
+        self.assert_equivalent([re.compile(r"(\d)\.\1"), re.compile(r".*dev")], combined=False)
+        self.assert_equivalent([re.compile(r"(?i).*a1$"), re.compile(r".*dev")], combined=False)
+        self.assert_equivalent([re.compile(r"(?P<x>2)\."), re.compile(r"(?P<x>1)\.")], combined=False)
+
+    def test_conditional_group_references(self):
+        for conditional in (r"1\.0(rc)?\d*(?(1)$|\.post1)", r"1\.0(?P<pre>rc)?\d*(?(pre)$|\.post1)",
+                            r"(?P<v>1)\.0.*(?P=v)"):
+            self.assert_equivalent([re.compile(r".*\.dev\d+$"), re.compile(conditional)], combined=False)
+        matcher = VersionMatcher([re.compile(r".*\.dev\d+$"), re.compile(r"1\.0(rc)?\d*(?(1)$|\.post1)")])
+        self.assertIsNotNone(matcher.match("1.0rc1"))
+        self.assertIsNone(matcher.match("1.0rc1.post1"))
+
+    def test_load_patterns(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "patterns")
+            with open(path, "w") as f:
+                f.write("# dev releases\n.*\\.dev\\d+$\n\n  .*rc\\d+  \n")
+            self.assertEqual([p.pattern for p in load_patterns(path)], [r".*\.dev\d+$", r".*rc\d+"])
+
+            with open(path, "w") as f:
+                f.write("(unbalanced\n")
+            self.assertRaisesRegex(ValueError, "patterns:1", load_patterns, path)
+
+
+class TestConcurrentFetch(unittest.TestCase):
+    @staticmethod
+    def simple_response(url, **_):
+        package = url.rstrip("/").rsplit("/", 1)[-1]
+        response = MagicMock()
+        if package == "missing":
+            response.raise_for_status.side_effect = RequestException("404")
+        response.json.return_value = {
+            "versions": ["1.0", "1.1.dev1"],
+            "files": [
+                {"filename": f"{package}-1.0.tar.gz", "upload-time": "2024-01-01T12:00:00.000000+00:00"},
+                {"filename": f"{package}-1.1.dev1.tar.gz", "upload-time": "2024-01-02T12:00:00.000000+00:00"},
+            ]
+        }
+        response.__enter__.return_value = response
+        return response
+
+    def cleanup(self, packages):
+        return PypiCleanup(url="https://test.pypi.org", username=None, packages=packages, do_it=False,
+                           patterns=None, verbose=False, days=0, query_only=True, leave_most_recent_only=False,
+                           confirm=False, delete_project=False, jobs=4)
+
+    @patch('pypi_cleanup.requests.Session')
+    def test_results_logged_in_package_order(self, mock_session):
+        mock_session.return_value.__enter__.return_value.get.side_effect = self.simple_response
+        packages = [f"pkg{i}" for i in range(20)]
+        with self.assertLogs(level="INFO") as logs:
+            self.assertIsNone(self.cleanup(packages).run())
+
+        found = [line for line in logs.output if "Found the following releases" in line]
+        self.assertEqual(found, [f"INFO:root:Found the following releases of package {p!r} to delete:"
+                                 for p in packages])
+
+    @patch('pypi_cleanup.requests.Session')
+    def test_failed_package_stops_run(self, mock_session):
+        mock_session.return_value.__enter__.return_value.get.side_effect = self.simple_response
+        with self.assertLogs(level="INFO") as logs:
+            self.assertEqual(self.cleanup(["pkg0", "missing", "pkg1"]).run(), 1)
+
+        self.assertTrue(any("Unable to find package 'missing'" in line for line in logs.output))
+        self.assertFalse(any("package 'pkg1'" in line and "Found" in line for line in logs.output))
+
+    def test_plan(self):
+        s = MagicMock()
+        s.get.side_effect = self.simple_response
+        with self.assertLogs(level="INFO"):
+            plan = self.cleanup(["pkg0", "pkg1"]).plan(s)
+
+        self.assertEqual(plan.pkg_to_pkg_vers, {"pkg0": ["1.1.dev1"], "pkg1": ["1.1.dev1"]})
+        self.assertEqual({release.rule for release in plan}, {r".*\.dev\d+$"})
+        self.assertEqual(DeletionPlan.from_dict(plan.to_dict()), plan)
+        self.assertEqual(plan.without({("pkg0", "1.1.dev1")}).pkg_to_pkg_vers, {"pkg1": ["1.1.dev1"]})
+
+        with self.assertLogs(level="ERROR"), self.assertRaises(PypiCleanupError) as e:
+            self.cleanup(["missing"]).plan(s)
+        self.assertEqual(e.exception.exit_code, 1)
+
+    def test_cutoff_per_pass(self):
+        s = MagicMock()
+        s.get.side_effect = self.simple_response
+        cleanup = self.cleanup(["pkg0"])
+        # As if the cleanup was created before the release was uploaded
+        cleanup.date = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        with self.assertLogs(level="INFO"):
+            self.assertEqual(cleanup.plan(s).pkg_to_pkg_vers, {"pkg0": ["1.1.dev1"]})
+        self.assertGreater(cleanup.date, datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc))
+
+
+class TestExtractCsrf(unittest.TestCase):
+    PAGE = """<html><body>
+    <form action="/manage/project/a/release/1.0/?other" method="POST">
+        <input name="csrf_token" type="hidden" value="other-form">
+    </form>
+    <form action="/manage/project/a/release/1.0/" method="POST">
+        <input name="csrf_token" type="hidden" value="delete-form">
+        <input name="confirm_delete_version" type="text">
+    </form>
+    """ + "<p>filler</p>" * 10000 + "</body></html>"
+
+    @staticmethod
+    def response(page, chunk_size):
+        r = MagicMock()
+        r.encoding = None
+        chunks = [page[i:i + chunk_size] for i in range(0, len(page), chunk_size)]
+        r.iter_content.return_value = iter(chunks)
+        return r, chunks
+
+    def test_same_as_full_parse(self):
+        for contains_input in (None, "confirm_delete_version", "missing"):
+            parser = CsfrParser("/manage/project/a/release/1.0/", contains_input)
+            parser.feed(self.PAGE)
+            for chunk_size in (1, 13, 8192):
+                r, _ = self.response(self.PAGE, chunk_size)
+                self.assertEqual(extract_csrf(r, "/manage/project/a/release/1.0/", contains_input), parser.csrf)
+
+    def test_stops_parsing_at_token(self):
+        r, chunks = self.response(self.PAGE, 100)
+        with patch.object(CsfrParser, "feed", autospec=True, side_effect=HTMLParser.feed) as feed:
+            self.assertEqual(extract_csrf(r, "/manage/project/a/release/1.0/", "confirm_delete_version"),
+                             "delete-form")
+        self.assertLess(feed.call_count, len(chunks) * 0.1)
+        # The rest of the page is read all the same
+        self.assertEqual(list(r.iter_content.return_value), [])
+        self.assertEqual(r.encoding, "utf-8")
+
+    def test_connection_reused(self):
+        page = self.PAGE.encode("utf-8")
+        connections = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                connections.append(self.client_address)
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+
+        with ThreadingHTTPServer(("127.0.0.1", 0), Handler) as server:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.addCleanup(server.shutdown)
+            with requests.Session() as s:
+                for _ in range(5):
+                    with s.get(f"http://127.0.0.1:{server.server_port}/", stream=True) as r:
+                        self.assertEqual(extract_csrf(r, "/manage/project/a/release/1.0/", "confirm_delete_version"),
+                                         "delete-form")
+        self.assertEqual(len(connections), 1)
+
+
+class TestDeleteReleases(unittest.TestCase):
+    FORM = """<html><body>
+    <form action="/manage/project/{package}/release/{version}/" method="POST">
+        <input name="csrf_token" type="hidden" value="token-{version}">
+        <input name="confirm_delete_version" type="text">
+    </form>
+    </body></html>"""
+
+    def session(self, broken_versions):
+        def get(url, **_):
+            _, _, package, _, version, _ = url.rsplit("/", 5)
+            response = MagicMock()
+            response.encoding = "utf-8"
+            response.iter_content.return_value = iter([self.FORM.format(package=package, version=version)])
+            response.url = url
+            response.__enter__.return_value = response
+            return response
+
+        def post(url, data, **_):
+            response = MagicMock()
+            if data["confirm_delete_version"] in broken_versions:
+                response.raise_for_status.side_effect = RequestException("500")
+            response.__enter__.return_value = response
+            return response
+
+        s = MagicMock()
+        s.get.side_effect = get
+        s.post.side_effect = post
+        return s
+
+    @staticmethod
+    def plan(releases):
+        plan = DeletionPlan("https://test.pypi.org")
+        for package, versions in releases.items():
+            for version in versions:
+                plan.add(PlannedRelease(package, version, datetime.datetime.now(datetime.timezone.utc)))
+        return plan
+
+    def test_failures_reported_per_release(self):
+        cleanup = PypiCleanup(url="https://test.pypi.org", username=None, packages=["a", "b"], do_it=True,
+                              patterns=None, verbose=False, days=0, query_only=False, leave_most_recent_only=False,
+                              confirm=False, delete_project=False, delete_jobs=4)
+        s = self.session({"1.0.dev2"})
+        with self.assertLogs(level="INFO"):
+            failed = cleanup.execute(s, self.plan({"a": ["1.0.dev1", "1.0.dev2", "1.0.dev3"], "b": ["1.0.dev2", "2.0.dev1"]}))
+
+        self.assertEqual(failed, [("a", "1.0.dev2"), ("b", "1.0.dev2")])
+        self.assertEqual(s.post.call_count, 5)
+        posted = {(call.args[0], call.kwargs["data"]["csrf_token"]) for call in s.post.call_args_list}
+        self.assertIn(("https://test.pypi.org/manage/project/b/release/2.0.dev1/", "token-2.0.dev1"), posted)
+
+    def test_csrf_token_reused_until_rejected(self):
+        cleanup = PypiCleanup(url="https://test.pypi.org", packages=["a"], do_it=True, reuse_csrf=True)
+        s = self.session(set())
+        post = s.post.side_effect
+
+        def rotating_post(url, data, **kwargs):
+            # The session's token rotates before 1.0.dev3 is deleted
+            response = post(url, data, **kwargs)
+            response.status_code = 400 if url.endswith("/1.0.dev3/") and data["csrf_token"] == "token-1.0.dev1" else 200
+            return response
+
+        s.post.side_effect = rotating_post
+        with self.assertLogs(level="INFO") as logs:
+            failed = cleanup.execute(s, self.plan({"a": ["1.0.dev1", "1.0.dev2", "1.0.dev3", "1.0.dev4"]}))
+
+        self.assertEqual(failed, [])
+        self.assertEqual([call.args[0].rsplit("/", 2)[1] for call in s.get.call_args_list], ["1.0.dev1", "1.0.dev3"])
+        self.assertEqual([call.kwargs["data"]["csrf_token"] for call in s.post.call_args_list],
+                         ["token-1.0.dev1", "token-1.0.dev1", "token-1.0.dev1", "token-1.0.dev3", "token-1.0.dev3"])
+        self.assertTrue(any("CSRF token was rejected" in line for line in logs.output))
+
+
+class TestJournaledDeletions(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, "journal.jsonl")
+
+    def test_journaled_as_completed(self):
+        cleanup = PypiCleanup(url="https://test.pypi.org", packages=["a"], do_it=True, delete_jobs=2, journal=self.path)
+        plan = TestDeleteReleases.plan({"a": ["1.0.dev1", "1.0.dev2"]})
+        cleanup.journal.plan(plan)
+        journaled_ahead = []
+
+        def delete(s, release):
+            if release.version == "1.0.dev1":
+                # The first deletion completes after the second one, which must be journaled by then
+                deadline = time.monotonic() + 5
+                while ("a", "1.0.dev2") not in DeletionJournal(self.path).replay()[1] and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                journaled_ahead.append(("a", "1.0.dev2") in DeletionJournal(self.path).replay()[1])
+
+        with patch.object(cleanup, "delete", side_effect=delete), self.assertLogs(level="INFO"):
+            self.assertEqual(cleanup.execute(MagicMock(), plan), [])
+        cleanup.journal.close()
+        self.assertEqual(journaled_ahead, [True])
+        self.assertEqual(DeletionJournal(self.path).replay()[1], {("a", "1.0.dev1"), ("a", "1.0.dev2")})
+
+    def test_not_found_when_resuming_is_deleted(self):
+        plan = TestDeleteReleases.plan({"a": ["1.0.dev1"]})
+        not_found = HTTPError("404", response=Mock(status_code=404))
+        for resume, failed in ((True, []), (False, [("a", "1.0.dev1")])):
+            cleanup = PypiCleanup(url="https://test.pypi.org", packages=["a"], do_it=True, journal=self.path,
+                                  resume=resume)
+            cleanup.journal.plan(plan)
+            with patch.object(cleanup, "delete", side_effect=not_found), self.assertLogs(level="INFO") as logs:
+                self.assertEqual(cleanup.execute(MagicMock(), plan), failed)
+            cleanup.journal.close()
+            self.assertEqual(DeletionJournal(self.path).replay()[1], {("a", "1.0.dev1")} if resume else set())
+            self.assertEqual("INFO:root:Already deleted 'a' version 1.0.dev1" in logs.output, resume)
+
+
+class TestAuthenticate(unittest.TestCase):
+    def cleanup(self):
+        cleanup = PypiCleanup(url="https://test.pypi.org", username="user", packages=["a"], do_it=False,
+                              patterns=None, verbose=False, days=0, query_only=False, leave_most_recent_only=False,
+                              confirm=False, delete_project=False)
+        cleanup.session_store = MagicMock()
+        cleanup.session_store.load.return_value = True
+        return cleanup
+
+    @patch("pypi_cleanup.getpass.getpass")
+    def test_stored_session_reused(self, getpass):
+        cleanup = self.cleanup()
+        s = MagicMock()
+        s.get.return_value.__enter__.return_value.status_code = 200
+        with self.assertLogs(level="INFO"):
+            self.assertIsNone(cleanup.authenticate(s))
+        s.get.assert_called_once()
+        s.post.assert_not_called()
+        getpass.assert_not_called()
+
+    @patch("pypi_cleanup.getpass.getpass", return_value="password")
+    def test_expired_session_discarded(self, getpass):
+        cleanup = self.cleanup()
+        s = MagicMock()
+        r = s.get.return_value.__enter__.return_value
+        r.status_code = 303
+        r.encoding = "utf-8"
+        r.iter_content.return_value = iter(['<form action="/account/login/"><input name="csrf_token" value="t"></form>'])
+        s.post.return_value.__enter__.return_value.url = "https://test.pypi.org/account/login/"
+        with self.assertLogs(level="INFO"):
+            self.assertRaises(PypiCleanupError, cleanup.authenticate, s)
+        cleanup.session_store.discard.assert_called_once_with("https://test.pypi.org", "user")
+        getpass.assert_called_once()
+
+
+class TestNonInteractive(unittest.TestCase):
+    def cleanup(self, **kwargs):
+        return PypiCleanup(url="https://test.pypi.org", username="user", packages=["a"], non_interactive=True, **kwargs)
+
+    @patch.dict(os.environ, {"PYPI_CLEANUP_TOTP_SEED": "GEZDGNBVGY3TQOJQGEZDGNBVGY3TQOJQ"})
+    @patch("pypi_cleanup.totp.time.time", return_value=59)
+    def test_auth_code_from_seed(self, time):
+        self.assertEqual(self.cleanup().auth_code(), "287082")
+
+    @patch.dict(os.environ, {"PYPI_CLEANUP_AUTH_CODE": "123456"})
+    def test_auth_code_from_env(self):
+        self.assertEqual(self.cleanup().auth_code(), "123456")
+
+    @patch("pypi_cleanup.sys.stdin")
+    def test_auth_code_from_stdin(self, stdin):
+        stdin.isatty.return_value = False
+        stdin.readline.return_value = "654321\n"
+        self.assertEqual(self.cleanup().auth_code(), "654321")
+
+        stdin.readline.return_value = ""
+        with self.assertLogs(level="ERROR"):
+            self.assertRaises(PypiCleanupError, self.cleanup().auth_code)
+
+    @patch("pypi_cleanup.getpass.getpass")
+    def test_never_prompts_for_password(self, getpass):
+        with self.assertLogs(level="ERROR"):
+            self.assertRaises(PypiCleanupError, self.cleanup().prompt_password)
+        getpass.assert_not_called()
+
+    def test_plan_confirmation(self):
+        plan = DeletionPlan("https://test.pypi.org")
+        plan.add(PlannedRelease("a", "1.0.dev1", datetime.datetime.now(datetime.timezone.utc)))
+        cleanup = self.cleanup(do_it=True, confirm_plan=plan.digest())
+        self.assertEqual(cleanup.grace_period, 0)
+        with self.assertLogs(level="INFO"):
+            cleanup.check_plan(plan)
+
+        plan.add(PlannedRelease("a", "1.0.dev2", datetime.datetime.now(datetime.timezone.utc)))
+        with self.assertLogs(level="ERROR"):
+            self.assertRaises(PypiCleanupError, cleanup.check_plan, plan)
+        self.assertEqual(self.cleanup(do_it=True).grace_period, 5)
+
+
+class TestDiscoverProjects(unittest.TestCase):
+    PAGES = {
+        None: '<a href="/manage/project/org-a/releases/">a</a><a href="/manage/project/org-a/settings/">a</a>'
+              '<a href="/manage/project/Org_B/releases/">b</a><a href="?page=2">2</a><a href="?page=3">3</a>',
+        2: '<a href="https://test.pypi.org/manage/project/org-c/releases/">c</a><a href="?page=1">1</a>',
+        3: '<a href="/manage/project/other/releases/">d</a><a href="/project/ignored/">e</a>',
+    }
+
+    def session(self):
+        def get(url, params=None, **_):
+            response = MagicMock()
+            response.text = self.PAGES[params and params["page"]]
+            response.__enter__.return_value = response
+            return response
+
+        s = MagicMock()
+        s.get.side_effect = get
+        return s
+
+    def test_parse_projects(self):
+        self.assertEqual(parse_projects(self.PAGES[None]), (["org-a", "Org_B"], 3))
+        self.assertEqual(parse_projects(self.PAGES[3]), (["other"], 1))
+
+    def test_all_pages_filtered(self):
+        cleanup = PypiCleanup(url="https://test.pypi.org", all_projects=True, jobs=4,
+                              include=["org-*"], exclude=["org_b"])
+        with self.assertLogs(level="INFO") as logs:
+            self.assertEqual(cleanup.discover_projects(self.session()), ["org-a", "org-c"])
+        self.assertIn("INFO:root:Discovered 4 project(s) at https://test.pypi.org/manage/projects/, "
+                      "2 selected for cleanup", logs.output)
+
+    def test_organization(self):
+        cleanup = PypiCleanup(url="https://test.pypi.org", organization="org")
+        s = self.session()
+        with self.assertLogs(level="INFO"):
+            self.assertEqual(cleanup.discover_projects(s), ["org-a", "Org_B", "org-c", "other"])
+        self.assertEqual(s.get.call_args_list[0].args[0], "https://test.pypi.org/manage/organization/org/projects/")
+
+
+class TestCommandLine(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, "journal.jsonl")
+        journal = DeletionJournal(self.path)
+        journal.plan(TestDeleteReleases.plan({"a": ["1.0.dev1", "1.0.dev2"]}))
+        journal.deleted("a", "1.0.dev1")
+        journal.close()
+
+    def main(self, *args):
+        with patch.object(sys, "argv", ["pypi-cleanup", "-t", "https://test.pypi.org", "-u", "user", *args]):
+            return main()
+
+    @patch("pypi_cleanup.requests.Session")
+    def test_resume_without_packages(self, mock_session):
+        s = mock_session.return_value.__enter__.return_value
+        s.post.return_value.__enter__.return_value.url = "https://test.pypi.org/manage/projects/"
+        with patch.dict("os.environ", {"PYPI_CLEANUP_PASSWORD": "password"}), \
+                patch("pypi_cleanup.forms.extract_csrf", return_value="token"), self.assertLogs(level="INFO") as logs:
+            self.assertIsNone(self.main("--journal", self.path, "--resume", "--shard", "1/1", "--do-it",
+                                        "--confirm-plan", DeletionJournal(self.path).replay()[0].digest()))
+
+        self.assertIn("INFO:root:Deleted 'a' version 1.0.dev2", logs.output)
+        self.assertFalse(any("on package" in line for line in logs.output))
+        self.assertEqual(DeletionJournal(self.path).replay()[1], {("a", "1.0.dev1"), ("a", "1.0.dev2")})
+
+    def test_resume_verifies_whole_plan(self):
+        plan = DeletionJournal(self.path).replay()[0]
+        cleanup = PypiCleanup(url="https://test.pypi.org", journal=self.path, resume=True, shard=(2, 2), do_it=True,
+                              confirm_plan=plan.digest())
+        with self.assertLogs(level="INFO"):
+            self.assertNotEqual(cleanup.resume_plan().digest(), plan.digest())
+
+        cleanup.confirm_plan = TestDeleteReleases.plan({"a": ["1.0.dev2"]}).digest()
+        with self.assertLogs(level="ERROR"):
+            self.assertRaises(PypiCleanupError, cleanup.resume_plan)
+
+    @patch("sys.stderr")
+    def test_grace_period_requires_approval(self, _):
+        with self.assertRaises(SystemExit) as e:
+            self.main("-p", "a", "--do-it", "--grace-period", "0")
+        self.assertEqual(e.exception.code, 2)
+
+    @patch("sys.stderr")
+    def test_missing_optional_dependencies(self, stderr):
+        find_spec = importlib.util.find_spec
+        for args, module in ((["--keep-dev", "1"], "packaging"), (["--session-store", self.path], "cryptography"),
+                             (["--engine", "async"], "httpx")):
+            with patch("importlib.util.find_spec", lambda name: None if name == module else find_spec(name)), \
+                    self.assertRaises(SystemExit) as e:
+                self.main("-p", "a", *args)
+            self.assertEqual(e.exception.code, 2)
+            self.assertIn(f"`{module}`", "".join(call.args[0] for call in stderr.write.call_args_list))
+
+    @patch("sys.stderr")
+    def test_resume_refuses_packages(self, _):
+        for args in (["-p", "a"], ["--all-projects"]):
+            with self.assertRaises(SystemExit) as e:
+                self.main("--journal", self.path, "--resume", *args)
+            self.assertEqual(e.exception.code, 2)
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_networking_deferred(self):
+        code = ("import sys, pypi_cleanup; "
+                "print(sorted(m for m in ('requests', 'asyncio', 'html.parser', 'sqlite3') if m in sys.modules))")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        self.assertEqual(subprocess.check_output([sys.executable, "-c", code], env=env, text=True).strip(), "[]")
+
+        import pypi_cleanup
+        import requests
+        self.assertIs(pypi_cleanup.requests, requests)
+        self.assertIs(pypi_cleanup.CsfrParser, CsfrParser)
+        self.assertRaises(AttributeError, getattr, pypi_cleanup, "missing")
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,148 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+from requests.exceptions import ConnectionError
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from pypi_cleanup.adapter import ThrottlingAdapter
+from pypi_cleanup.throttle import RateLimiter, retry_after
+
+
+def response(status, headers=None):
+    r = MagicMock()
+    r.status_code = status
+    r.headers = headers or {}
+    return r
+
+
+def prepared(method):
+    return requests.Request(method, "https://test.pypi.org/simple/test-package/").prepare()
+
+
+@patch("pypi_cleanup.throttle.time.sleep")
+class TestThrottlingAdapter(unittest.TestCase):
+    def adapter(self, responses):
+        adapter = ThrottlingAdapter(RateLimiter(0), retries=3, backoff=0.5)
+        self.send = patch("requests.adapters.HTTPAdapter.send", side_effect=responses).start()
+        self.addCleanup(patch.stopall)
+        return adapter
+
+    def test_retry_after_honored(self, sleep):
+        adapter = self.adapter([response(429, {"Retry-After": "7"}), response(200)])
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(adapter.send(prepared("GET")).status_code, 200)
+        self.assertEqual(self.send.call_count, 2)
+        self.assertIn(7.0, [call.args[0] for call in sleep.call_args_list])
+
+    def test_retries_exhausted_returns_last_response(self, sleep):
+        adapter = self.adapter([response(503)] * 4)
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(adapter.send(prepared("GET")).status_code, 503)
+        self.assertEqual(self.send.call_count, 4)
+
+    def test_post_not_retried_on_server_error(self, sleep):
+        adapter = self.adapter([response(503), response(200)])
+        self.assertEqual(adapter.send(prepared("POST")).status_code, 503)
+        self.assertEqual(self.send.call_count, 1)
+
+    def test_post_retried_on_too_many_requests(self, sleep):
+        adapter = self.adapter([response(429), response(200)])
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(adapter.send(prepared("POST")).status_code, 200)
+
+    def test_post_not_retried_on_connection_error(self, sleep):
+        adapter = self.adapter([ConnectionError("reset"), response(200)])
+        self.assertRaises(ConnectionError, adapter.send, prepared("POST"))
+
+    def test_post_retried_on_refused_connection(self, sleep):
+        refused = NewConnectionError(None, "Connection refused")
+        adapter = self.adapter([ConnectionError(MaxRetryError(None, "/", refused)), response(200)])
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(adapter.send(prepared("POST")).status_code, 200)
+
+    def test_retry_after_capped(self, sleep):
+        adapter = self.adapter([response(429, {"Retry-After": "86400"}), response(200)])
+        adapter.max_retry_after = 30.0
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(adapter.send(prepared("GET")).status_code, 200)
+        self.assertEqual(max(call.args[0] for call in sleep.call_args_list), 30.0)
+
+    def test_get_retried_on_connection_error(self, sleep):
+        adapter = self.adapter([ConnectionError("reset"), response(200)])
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(adapter.send(prepared("GET")).status_code, 200)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_rate_adapts_to_throttling(self):
+        limiter = RateLimiter(10.0)
+        limiter.throttle(0)
+        limiter.throttle(0)
+        self.assertEqual(limiter.rate, 2.5)
+        for _ in range(100):
+            limiter.success()
+        self.assertEqual(limiter.rate, 10.0)
+
+    @patch("pypi_cleanup.throttle.time.monotonic")
+    def test_unlimited_until_overloaded(self, monotonic):
+        monotonic.return_value = 0.0
+        limiter = RateLimiter(0)
+        for i in range(21):
+            monotonic.return_value = i / 20
+            self.assertEqual(limiter.reserve(), 0)
+        limiter.throttle(0)
+        self.assertEqual(limiter.rate, 0)
+
+        limiter.throttle(0, overloaded=True)
+        self.assertEqual(limiter.rate, 10.0)
+        self.assertGreater(limiter.reserve(), 0)
+        for _ in range(10):
+            limiter.success()
+        self.assertEqual(limiter.rate, 0)
+        self.assertEqual(limiter.reserve(), 0)
+
+    @patch("pypi_cleanup.throttle.time.sleep")
+    def test_adapter_engages_limiter_when_overloaded(self, sleep):
+        limiter = RateLimiter(0)
+        adapter = ThrottlingAdapter(limiter, retries=3, backoff=0.5)
+        with patch("requests.adapters.HTTPAdapter.send", side_effect=[response(500), response(503), response(200)]), \
+                self.assertLogs(level="WARNING"):
+            adapter.send(prepared("GET"))
+        self.assertGreater(limiter.rate, 0)
+
+    @patch("pypi_cleanup.throttle.time.sleep")
+    def test_bucket_delays_after_burst(self, sleep):
+        limiter = RateLimiter(2.0, burst=2)
+        limiter.acquire()
+        limiter.acquire()
+        sleep.assert_not_called()
+        limiter.acquire()
+        self.assertAlmostEqual(sleep.call_args.args[0], 0.5, places=1)
+
+    def test_retry_after_formats(self):
+        self.assertEqual(retry_after(response(429, {"Retry-After": "3"})), 3.0)
+        self.assertEqual(retry_after(response(429, {"Retry-After": "3"}), maximum=1.0), 1.0)
+        self.assertEqual(retry_after(response(429, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})), 0.0)
+        self.assertIsNone(retry_after(response(429, {"Retry-After": "soon"})))
+        self.assertIsNone(retry_after(response(429)))
+
+
+if __name__ == '__main__':
+    unittest.main()
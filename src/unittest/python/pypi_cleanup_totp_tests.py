@@ -0,0 +1,41 @@
+#   -*- coding: utf-8 -*-
+#   Copyright (C) 2026 Arcadiy Ivanov <arcadiy@ivanov.biz>
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+import base64
+import unittest
+
+from pypi_cleanup.totp import totp
+
+# RFC 6238 appendix B, SHA-1
+SEED = base64.b32encode(b"12345678901234567890").decode()
+
+
+class TestTotp(unittest.TestCase):
+    def test_rfc_vectors(self):
+        for now, code in ((59, "94287082"), (1111111109, "07081804"), (1111111111, "14050471"),
+                          (1234567890, "89005924"), (2000000000, "69279037"), (20000000000, "65353130")):
+            self.assertEqual(totp(SEED, now, digits=8), code)
+
+    def test_seed_normalized(self):
+        grouped = " ".join(SEED[i:i + 4] for i in range(0, len(SEED), 4)).lower()
+        self.assertEqual(totp(grouped.rstrip("="), 59), "287082")
+
+    def test_invalid_seed(self):
+        self.assertRaises(ValueError, totp, "not base32!")
+
+
+if __name__ == '__main__':
+    unittest.main()